@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+端到端离线基准：真实运行 main.py / batch_archive.py，对接本地 Pixiv / Behance 替身服务
+
+每个场景在临时目录中新建一个空的 Eagle 素材库和缓存目录，通过环境变量
+（SAVE_TO_EAGLE_LIBRARY / SAVE_TO_EAGLE_CACHE / PIXIV_ORIGIN / BEHANCE_ORIGIN）
+把脚本指向它们，完整走一遍 元数据 → 下载 → 解码/缩略图 → 写入素材库 → 重建索引。
+
+报告每个场景的:
+    - 作品/分钟
+    - MB/s（替身服务发出的字节数 / 墙钟时间）
+    - 子进程峰值内存（ru_maxrss）
+
+Behance 场景需要 Playwright（未安装时跳过）。
+
+用法:
+    python benchmarks/bench_e2e.py
+    python benchmarks/bench_e2e.py --artworks 30 --latency 0.2 --bandwidth 5 --error-rate 0.05
+    python benchmarks/bench_e2e.py --scenario pixiv-batch --json result.json --keep
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import importlib.util
+from pathlib import Path
+
+from mock_server import MockConfig, MockServer
+
+scripts_dir = Path(__file__).parent.parent / "scripts"
+sys.path.insert(0, str(scripts_dir))
+
+from eagle_utils import FOLDER_IDS
+
+# 作品 ID 起点（避开常见的小数字 ID）
+BASE_ID = 100000
+
+SCENARIOS = ("pixiv-single", "pixiv-batch", "behance-single", "behance-batch", "behance-profile", "mixed-batch")
+
+
+def make_library(root: Path) -> Path:
+    """创建空的 Eagle 素材库（含 Pixiv / Behance 文件夹树和空 cookies）"""
+    library = root / "library"
+    (library / "images").mkdir(parents=True)
+    (library / ".secrets").mkdir()
+    (library / ".secrets" / "pixiv_cookies.json").write_text("[]", encoding='utf-8')
+
+    behance_children = [
+        {"id": folder_id, "name": name, "children": []}
+        for name, folder_id in FOLDER_IDS["Behance"].items()
+    ]
+    metadata = {
+        "folders": [
+            {"id": FOLDER_IDS["Pixiv"], "name": "Pixiv", "children": []},
+            {"id": "BEHANCEROOT00", "name": "Behance", "children": behance_children},
+        ],
+        "smartFolders": [],
+        "quickAccess": [],
+        "tagsGroups": [],
+        "modificationTime": int(time.time() * 1000),
+        "applicationVersion": "4.0.0",
+    }
+    (library / "metadata.json").write_text(json.dumps(metadata, ensure_ascii=False), encoding='utf-8')
+    return library
+
+
+def make_urls(scenario: str, count: int) -> list:
+    if scenario.startswith("pixiv"):
+        return [f"https://www.pixiv.net/artworks/{BASE_ID + i}" for i in range(count)]
+    if scenario == "behance-profile":
+        # 个人主页由替身服务按列表页分页返回 count 个项目
+        return ["https://www.behance.net/mockuser"]
+    if scenario.startswith("behance"):
+        return [f"https://www.behance.net/gallery/{BASE_ID + i}/mock-project" for i in range(count)]
+    return [
+        f"https://www.behance.net/gallery/{BASE_ID + i}/mock-project" if i % 2
+        else f"https://www.pixiv.net/artworks/{BASE_ID + i}"
+        for i in range(count)
+    ]
+
+
+def run_process(cmd: list, env: dict, log_path: Path) -> tuple:
+    """
+    运行子进程并记录峰值内存
+
+    Returns:
+        (退出码, 峰值内存字节数)
+    """
+    with open(log_path, "ab") as log:
+        proc = subprocess.Popen(cmd, env=env, stdout=log, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    # Linux 上 ru_maxrss 单位为 KB，macOS 上为字节
+    peak = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    return proc.returncode, peak
+
+
+def run_scenario(scenario: str, server: MockServer, args, work_dir: Path) -> dict:
+    root = work_dir / scenario
+    library = make_library(root)
+    env = {
+        **os.environ,
+        "SAVE_TO_EAGLE_LIBRARY": str(library),
+        "SAVE_TO_EAGLE_CACHE": str(root / "cache"),
+        "PIXIV_ORIGIN": server.origin,
+        "BEHANCE_ORIGIN": server.origin,
+        "PYTHONUNBUFFERED": "1",
+    }
+    urls = make_urls(scenario, args.artworks)
+    log_path = root / "output.log"
+    server.state.reset()
+
+    started = time.monotonic()
+    failures = 0
+    peak = 0
+    if scenario.endswith("single"):
+        # 单条模式：每个作品启动一次 main.py（包含解释器启动和导入开销）
+        for url in urls:
+            code, rss = run_process([sys.executable, str(scripts_dir / "main.py"), url], env, log_path)
+            failures += code != 0
+            peak = max(peak, rss)
+    elif scenario == "behance-profile":
+        # 个人主页：逐页枚举项目，列表页与项目页共用一个浏览器
+        cmd = [
+            sys.executable, str(scripts_dir / "behance_sync.py"), urls[0],
+            "--delay-min", str(args.delay_min), "--delay-max", str(args.delay_max),
+        ]
+        code, peak = run_process(cmd, env, log_path)
+        archived_path = library / ".save-to-eagle" / "behance_archived.jsonl"
+        done = len(archived_path.read_text(encoding='utf-8').splitlines()) if archived_path.exists() else 0
+        urls = [None] * args.artworks
+        failures = args.artworks - done
+    else:
+        input_path = root / "urls.jsonl"
+        input_path.write_text("".join(json.dumps({"url": url}) + "\n" for url in urls), encoding='utf-8')
+        cmd = [
+            sys.executable, str(scripts_dir / "batch_archive.py"),
+            "--input", str(input_path),
+            "--delay-min", str(args.delay_min), "--delay-max", str(args.delay_max),
+            "--journal", str(root / "journal.jsonl"),
+            "--metrics-dir", str(root / "metrics"),
+        ]
+        code, peak = run_process(cmd, env, log_path)
+        failures = count_failures(root / "journal.jsonl", len(urls)) if code == 0 else len(urls)
+    elapsed = time.monotonic() - started
+
+    archived = len(urls) - failures
+    images = sum(1 for _ in (library / "images").glob("*.info/metadata.json"))
+    return {
+        "scenario": scenario,
+        "artworks": len(urls),
+        "archived": archived,
+        "images": images,
+        "elapsed": round(elapsed, 2),
+        "artworks_per_minute": round(archived / elapsed * 60, 1),
+        "mb_per_second": round(server.state.bytes / elapsed / 1024 / 1024, 2),
+        "served_mb": round(server.state.bytes / 1024 / 1024, 1),
+        "requests": server.state.requests,
+        "injected_errors": server.state.errors,
+        "peak_rss_mb": round(peak / 1024 / 1024, 1),
+        "log": str(log_path),
+    }
+
+
+def count_failures(journal_path: Path, total: int) -> int:
+    """按进度日志统计失败的作品数（同一 URL 以最后一条记录为准）"""
+    if not journal_path.exists():
+        return total
+    status = {}
+    for line in journal_path.read_text(encoding='utf-8').splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if "url" in record:
+            status[record["url"]] = record.get("status")
+    return total - sum(1 for value in status.values() if value == "success")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端离线基准（本地 Pixiv / Behance 替身服务）")
+    parser.add_argument("--scenario", nargs="+", choices=SCENARIOS, help="要运行的场景（默认全部）")
+    parser.add_argument("--artworks", type=int, default=20, help="每个场景的作品数（默认 20）")
+    parser.add_argument("--latency", type=float, default=0.05, help="替身服务每个请求的延迟（秒）")
+    parser.add_argument("--bandwidth", type=float, help="每个连接的带宽（MB/s，默认不限）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="注入错误率（0-1）")
+    parser.add_argument("--image-size", default="2000x2800", help="图片尺寸（默认 2000x2800）")
+    parser.add_argument("--pages", default="1-3", help="每个 Pixiv 作品的页数范围（默认 1-3）")
+    parser.add_argument("--delay-min", type=float, default=0.01, help="批量模式最小延迟（秒）")
+    parser.add_argument("--delay-max", type=float, default=0.02, help="批量模式最大延迟（秒）")
+    parser.add_argument("--json", type=str, help="结果写出到 JSON 文件")
+    parser.add_argument("--keep", action="store_true", help="保留临时素材库和日志")
+    args = parser.parse_args()
+
+    scenarios = args.scenario or list(SCENARIOS)
+    if importlib.util.find_spec("playwright") is None:
+        skipped = [s for s in scenarios if s.startswith(("behance", "mixed"))]
+        if skipped:
+            print(f"⚠️ 未安装 Playwright，跳过: {', '.join(skipped)}")
+        scenarios = [s for s in scenarios if s not in skipped]
+
+    width, height = (int(v) for v in args.image_size.lower().split("x"))
+    low, _, high = args.pages.partition("-")
+    config = MockConfig(
+        latency=args.latency,
+        bandwidth=args.bandwidth * 1024 * 1024 if args.bandwidth else None,
+        error_rate=args.error_rate,
+        image_size=(width, height),
+        pages=(int(low), int(high or low)),
+        behance_list_projects=args.artworks,
+    )
+
+    work_dir = Path(tempfile.mkdtemp(prefix="save-to-eagle-bench-"))
+    results = []
+    with MockServer(config) as server:
+        print(f"替身服务: {server.origin}，延迟 {args.latency}s，"
+              f"带宽 {f'{args.bandwidth} MB/s' if args.bandwidth else '不限'}，错误率 {args.error_rate:.0%}，"
+              f"图片 {len(server.state.images[0]) / 1024:.0f} KB")
+        for scenario in scenarios:
+            print(f"\n▶ {scenario}（{args.artworks} 个作品）")
+            result = run_scenario(scenario, server, args, work_dir)
+            results.append(result)
+            print(f"   {result['archived']}/{result['artworks']} 成功，{result['images']} 张图片，"
+                  f"{result['elapsed']} 秒")
+            print(f"   {result['artworks_per_minute']} 作品/分钟，{result['mb_per_second']} MB/s，"
+                  f"峰值内存 {result['peak_rss_mb']} MB，注入错误 {result['injected_errors']} 次")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({
+            "config": {k: v for k, v in vars(args).items() if k not in ("json", "keep", "scenario")},
+            "results": results,
+        }, ensure_ascii=False, indent=2), encoding='utf-8')
+        print(f"\n结果已写出: {args.json}")
+
+    if args.keep:
+        print(f"临时素材库与日志: {work_dir}")
+    else:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
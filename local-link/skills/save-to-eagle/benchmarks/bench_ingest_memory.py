@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+入库解码内存基准：病态图片语料下 create_thumbnail 的峰值内存
+
+生成一组病态图片（超大 PNG / JPEG、调色板 PNG、长动图），每张图片在独立子进程中
+生成缩略图，记录子进程峰值内存（ru_maxrss），减去只导入 eagle_utils 的空跑基线后
+与解码预算比较。同时用改造前的写法（整图 load + convert + thumbnail）跑一遍作对照。
+
+超出预算的图片应降级为占位缩略图，峰值增量应始终不超过预算；任一图片超出时退出码为 1。
+
+语料默认生成到临时目录，--corpus 指定目录时复用已生成的图片。
+
+用法:
+    python benchmarks/bench_ingest_memory.py
+    python benchmarks/bench_ingest_memory.py --budget 256 --corpus /tmp/ingest-corpus
+    python benchmarks/bench_ingest_memory.py --only huge-jpeg,huge-png-rgba --no-legacy
+"""
+import os
+import sys
+import json
+import zlib
+import struct
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+from PIL import Image
+
+scripts_dir = Path(__file__).parent.parent / "scripts"
+
+# 只读取语料的文件头，不受解压炸弹检查限制
+Image.MAX_IMAGE_PIXELS = None
+
+# 子进程：method 为 noop / budget / legacy
+CHILD = """
+import sys, json
+sys.path.insert(0, {scripts!r})
+from PIL import Image
+import eagle_utils
+method, src, dest = sys.argv[1:4]
+result = {{}}
+if method == "budget":
+    result = eagle_utils.create_thumbnail(src, dest)
+elif method == "legacy":
+    with Image.open(src) as img:
+        img.load()
+        if img.mode in ('RGBA', 'P'):
+            img = img.convert('RGB')
+        img.thumbnail((240, 240), Image.Resampling.LANCZOS)
+        img.save(dest, 'PNG')
+print(json.dumps(result))
+"""
+
+
+def write_png(path: Path, size: tuple, mode: str):
+    """逐行流式写出 PNG（不在内存中构造整图），mode 为 L / P / RGBA"""
+    color_type, bands = {"L": (0, 1), "P": (3, 1), "RGBA": (6, 4)}[mode]
+    width, height = size
+    row_bytes = width * bands
+    pattern = bytes(range(256)) * (row_bytes // 256 + 2)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)))
+        if mode == "P":
+            f.write(chunk(b"PLTE", bytes(v for i in range(256) for v in (i, 255 - i, (i * 7) & 0xFF))))
+        compressor = zlib.compressobj(6)
+        for y in range(height):
+            offset = (y * 3) % 256
+            data = compressor.compress(b"\x00" + pattern[offset:offset + row_bytes])
+            if data:
+                f.write(chunk(b"IDAT", data))
+        f.write(chunk(b"IDAT", compressor.flush()))
+        f.write(chunk(b"IEND", b""))
+
+
+def write_jpeg(path: Path, size: tuple, progressive: bool = False):
+    """噪点底图放大到目标尺寸后写出 JPEG"""
+    img = Image.effect_noise((size[0] // 16, size[1] // 16), 40).convert("RGB")
+    img = img.resize(size, Image.Resampling.BILINEAR)
+    img.save(path, "JPEG", quality=85, progressive=progressive)
+
+
+def write_animation(path: Path, size: tuple, frames: int, fmt: str):
+    """多帧动图（GIF / WebP），帧间内容不同，避免编码器合并"""
+    base = Image.effect_noise((size[0] // 8, size[1] // 8), 40).resize(size).convert("L")
+    images = [base.point(lambda v, i=i: (v + i * 9) & 0xFF) for i in range(frames)]
+    if fmt == "GIF":
+        images = [img.convert("P") for img in images]
+    images[0].save(path, fmt, save_all=True, append_images=images[1:], duration=40, loop=0)
+
+
+CORPUS = {
+    # 名称: (文件名, 生成函数)
+    "huge-png-rgba": ("huge_rgba_16384.png", lambda p: write_png(p, (16384, 16384), "RGBA")),
+    "huge-png-gray": ("huge_gray_12000.png", lambda p: write_png(p, (12000, 12000), "L")),
+    "huge-png-palette": ("huge_palette_10000.png", lambda p: write_png(p, (10000, 10000), "P")),
+    "bomb-png": ("bomb_gray_30000.png", lambda p: write_png(p, (30000, 30000), "L")),
+    "huge-jpeg": ("huge_12000.jpg", lambda p: write_jpeg(p, (12000, 12000))),
+    "huge-jpeg-progressive": ("huge_progressive_12000.jpg", lambda p: write_jpeg(p, (12000, 12000), True)),
+    "long-gif": ("long_1500x1500x80.gif", lambda p: write_animation(p, (1500, 1500), 80, "GIF")),
+    "long-webp": ("long_1500x1500x40.webp", lambda p: write_animation(p, (1500, 1500), 40, "WEBP")),
+}
+
+
+def ensure_corpus(corpus_dir: Path, names: list) -> dict:
+    corpus_dir.mkdir(parents=True, exist_ok=True)
+    paths = {}
+    for name in names:
+        filename, generate = CORPUS[name]
+        path = corpus_dir / filename
+        if not path.exists():
+            print(f"   生成 {filename} ...", flush=True)
+            tmp = path.with_name(f"{path.stem}.tmp{path.suffix}")
+            # 在子进程中生成：Linux 上子进程的 ru_maxrss 会继承 fork 时父进程的内存占用，
+            # 生成大图后的本进程会抬高之后每个测量子进程的峰值
+            subprocess.run([sys.executable, __file__, "--generate", name, str(tmp)], check=True)
+            tmp.replace(path)
+        paths[name] = path
+    return paths
+
+
+def run_child(method: str, src: Path, dest: Path, env: dict) -> tuple:
+    """
+    子进程中生成缩略图
+
+    Returns:
+        (退出码, 峰值内存字节数, 结果字典)
+    """
+    code = CHILD.format(scripts=str(scripts_dir))
+    proc = subprocess.Popen([sys.executable, "-c", code, method, str(src), str(dest)],
+                            env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    output = proc.stdout.read()
+    _, status, usage = os.wait4(proc.pid, 0)
+    # Linux 上 ru_maxrss 单位为 KB，macOS 上为字节
+    peak = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    result = {}
+    lines = output.strip().splitlines()
+    if lines:
+        try:
+            result = json.loads(lines[-1])
+        except ValueError:
+            result = {"error": lines[-1]}
+    return os.waitstatus_to_exitcode(status), peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="入库解码内存基准（病态图片语料）")
+    parser.add_argument("--budget", type=int, default=768, help="解码内存预算（MB，默认 768）")
+    parser.add_argument("--corpus", type=str, help="语料目录（默认临时目录；已存在的图片直接复用）")
+    parser.add_argument("--only", type=str, help=f"只测部分图片，逗号分隔: {','.join(CORPUS)}")
+    parser.add_argument("--no-legacy", action="store_true", help="不运行改造前写法的对照")
+    parser.add_argument("--generate", nargs=2, metavar=("NAME", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.generate:
+        name, path = args.generate
+        CORPUS[name][1](Path(path))
+        return
+
+    names = args.only.split(",") if args.only else list(CORPUS)
+    unknown = [name for name in names if name not in CORPUS]
+    if unknown:
+        print(f"❌ 未知图片: {', '.join(unknown)}")
+        sys.exit(1)
+
+    with tempfile.TemporaryDirectory(prefix="save-to-eagle-ingest-") as work_dir:
+        work_dir = Path(work_dir)
+        corpus_dir = Path(args.corpus) if args.corpus else work_dir / "corpus"
+        print(f"📁 语料: {corpus_dir}")
+        paths = ensure_corpus(corpus_dir, names)
+
+        env = {**os.environ, "SAVE_TO_EAGLE_DECODE_BUDGET_MB": str(args.budget),
+               "SAVE_TO_EAGLE_CACHE": str(work_dir / "cache")}
+        _, baseline, _ = run_child("noop", paths[names[0]], work_dir / "noop.png", env)
+        budget = args.budget * 1024 * 1024
+        print(f"💾 解码预算 {args.budget} MB，子进程基线 {baseline / 1024 / 1024:.0f} MB\n")
+
+        print(f"{'图片':<24} {'尺寸':>13} {'文件':>8} {'解码':>12} {'峰值增量':>9} {'预算内':>5} {'改造前':>9}")
+        over = 0
+        for name in names:
+            path = paths[name]
+            with Image.open(path) as img:
+                size = f"{img.width}x{img.height}"
+            file_mb = path.stat().st_size / 1024 / 1024
+
+            code, peak, result = run_child("budget", path, work_dir / f"{name}.png", env)
+            delta = max(0, peak - baseline)
+            within = code == 0 and delta <= budget
+            over += not within
+            decode = result.get("decode", "error") if code == 0 else f"exit {code}"
+
+            legacy = "-"
+            if not args.no_legacy:
+                legacy_code, legacy_peak, _ = run_child("legacy", path, work_dir / f"{name}.legacy.png", env)
+                legacy = (f"{max(0, legacy_peak - baseline) / 1024 / 1024:7.0f}MB" if legacy_code == 0
+                          else f"exit {legacy_code}")
+
+            print(f"{name:<24} {size:>13} {file_mb:6.1f}MB {decode:>12} "
+                  f"{delta / 1024 / 1024:7.0f}MB {'✅' if within else '❌':>5} {legacy:>9}", flush=True)
+
+    print()
+    if over:
+        print(f"❌ {over} 张图片超出解码预算")
+        sys.exit(1)
+    print("✅ 全部图片峰值内存在预算内")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+eagle_utils 素材库操作的规模基准（pytest-benchmark）
+
+在 1k / 10k / 100k 资源的合成素材库上测量各库操作，用于发现随库规模增长的退化:
+    rebuild_mtime_index     遍历 images/ 重建索引
+    clean_mtime_json        清理 mtime.json 异常键（每轮恢复异常键）
+    create_subfolder        在最深层文件夹下查找已有 / 新建子文件夹
+    set_folder_cover        设置最深层文件夹的封面
+    verify_asset_integrity  验证 100 个资源
+    repair_library          完整修复流程
+    library_gc.scan_library 垃圾回收扫描（只扫描，不修改）
+
+合成库由 synthetic_library.generate_library 生成，每个规模只生成一次（session 级）。
+规模可用环境变量 SAVE_TO_EAGLE_BENCH_SIZES 指定（逗号分隔），默认 1000,10000,100000。
+
+用法:
+    pip install pytest pytest-benchmark
+    pytest benchmarks/bench_library.py
+    SAVE_TO_EAGLE_BENCH_SIZES=1000,10000 pytest benchmarks/bench_library.py --benchmark-group-by=func
+    pytest benchmarks/bench_library.py --benchmark-autosave --benchmark-compare    # 与上次结果对比
+"""
+import os
+import sys
+import json
+import contextlib
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+import eagle_utils
+import library_gc
+from synthetic_library import generate_library
+
+SIZES = [int(n) for n in os.environ.get("SAVE_TO_EAGLE_BENCH_SIZES", "1000,10000,100000").split(",")]
+
+# verify_asset_integrity 每轮验证的资源数
+VERIFY_SAMPLE = 100
+
+
+@pytest.fixture(scope="session", params=SIZES, ids=lambda n: f"{n // 1000}k")
+def library(request, tmp_path_factory):
+    """生成合成素材库，并在测试期间把 eagle_utils.LIBRARY_ROOT 指向它"""
+    root = tmp_path_factory.mktemp(f"library_{request.param}")
+    info = generate_library(root, request.param)
+    info["mtime"] = (root / "mtime.json").read_bytes()
+    return info
+
+
+@pytest.fixture
+def library_root(library, monkeypatch):
+    monkeypatch.setattr(eagle_utils, "LIBRARY_ROOT", library["root"])
+    return library["root"]
+
+
+def quiet(fn, *args):
+    """屏蔽库操作的进度输出"""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        return fn(*args)
+
+
+def test_rebuild_mtime_index(benchmark, library, library_root):
+    count = benchmark(quiet, eagle_utils.rebuild_mtime_index)
+    assert count == library["assets"]
+
+
+def test_clean_mtime_json(benchmark, library, library_root):
+    mtime_path = library_root / "mtime.json"
+
+    def restore():
+        mtime_path.write_bytes(library["mtime"])
+
+    removed = benchmark.pedantic(quiet, args=(eagle_utils.clean_mtime_json,), setup=restore, rounds=10)
+    assert removed == len(set(library["bad_keys"]))
+
+
+def test_create_subfolder_existing(benchmark, library, library_root):
+    parent = library["deepest_folder"]
+    folder_id = quiet(eagle_utils.create_subfolder, parent, "已存在的文件夹")
+    assert benchmark(quiet, eagle_utils.create_subfolder, parent, "已存在的文件夹") == folder_id
+
+
+def test_create_subfolder_new(benchmark, library, library_root):
+    parent = library["deepest_folder"]
+    names = (f"新文件夹 {i}" for i in range(1_000_000))
+    # 每轮都会新增文件夹，固定轮数避免 metadata.json 在校准过程中持续变大
+    folder_id = benchmark.pedantic(lambda: quiet(eagle_utils.create_subfolder, parent, next(names)), rounds=20)
+    assert folder_id in (library_root / "metadata.json").read_text(encoding='utf-8')
+
+
+def test_set_folder_cover(benchmark, library, library_root):
+    benchmark(quiet, eagle_utils.set_folder_cover, library["deepest_folder"], library["asset_ids"][0])
+    metadata = json.loads((library_root / "metadata.json").read_text(encoding='utf-8'))
+    assert library["asset_ids"][0] in json.dumps(metadata)
+
+
+def test_verify_asset_integrity(benchmark, library, library_root):
+    sample = library["asset_ids"][:VERIFY_SAMPLE]
+
+    def verify():
+        return sum(not eagle_utils.verify_asset_integrity(asset_id)["valid"] for asset_id in sample)
+
+    invalid = benchmark(verify)
+    assert invalid == len(set(sample) & set(library["broken"]))
+
+
+def test_repair_library(benchmark, library, library_root):
+    benchmark.pedantic(quiet, args=(eagle_utils.repair_library,), rounds=3)
+    mtime = json.loads((library_root / "mtime.json").read_text(encoding='utf-8'))
+    assert len(mtime) == library["assets"]
+
+
+def test_library_gc_scan(benchmark, library, library_root):
+    # 前面的测试经原子写入消耗了 mtime.tmp，这里补回合成库中的 .tmp 残留
+    for name in ("metadata.tmp", "mtime.tmp"):
+        (library_root / name).write_text("{", encoding='utf-8')
+    report = benchmark(library_gc.scan_library, library_root, grace=0, progress=False)
+    assert report.counts == library["garbage"]
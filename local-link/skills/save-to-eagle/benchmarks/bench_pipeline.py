@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+批量归档流水线吞吐量基准
+
+用本地模拟平台对比两种执行方式：
+    - 串行：逐个作品执行 元数据 → 下载 → 入库 → 重建索引（旧版 batch_archive 的行为）
+    - 流水线：pipeline.ArchivePipeline 分阶段并发执行
+
+模拟平台的网络阶段用 sleep 表示延迟，入库阶段用 Pillow 生成并缩放图片，
+与真实的解码/缩略图开销同类（释放 GIL）。不访问网络，也不写入素材库。
+
+用法:
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --jobs 60 --metadata 0.2 --download 0.5 --image-size 3000
+"""
+import io
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+scripts_dir = Path(__file__).parent.parent / "scripts"
+sys.path.insert(0, str(scripts_dir))
+
+from PIL import Image
+from pipeline import ArchivePipeline
+from rate_limit import RateLimiter
+
+
+class MockStages:
+    """模拟平台：固定的元数据/下载延迟 + 真实的图片处理开销"""
+
+    def __init__(self, platform: str, metadata_latency: float, download_latency: float, image_size: int):
+        self.platform = platform
+        self.metadata_latency = metadata_latency
+        self.download_latency = download_latency
+        self.image_size = image_size
+
+    async def metadata(self, job: dict):
+        await asyncio.sleep(self.metadata_latency)
+
+    def download(self, job: dict):
+        time.sleep(self.download_latency)
+
+    def ingest(self, job: dict) -> dict:
+        img = Image.effect_noise((self.image_size, self.image_size), 64)
+        img.thumbnail((240, 240), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        img.save(buffer, "PNG")
+        return {"platform": self.platform, "size": buffer.tell()}
+
+
+def make_items(count: int) -> list:
+    """交替生成两个站点的作品"""
+    items = []
+    for i in range(count):
+        if i % 2:
+            items.append({"url": f"https://www.behance.net/gallery/{i}/mock"})
+        else:
+            items.append({"url": f"https://www.pixiv.net/artworks/{i}"})
+    return items
+
+
+async def run_sequential(stages: dict, items: list, index_latency: float, limiter: RateLimiter) -> float:
+    started = time.monotonic()
+    for item in items:
+        url = item["url"]
+        handler = stages["pixiv" if "pixiv" in url else "behance"]
+        job = {"url": url}
+        if limiter:
+            await limiter.acquire_async(url)
+        await handler.metadata(job)
+        handler.download(job)
+        handler.ingest(job)
+        time.sleep(index_latency)
+    return time.monotonic() - started
+
+
+async def run_pipeline(stages: dict, items: list, index_latency: float, limiter: RateLimiter) -> dict:
+    pipeline = ArchivePipeline(
+        stages,
+        limiter=limiter,
+        rebuild_index=lambda: time.sleep(index_latency)
+    )
+    return await pipeline.run(items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量归档流水线吞吐量基准")
+    parser.add_argument("--jobs", type=int, default=40, help="作品数（默认 40）")
+    parser.add_argument("--metadata", type=float, default=0.3, help="元数据延迟（秒）")
+    parser.add_argument("--download", type=float, default=0.6, help="下载延迟（秒）")
+    parser.add_argument("--index", type=float, default=0.2, help="重建索引耗时（秒）")
+    parser.add_argument("--image-size", type=int, default=2000, help="入库阶段处理的图片边长")
+    parser.add_argument("--delay", type=float, default=0.0, help="同一站点的平均间隔（秒，0 为不限速）")
+    args = parser.parse_args()
+
+    stages = {
+        platform: MockStages(platform, args.metadata, args.download, args.image_size)
+        for platform in ("pixiv", "behance")
+    }
+    items = make_items(args.jobs)
+
+    def limiter():
+        if not args.delay:
+            return None
+        return RateLimiter(args.delay * 0.5, args.delay * 1.5)
+
+    print(f"作品数: {args.jobs}，元数据 {args.metadata}s，下载 {args.download}s，"
+          f"索引 {args.index}s，图片 {args.image_size}px")
+
+    sequential = asyncio.run(run_sequential(stages, items, args.index, limiter()))
+    print(f"串行:   {sequential:6.1f} 秒, {args.jobs / sequential * 60:7.1f} 作品/分钟")
+
+    stats = asyncio.run(run_pipeline(stages, items, args.index, limiter()))
+    elapsed = stats["elapsed"]
+    print(f"流水线: {elapsed:6.1f} 秒, {args.jobs / elapsed * 60:7.1f} 作品/分钟 "
+          f"(x{sequential / elapsed:.1f})")
+    print("各阶段累计耗时: " + ", ".join(
+        f"{name} {seconds:.1f}s" for name, seconds in stats["busy"].items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+启动耗时基准
+
+对常见调用各运行多次，报告墙钟耗时（中位数 / 最小值），以及每种调用导入的模块数:
+    main.py --help                  只解析参数
+    main.py --batch <空文件>         进入批量模式（加载 batch_archive 与两个平台模块）
+    batch_archive.py --help
+    import pixiv / import behance   单条归档时按平台加载的模块
+
+--importtime 时额外用 python -X importtime 列出 main.py 单条 Pixiv 归档路径上
+自身导入耗时最多的模块（在第一次网络请求之前结束）。
+
+用法:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 20 --importtime
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+scripts_dir = Path(__file__).parent.parent / "scripts"
+
+# 统计导入模块数（在被测命令退出时输出到 stderr）
+COUNT_MODULES = "import atexit, sys; atexit.register(lambda: print('MODULES', len(sys.modules), file=sys.stderr))"
+
+
+def invocations(empty_input: Path) -> dict:
+    main = str(scripts_dir / "main.py")
+    batch = str(scripts_dir / "batch_archive.py")
+    return {
+        "main.py --help": [main, "--help"],
+        "main.py --batch <空文件>": [main, "--batch", str(empty_input)],
+        "batch_archive.py --help": [batch, "--help"],
+        "import pixiv": ["-c", f"import sys; sys.path.insert(0, {str(scripts_dir)!r}); import pixiv"],
+        "import behance": ["-c", f"import sys; sys.path.insert(0, {str(scripts_dir)!r}); import behance"],
+    }
+
+
+def run_once(args: list, env: dict) -> tuple:
+    """运行一次，返回 (耗时秒, 导入模块数)"""
+    if args[0] == "-c":
+        cmd = [sys.executable, "-c", COUNT_MODULES + "\n" + args[1]]
+    else:
+        # 通过 runpy 执行脚本，以便在同一解释器中统计模块数
+        cmd = [sys.executable, "-c",
+               COUNT_MODULES + f"\nimport runpy, sys; sys.argv = {args!r}; runpy.run_path({args[0]!r}, run_name='__main__')"]
+    started = time.perf_counter()
+    proc = subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - started
+    modules = next((int(line.split()[1]) for line in proc.stderr.splitlines() if line.startswith("MODULES")), 0)
+    return elapsed, modules
+
+
+def import_times(env: dict, top: int = 15) -> list:
+    """-X importtime 下导入 main.py 单条 Pixiv 路径所需模块，按自身耗时排序"""
+    code = (f"import sys; sys.path.insert(0, {str(scripts_dir)!r}); "
+            "import main, tracing, pixiv")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((int(self_us), int(cumulative_us), name))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动耗时基准")
+    parser.add_argument("--runs", type=int, default=10, help="每种调用运行次数（默认 10）")
+    parser.add_argument("--importtime", action="store_true", help="列出 Pixiv 单条路径上导入最慢的模块")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="save-to-eagle-startup-") as work_dir:
+        work_dir = Path(work_dir)
+        empty_input = work_dir / "empty.txt"
+        empty_input.write_text("", encoding='utf-8')
+        env = {**os.environ, "SAVE_TO_EAGLE_CACHE": str(work_dir / "cache")}
+
+        baseline = statistics.median(
+            run_once(["-c", "pass"], env)[0] for _ in range(args.runs))
+        print(f"解释器空启动: {baseline * 1000:.0f} ms（以下耗时均包含）\n")
+        print(f"{'调用':<28} {'中位数':>8} {'最小值':>8} {'模块数':>7}")
+        for name, cmd in invocations(empty_input).items():
+            samples = [run_once(cmd, env) for _ in range(args.runs)]
+            times = [elapsed for elapsed, _ in samples]
+            print(f"{name:<28} {statistics.median(times) * 1000:6.0f}ms {min(times) * 1000:6.0f}ms "
+                  f"{samples[-1][1]:7d}")
+
+        if args.importtime:
+            print("\nPixiv 单条归档路径上自身导入耗时最多的模块:")
+            print(f"{'自身(ms)':>9} {'累计(ms)':>9}  模块")
+            for self_us, cumulative_us, name in import_times(env):
+                print(f"{self_us / 1000:9.1f} {cumulative_us / 1000:9.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Pixiv / Behance 本地替身服务（离线基准测试用）
+
+模拟的接口:
+    Pixiv
+        GET /ajax/illust/{id}                     作品详情
+        GET /ajax/illust/{id}/pages               多图作品的各页地址
+        GET /ajax/illust/recommend/illusts        多 ID 批量接口（预取）
+        GET /img-original/img/.../{id}_p{n}.jpg   原图（i.pximg.net）
+    Behance
+        GET /gallery/{id}/{slug}                  项目页 HTML
+        GET /{user}、/collection/{id}/{slug}、/moodboard/{id}/{slug}
+                                                  项目列表页（滚动到底部时按 ?page=N 加载下一页）
+        GET /mir-s3-cdn-cf/project_modules/{size}/{name}.jpg   图片 CDN
+
+API 与图片用不同的主机名返回（127.0.0.1 与 localhost），
+在限速器和熔断器中各自是独立的站点，与线上的 www.pixiv.net / i.pximg.net 相似。
+
+可配置每个请求的延迟、每个连接的带宽、错误率（503 + Retry-After 或 500），
+图片为启动时生成的若干张指定尺寸的 JPEG（渐变 + 噪声，压缩后体积接近真实插画）。
+
+单独运行:
+    python benchmarks/mock_server.py --port 8765 --latency 0.1 --bandwidth 5 --error-rate 0.02
+    PIXIV_ORIGIN=http://127.0.0.1:8765 BEHANCE_ORIGIN=http://127.0.0.1:8765 python scripts/main.py ...
+"""
+import io
+import re
+import json
+import zlib
+import time
+import random
+import argparse
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image
+
+# 预生成的图片数量（按作品 ID 轮流使用）
+IMAGE_VARIANTS = 4
+
+# 带宽限制时每次写出的块大小
+CHUNK_SIZE = 64 * 1024
+
+# Behance 项目页使用的分类（与 behance.FIELD_MAP 对应）
+BEHANCE_FIELDS = ("Illustration", "Graphic Design", "Photography", "UI/UX")
+
+# Behance 项目列表页每页的项目数
+BEHANCE_LIST_PAGE_SIZE = 12
+
+# 列表页滚动到底部时加载下一页（与线上的无限滚动相同，不提供页码链接）
+BEHANCE_LIST_SCRIPT = """
+let page = 1, loading = false, done = false;
+window.addEventListener("scroll", async () => {
+  if (loading || done || window.innerHeight + window.scrollY < document.body.scrollHeight - 50) return;
+  loading = true;
+  const resp = await fetch(location.pathname + "?fragment=1&page=" + (page + 1));
+  const html = await resp.text();
+  if (html.trim()) {
+    document.querySelector("#projects").insertAdjacentHTML("beforeend", html);
+    page += 1;
+  } else {
+    done = true;
+  }
+  loading = false;
+});
+"""
+
+
+def generate_image(width: int, height: int, seed: int, quality: int = 90) -> bytes:
+    """生成一张渐变叠加噪声的 JPEG"""
+    gradient = Image.linear_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), 40 + seed * 7)
+    red = Image.blend(gradient, noise, 0.35)
+    green = gradient.rotate(90 + seed * 45).resize((width, height))
+    blue = Image.blend(noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT), 0.6)
+    img = Image.merge("RGB", (red, green, blue))
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+class MockConfig:
+    """
+    替身服务配置
+
+    Args:
+        latency: 每个请求的额外延迟（秒），实际延迟在 ±50% 内随机
+        bandwidth: 每个连接的带宽（字节/秒），None 为不限
+        error_rate: 返回错误的概率（一半 503 + Retry-After: 1，一半 500）
+        image_size: 图片尺寸 (宽, 高)
+        pages: 每个 Pixiv 作品的页数，可为区间 (最少, 最多)，按作品 ID 确定
+        behance_images: 每个 Behance 项目的图片数
+        behance_list_projects: 每个 Behance 列表页（个人主页 / 收藏集 / 情绪板）的项目数
+        seed: 随机种子（错误与延迟）
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        bandwidth: float = None,
+        error_rate: float = 0.0,
+        image_size: tuple = (2000, 2800),
+        pages: tuple = (1, 3),
+        behance_images: int = 4,
+        behance_list_projects: int = 30,
+        seed: int = 0
+    ):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.image_size = image_size
+        self.pages = pages if isinstance(pages, tuple) else (pages, pages)
+        self.behance_images = behance_images
+        self.behance_list_projects = behance_list_projects
+        self.random = random.Random(seed)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    # ---- 工具 ----
+
+    @property
+    def server_state(self):
+        return self.server.state
+
+    def send_body(self, body: bytes, content_type: str, status: int = 200, headers: dict = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+
+        bandwidth = self.server_state.config.bandwidth
+        if not bandwidth:
+            self.wfile.write(body)
+        else:
+            started = time.monotonic()
+            for offset in range(0, len(body), CHUNK_SIZE):
+                self.wfile.write(body[offset:offset + CHUNK_SIZE])
+                ahead = (offset + CHUNK_SIZE) / bandwidth - (time.monotonic() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+        self.server_state.record(len(body), status)
+
+    def send_json(self, data, status: int = 200):
+        self.send_body(json.dumps(data).encode("utf-8"), "application/json", status)
+
+    def pixiv_body(self, body):
+        self.send_json({"error": False, "message": "", "body": body})
+
+    # ---- 路由 ----
+
+    def do_GET(self):
+        state = self.server_state
+        config = state.config
+        parsed = urlparse(self.path)
+        path = parsed.path
+
+        with state.lock:
+            latency = config.latency * config.random.uniform(0.5, 1.5)
+            fail = config.random.random() < config.error_rate
+            throttle = config.random.random() < 0.5
+        if latency:
+            time.sleep(latency)
+        if fail:
+            if throttle:
+                return self.send_body(b"rate limited", "text/plain", 503, {"Retry-After": "1"})
+            return self.send_body(b"server error", "text/plain", 500)
+
+        routes = (
+            (r"/ajax/illust/recommend/illusts$", self.pixiv_recommend),
+            (r"/ajax/illust/(\d+)/pages$", self.pixiv_pages),
+            (r"/ajax/illust/(\d+)$", self.pixiv_illust),
+            (r"/img-original/img/(?:\d+/){6}(\d+)_p(\d+)\.(\w+)$", self.pixiv_image),
+            (r"/gallery/(\d+)/([^/]+)$", self.behance_gallery),
+            (r"/mir-s3-cdn-cf/project_modules/[^/]+/(\d+)_(\d+)\.(\w+)$", self.behance_image),
+            (r"/((?:collection|moodboard)/\d+/[^/]+)$", self.behance_list),
+            (r"/([A-Za-z0-9_-]+)(?:/projects)?/?$", self.behance_list),
+        )
+        for pattern, handler in routes:
+            match = re.match(pattern, path)
+            if match:
+                return handler(*match.groups(), query=parse_qs(parsed.query))
+        self.send_body(b"not found", "text/plain", 404)
+
+    # Pixiv
+
+    def page_count(self, artwork_id: int) -> int:
+        low, high = self.server_state.config.pages
+        return low + artwork_id % (high - low + 1)
+
+    def image_url(self, artwork_id: int, page: int) -> str:
+        return f"{self.server_state.image_origin}/img-original/img/2026/01/01/00/00/00/{artwork_id}_p{page}.jpg"
+
+    def pixiv_illust(self, artwork_id: str, query=None):
+        artwork_id = int(artwork_id)
+        self.pixiv_body({
+            "illustId": str(artwork_id),
+            "illustTitle": f"Mock artwork {artwork_id}",
+            "userId": str(artwork_id % 97),
+            "userName": f"mock_user_{artwork_id % 97}",
+            "pageCount": self.page_count(artwork_id),
+            "illustType": 0,
+            "urls": {"original": self.image_url(artwork_id, 0)},
+        })
+
+    def pixiv_pages(self, artwork_id: str, query=None):
+        artwork_id = int(artwork_id)
+        self.pixiv_body([
+            {"urls": {"original": self.image_url(artwork_id, page)}}
+            for page in range(self.page_count(artwork_id))
+        ])
+
+    def pixiv_recommend(self, query=None):
+        illusts = []
+        for artwork_id in (query or {}).get("illust_ids[]", []):
+            artwork_id = int(artwork_id)
+            illusts.append({
+                "id": str(artwork_id),
+                "title": f"Mock artwork {artwork_id}",
+                "userId": str(artwork_id % 97),
+                "userName": f"mock_user_{artwork_id % 97}",
+                "pageCount": self.page_count(artwork_id),
+                "illustType": 0,
+                "url": f"{self.server_state.image_origin}/c/250x250_80_a2/img-master/img/"
+                       f"2026/01/01/00/00/00/{artwork_id}_p0_square1200.jpg",
+            })
+        self.pixiv_body({"illusts": illusts})
+
+    def pixiv_image(self, artwork_id: str, page: str, ext: str, query=None):
+        if ext != "jpg":
+            return self.send_body(b"not found", "text/plain", 404)
+        self.send_body(self.server_state.image(int(artwork_id) + int(page)), "image/jpeg")
+
+    # Behance
+
+    def behance_gallery(self, gallery_id: str, slug: str, query=None):
+        gallery_id = int(gallery_id)
+        state = self.server_state
+        field = BEHANCE_FIELDS[gallery_id % len(BEHANCE_FIELDS)]
+        # 与线上相同，整宽模块直接引用 1400 尺寸，其余为 max_632（归档时另行下载 1400 尺寸）
+        images = "\n".join(
+            f'<img src="{state.image_origin}/mir-s3-cdn-cf/project_modules/{"1400" if i % 2 == 0 else "max_632"}/'
+            f'{gallery_id}_{i}.jpg" alt="" width="632">'
+            for i in range(state.config.behance_images)
+        )
+        html = f"""<!doctype html>
+<html><head><title>{slug}</title></head>
+<body>
+<h1>Mock project {gallery_id}</h1>
+<div class="Owner"><a href="https://www.behance.net/mockuser{gallery_id % 13}">Mock Owner {gallery_id % 13}</a></div>
+<div class="js-creative-field"><p>{field}</p></div>
+{images}
+</body></html>"""
+        self.send_body(html.encode("utf-8"), "text/html; charset=utf-8")
+
+    def behance_list_ids(self, key: str) -> list:
+        """列表页的项目 ID（按列表路径确定，不同列表互不重叠）"""
+        base = 500000 + zlib.crc32(key.encode("utf-8")) % 1000 * 1000
+        return [base + i for i in range(self.server_state.config.behance_list_projects)]
+
+    def behance_list(self, key: str, query=None):
+        query = query or {}
+        page = int(query.get("page", ["1"])[0])
+        ids = self.behance_list_ids(key)
+        start = (page - 1) * BEHANCE_LIST_PAGE_SIZE
+        cards = "\n".join(
+            f'<div class="ProjectCover"><a href="/gallery/{project_id}/mock-project-{project_id}">'
+            f'Mock project {project_id}</a><div style="height: 300px"></div></div>'
+            for project_id in ids[start:start + BEHANCE_LIST_PAGE_SIZE]
+        )
+        if "fragment" in query:
+            return self.send_body(cards.encode("utf-8"), "text/html; charset=utf-8")
+        html = f"""<!doctype html>
+<html><head><title>{key}</title></head>
+<body>
+<h1>{key}</h1>
+<div id="projects">
+{cards}
+</div>
+<script>{BEHANCE_LIST_SCRIPT}</script>
+</body></html>"""
+        self.send_body(html.encode("utf-8"), "text/html; charset=utf-8")
+
+    def behance_image(self, gallery_id: str, index: str, ext: str, query=None):
+        self.send_body(self.server_state.image(int(gallery_id) + int(index)), "image/jpeg")
+
+
+class MockState:
+    """请求计数与预生成的图片"""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.bytes = 0
+        self.image_origin = ""
+        width, height = config.image_size
+        self.images = [generate_image(width, height, seed) for seed in range(IMAGE_VARIANTS)]
+
+    def image(self, key: int) -> bytes:
+        return self.images[key % len(self.images)]
+
+    def record(self, nbytes: int, status: int):
+        with self.lock:
+            self.requests += 1
+            self.bytes += nbytes
+            if status >= 400:
+                self.errors += 1
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.errors = 0
+            self.bytes = 0
+
+
+class MockServer:
+    """
+    在后台线程中运行的替身服务
+
+    Example:
+        >>> with MockServer(MockConfig(latency=0.1)) as server:
+        ...     env = {"PIXIV_ORIGIN": server.origin, "BEHANCE_ORIGIN": server.origin}
+    """
+
+    def __init__(self, config: MockConfig = None, port: int = 0):
+        self.config = config or MockConfig()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), MockHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = MockState(self.config)
+        self.port = self.httpd.server_port
+        # API 与图片用不同主机名，模拟 www.pixiv.net / i.pximg.net 两个站点
+        self.origin = f"http://127.0.0.1:{self.port}"
+        self.httpd.state.image_origin = f"http://localhost:{self.port}"
+        self._thread = None
+
+    @property
+    def state(self) -> MockState:
+        return self.httpd.state
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pixiv / Behance 本地替身服务")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="每个请求的延迟（秒）")
+    parser.add_argument("--bandwidth", type=float, help="每个连接的带宽（MB/s）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="错误率（0-1）")
+    parser.add_argument("--image-size", default="2000x2800", help="图片尺寸，如 2000x2800")
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.image_size.lower().split("x"))
+    config = MockConfig(
+        latency=args.latency,
+        bandwidth=args.bandwidth * 1024 * 1024 if args.bandwidth else None,
+        error_rate=args.error_rate,
+        image_size=(width, height)
+    )
+    server = MockServer(config, port=args.port)
+    print(f"mock 服务: {server.origin}（图片 {len(server.state.images[0]) / 1024:.0f} KB/张）")
+    print(f"   PIXIV_ORIGIN={server.origin} BEHANCE_ORIGIN={server.origin}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+合成 Eagle 素材库生成器（基准测试用）
+
+生成与真实素材库结构一致的临时库:
+    metadata.json           多层文件夹树（含 Pixiv / Behance 根文件夹）
+    mtime.json              资源 ID → 修改时间，混入少量异常键（文件夹 ID 等）
+    images/{id}.info/       每个资源的 metadata.json、图片、_thumbnail.png
+
+资源的字段、文件名和所属文件夹按真实归档结果生成；图片和缩略图默认复用
+同一份小尺寸编码数据（只影响磁盘占用，不影响各库操作的开销），
+可用 image_size 生成真实尺寸的图片。另按比例制造缺缩略图、
+metadata.json 损坏等异常资源，供 verify_asset_integrity / repair_library 检出；
+以及已删除资源、孤立缩略图、空 .info 目录和 .tmp 残留，供 library_gc 回收。
+
+用法:
+    python benchmarks/synthetic_library.py /tmp/lib10k --assets 10000
+    SAVE_TO_EAGLE_LIBRARY=/tmp/lib10k python scripts/main.py ...
+"""
+import io
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+
+scripts_dir = Path(__file__).parent.parent / "scripts"
+sys.path.insert(0, str(scripts_dir))
+
+from PIL import Image
+from eagle_utils import FOLDER_IDS
+
+ID_CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+FOLDER_ID_CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+# 混入 mtime.json 的异常键比例（相对资源数）
+BAD_KEY_RATIO = 0.01
+
+# 异常资源比例
+MISSING_THUMBNAIL_RATIO = 0.005
+BROKEN_METADATA_RATIO = 0.001
+
+# 垃圾回收对象的比例（见 library_gc.py）：已删除资源、孤立缩略图、入库中断留下的空目录
+DELETED_RATIO = 0.01
+ORPHAN_THUMBNAIL_RATIO = 0.005
+EMPTY_INFO_RATIO = 0.001
+
+
+def encode_image(size: tuple, fmt: str, seed: int = 0) -> bytes:
+    img = Image.effect_noise(size, 30 + seed).convert("RGB")
+    buffer = io.BytesIO()
+    if fmt == "JPEG":
+        img.save(buffer, fmt, quality=85)
+    else:
+        img.save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def build_folder_tree(rng: random.Random, depth: int, breadth: int) -> tuple:
+    """
+    生成文件夹树
+
+    Pixiv 下按作者分组（宽而浅），Behance 分类文件夹下再嵌套 depth 层项目文件夹。
+
+    Returns:
+        (顶层文件夹列表, 全部文件夹 ID 列表, 最深文件夹 ID)
+    """
+    now_ms = int(time.time() * 1000)
+    all_ids = []
+
+    def folder(folder_id: str, name: str) -> dict:
+        all_ids.append(folder_id)
+        return {
+            "id": folder_id, "name": name, "description": "", "children": [],
+            "modificationTime": now_ms, "tags": [], "password": "", "passwordTips": ""
+        }
+
+    def new_id() -> str:
+        return "".join(rng.choices(FOLDER_ID_CHARS, k=11))
+
+    pixiv = folder(FOLDER_IDS["Pixiv"], "Pixiv")
+    for i in range(breadth * 4):
+        pixiv["children"].append(folder(new_id(), f"Pixiv Artist {i} ({i + 1000})"))
+
+    behance = folder("BEHANCEROOT00", "Behance")
+    deepest = None
+    for name, folder_id in FOLDER_IDS["Behance"].items():
+        category = folder(folder_id, name)
+        behance["children"].append(category)
+        level = [category]
+        for d in range(depth):
+            next_level = []
+            for parent in level:
+                for b in range(breadth if d < 2 else 1):
+                    child = folder(new_id(), f"{parent['name']} / 项目 {d}-{b}")
+                    parent["children"].append(child)
+                    next_level.append(child)
+            level = next_level
+        deepest = level[-1]["id"]
+
+    return [pixiv, behance], all_ids, deepest
+
+
+def generate_library(
+    root: Path,
+    assets: int,
+    depth: int = 4,
+    breadth: int = 5,
+    image_size: tuple = None,
+    seed: int = 0
+) -> dict:
+    """
+    生成合成素材库
+
+    Args:
+        root: 素材库目录（不存在时创建）
+        assets: 资源数
+        depth: Behance 分类文件夹下的嵌套层数
+        breadth: 每层的子文件夹数
+        image_size: 图片尺寸 (宽, 高)，默认使用 64x64 的小图
+        seed: 随机种子
+
+    Returns:
+        {"root", "assets", "asset_ids", "folder_ids", "deepest_folder", "bad_keys", "broken", "garbage"}，
+        garbage 为 library_gc 各类别应发现的数量
+    """
+    rng = random.Random(seed)
+    root = Path(root)
+    images_dir = root / "images"
+    images_dir.mkdir(parents=True, exist_ok=True)
+
+    folders, folder_ids, deepest = build_folder_tree(rng, depth, breadth)
+    (root / "metadata.json").write_text(json.dumps({
+        "folders": folders,
+        "smartFolders": [],
+        "quickAccess": [],
+        "tagsGroups": [],
+        "modificationTime": int(time.time() * 1000),
+        "applicationVersion": "4.0.0",
+    }, ensure_ascii=False, indent=2), encoding='utf-8')
+
+    size = image_size or (64, 64)
+    image_bytes = encode_image(size, "JPEG", seed)
+    thumb_size = (min(240, size[0]), min(240, size[1]))
+    thumb_bytes = encode_image(thumb_size, "PNG", seed)
+
+    now_ms = int(time.time() * 1000)
+    asset_ids = []
+    broken = []
+    garbage = {"orphan_info": 0, "staging": 0, "deleted": 0, "orphan_thumbnail": 0}
+    mtime = {}
+    for i in range(assets):
+        asset_id = "K" + "".join(rng.choices(ID_CHARS, k=12))
+        asset_dir = images_dir / f"{asset_id}.info"
+        asset_dir.mkdir()
+        pixiv = i % 3 != 0
+        name = f"{100000 + i}_p{i % 4}" if pixiv else f"Project {i} - 0{i % 8 + 1}"
+        image = asset_dir / f"{name}.jpg"
+        image.write_bytes(image_bytes)
+
+        roll = rng.random()
+        if roll >= MISSING_THUMBNAIL_RATIO:
+            (asset_dir / f"{name}_thumbnail.png").write_bytes(thumb_bytes)
+
+        # 各类异常按 roll 所在区间互斥分配
+        band = roll - MISSING_THUMBNAIL_RATIO - BROKEN_METADATA_RATIO
+        deleted = 0 <= band < DELETED_RATIO
+        if DELETED_RATIO <= band < DELETED_RATIO + ORPHAN_THUMBNAIL_RATIO:
+            (asset_dir / f"{name}_old_thumbnail.png").write_bytes(thumb_bytes)
+            garbage["orphan_thumbnail"] += 1
+
+        created = now_ms - rng.randrange(0, 3 * 365 * 86400_000)
+        metadata = {
+            "id": asset_id,
+            "name": name,
+            "size": len(image_bytes),
+            "btime": created,
+            "mtime": created,
+            "ext": "jpg",
+            "width": size[0],
+            "height": size[1],
+            "orientation": 1,
+            "modificationTime": created,
+            "lastModified": created,
+            "folders": [rng.choice(folder_ids)],
+            "tags": [],
+            "isDeleted": deleted,
+            "url": f"https://www.pixiv.net/artworks/{100000 + i}" if pixiv
+                   else f"https://www.behance.net/gallery/{100000 + i}/project",
+            "annotation": f"作者: mock_user_{i % 97}",
+            "palettes": [],
+            "star": i % 6,
+        }
+        content = json.dumps(metadata, ensure_ascii=False, indent=2)
+        if MISSING_THUMBNAIL_RATIO <= roll < MISSING_THUMBNAIL_RATIO + BROKEN_METADATA_RATIO:
+            content = content[:len(content) // 2]
+            broken.append(asset_id)
+            garbage["orphan_info"] += 1
+        garbage["deleted"] += deleted
+        (asset_dir / "metadata.json").write_text(content, encoding='utf-8')
+
+        asset_ids.append(asset_id)
+        mtime[asset_id] = created
+
+    # 旧版本写入 mtime.json 的异常键：文件夹 ID、带扩展名的键等
+    bad_keys = []
+    for i in range(max(1, int(assets * BAD_KEY_RATIO))):
+        key = rng.choice(folder_ids) if i % 2 else f"{rng.choice(asset_ids)}.info"
+        mtime[key] = now_ms
+        bad_keys.append(key)
+    (root / "mtime.json").write_text(json.dumps(mtime, ensure_ascii=False), encoding='utf-8')
+
+    # 入库中断留下的空目录，以及原子写入残留的 .tmp
+    for _ in range(int(assets * EMPTY_INFO_RATIO)):
+        (images_dir / f"K{''.join(rng.choices(ID_CHARS, k=12))}.info").mkdir()
+        garbage["orphan_info"] += 1
+    for name in ("metadata.tmp", "mtime.tmp"):
+        (root / name).write_text("{", encoding='utf-8')
+        garbage["staging"] += 1
+
+    return {
+        "root": root,
+        "assets": assets,
+        "asset_ids": asset_ids,
+        "folder_ids": folder_ids,
+        "deepest_folder": deepest,
+        "bad_keys": bad_keys,
+        "broken": broken,
+        "garbage": garbage,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成 Eagle 素材库")
+    parser.add_argument("root", help="素材库目录")
+    parser.add_argument("--assets", type=int, default=10000, help="资源数（默认 10000）")
+    parser.add_argument("--depth", type=int, default=4, help="文件夹嵌套层数（默认 4）")
+    parser.add_argument("--breadth", type=int, default=5, help="每层子文件夹数（默认 5）")
+    parser.add_argument("--image-size", help="图片尺寸，如 2000x2800（默认 64x64）")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    root = Path(args.root)
+    if (root / "metadata.json").exists():
+        print(f"❌ {root} 已存在素材库，请指定空目录")
+        sys.exit(1)
+
+    image_size = tuple(int(v) for v in args.image_size.lower().split("x")) if args.image_size else None
+    started = time.monotonic()
+    library = generate_library(root, args.assets, args.depth, args.breadth, image_size, args.seed)
+    print(f"✅ 已生成 {library['assets']} 个资源、{len(library['folder_ids'])} 个文件夹，"
+          f"耗时 {time.monotonic() - started:.1f} 秒")
+    print(f"   异常: mtime.json 键 {len(library['bad_keys'])} 个，损坏的 metadata.json {len(library['broken'])} 个")
+    print(f"   垃圾: {', '.join(f'{k} {v}' for k, v in library['garbage'].items())}")
+    print(f"   SAVE_TO_EAGLE_LIBRARY={root}")
+
+
+if __name__ == "__main__":
+    main()
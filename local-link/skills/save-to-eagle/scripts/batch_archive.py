@@ -4,6 +4,11 @@ save-to-eagle 批量归档脚本
 
 带反爬虫速率限制的批量归档模式。当 URL 数量 > 6 时自动启用。
 
+归档按流水线执行（见 pipeline.py）：元数据 → 下载 → 入库 → 索引，
+各阶段之间有界队列衔接，前一个作品入库时下一个作品已在下载。
+每个站点（pixiv.net、behance.net）各自一个令牌桶，不同站点之间并行，互不等待；
+间隔会根据 429/403 和响应延迟自适应调整（AIMD）。
+
 使用方式:
     # 从 JSON 文件批量归档
     python batch_archive.py --input urls.json
@@ -11,16 +16,46 @@ save-to-eagle 批量归档脚本
     # 直接传入多个 URL
     python batch_archive.py --urls "url1" "url2" --stars 4 5
 
+    # 流式输入：JSONL 或每行一个 URL（逐行读取，内存占用与文件大小无关）
+    python batch_archive.py --input urls.jsonl
+    cat urls.txt | python batch_archive.py --input - --stars 3
+
+    # 中断后继续：跳过已成功的作品，重试失败的作品
+    python batch_archive.py --resume ~/.cache/save-to-eagle/journals/batch_20260301_120000.jsonl
+    python batch_archive.py --input urls.json --resume batch.jsonl
+
+追踪:
+    --trace trace.json 写出 Chrome trace-event 时间线（每个作品一条轨道），
+    可在 https://ui.perfetto.dev 中查看各阶段与等待（见 tracing.py）。
+
+性能剖析:
+    --profile [DIR] 记录 cProfile、调用栈采样和 tracemalloc 快照（--profile-interval 秒一次），
+    结束时写出热点函数与分配位置排名（见 profiling.py）。
+
+指标:
+    --metrics-dir 指定目录后，每 --metrics-interval 秒和结束时写出
+    Prometheus textfile（save_to_eagle.prom）和 JSON 摘要（metrics.json），
+    包含各阶段耗时分位数（p50/p95/p99）、字节/秒、图片/分钟（见 metrics.py）。
+
+进度日志:
+    每个作品完成后立即追加到 JSONL 进度日志（默认在 ~/.cache/save-to-eagle/journals/，
+    可用 --journal 指定），中断或崩溃不会丢失已完成的进度。
+
 JSON 格式示例:
     [
         {"url": "https://www.pixiv.net/artworks/123456", "star": 4},
         {"url": "https://www.pixiv.net/artworks/123457", "star": 5}
     ]
+
+JSONL / URL 列表格式示例:
+    {"url": "https://www.pixiv.net/artworks/123456", "star": 4}
+    https://www.pixiv.net/member_illust.php?mode=medium&illust_id=123457 5
+    https://www.behance.net/gallery/123456/project
+
+URL 会被规范化（见 batch_input.py），同一作品重复出现时只归档一次。
 """
 import sys
 import json
-import time
-import random
 import asyncio
 import argparse
 from pathlib import Path
@@ -30,18 +65,16 @@ from datetime import datetime
 scripts_dir = Path(__file__).parent
 sys.path.insert(0, str(scripts_dir))
 
-from pixiv import archive_pixiv
-from behance import archive_behance, extract_project_data
-
-
-def detect_platform(url: str) -> str:
-    """检测 URL 所属平台"""
-    url_lower = url.lower()
-    if "pixiv.net" in url_lower:
-        return "pixiv"
-    if "behance.net" in url_lower:
-        return "behance"
-    return None
+from pixiv import PixivStages, extract_artwork_id, get_client, PREFETCH_CHUNK_SIZE
+from behance import BehanceStages
+from pipeline import ArchivePipeline, detect_platform
+from eagle_utils import BrowserPool, get_browser_pool, set_browser_pool, set_decode_budget
+from rate_limit import RateLimiter, host_key, set_limiter
+from metrics import Metrics, set_metrics
+import tracing
+from retry import BREAKERS
+from batch_input import SeenSet, dedup_items, read_items
+from journal import ProgressJournal, default_journal_path, load_journal, resume_items
 
 
 def create_batch_template():
@@ -59,80 +92,237 @@ def create_batch_template():
     return template_path
 
 
-async def archive_single(url: str, star: int = 0, single: bool = False):
-    """归档单个 URL"""
-    platform = detect_platform(url)
+def prefetch_pixiv_metadata(items, chunk_size: int = PREFETCH_CHUNK_SIZE):
+    """
+    元数据预取阶段
+
+    每攒够 chunk_size 个条目，先通过多 ID 接口批量获取其中 Pixiv 作品的信息
+    （页数、原图地址）写入缓存，再把这批条目交给下载阶段。
+    预取失败时不影响归档，各作品回退到逐个获取。
+    """
+    client = get_client()
+    buffer = []
+
+    def flush():
+        ids = []
+        for item in buffer:
+            url = item.get("url", item.get("link", ""))
+            if detect_platform(url) != "pixiv":
+                continue
+            try:
+                ids.append(extract_artwork_id(url))
+            except ValueError:
+                pass
+        if not ids:
+            return
+        try:
+            count = client.prefetch_artworks(ids)
+            print(f"\n🔎 预取 Pixiv 元数据: {count}/{len(ids)} 个作品")
+        except Exception as e:
+            print(f"\n⚠️ 批量预取失败，回退到逐个获取: {e}")
 
-    if not platform:
-        raise ValueError(f"不支持的 URL: {url}")
+    for item in items:
+        buffer.append(item)
+        if len(buffer) >= chunk_size:
+            flush()
+            yield from buffer
+            buffer = []
 
-    if platform == "pixiv":
-        return archive_pixiv(url, star, single=single)
-    elif platform == "behance":
-        behance_data = await extract_project_data(url)
-        return archive_behance(url, star, behance_data)
+    if buffer:
+        flush()
+        yield from buffer
 
 
 async def batch_archive(
-    items: list,
+    items,
     delay_min: float = 4.0,
     delay_max: float = 8.0,
     single: bool = False,
-    log_file: str = None
+    log_file: str = None,
+    on_result=None,
+    prefetch: bool = True,
+    bandwidth: float = None,
+    journal_file: str = None,
+    resume: bool = False,
+    metrics_dir: str = None,
+    metrics_interval: float = 30.0,
+    trace_file: str = None,
+    ugoira_format: str = "webp",
+    read_ahead: int = None
 ):
     """
-    批量归档，带速率限制
+    批量归档，按站点限速
 
     Args:
-        items: URL 列表，格式为 [{"url": "...", "star": 4}, ...]
-        delay_min: 最小延迟（秒）
-        delay_max: 最大延迟（秒）
+        items: URL 列表或迭代器，格式为 [{"url": "...", "star": 4}, ...]
+               传入生成器时按需逐条读取（总数未知），此时不在内存中保留逐条结果（除非指定 log_file）；
+               URL 会被规范化，重复的作品只归档一次
+        delay_min: 同一站点的最小间隔（秒），自适应加速的上限
+        delay_max: 同一站点的初始间隔上限（秒）
         single: 仅下载第一张图（仅 Pixiv 多图作品有效）
         log_file: 日志文件路径（可选）
+        on_result: 每个作品完成后的回调 on_result(item, record)（可选）
+        prefetch: 是否批量预取 Pixiv 元数据（默认开启）
+        bandwidth: 全局带宽上限（字节/秒，可选）
+        journal_file: 进度日志路径（JSONL），默认按启动时间生成
+        resume: 从 journal_file 继续：跳过已成功的作品；items 为 None 时只重试失败的作品
+        metrics_dir: 指标输出目录（可选），定期写出 Prometheus textfile 和 JSON 摘要
+        metrics_interval: 指标写出间隔（秒）
+        trace_file: 时间线追踪输出路径（Chrome trace-event JSON，可选）
+        ugoira_format: Pixiv 动图输出格式，"webp" 或 "gif"
+        read_ahead: 每个站点最多提前读入的作品数（可选）；默认尽量多读（见 pipeline.MAX_BACKLOG），
+                    输入是按需翻页的枚举时设小值，流水线需要时才读取下一条
     """
-    total = len(items)
-    print(f"📦 共 {total} 个作品需要归档")
-    print(f"⏱️  速率限制: 每个作品间隔 {delay_min}-{delay_max} 秒")
-    print(f"🕐 预计耗时: {total * (delay_min + delay_max) / 2 / 60:.1f} 分钟")
+    journal_path = Path(journal_file) if journal_file else default_journal_path()
+    seen = SeenSet()
+    if items is not None:
+        items = dedup_items(items, seen)
+    if resume:
+        records = load_journal(journal_path)
+        done = sum(1 for record in records.values() if record.get("status") == "success")
+        print(f"♻️  继续上次的批量: 已成功 {done} 个, 失败 {len(records) - done} 个")
+        from_journal = items is None
+        items = resume_items(items, records)
+        if from_journal:
+            items = dedup_items(items, seen)
+
+    total = len(items) if hasattr(items, "__len__") else None
+    if total is not None:
+        print(f"📦 共 {total} 个作品需要归档")
+    else:
+        print("📦 流式输入，作品数未知")
+    print(f"⏱️  速率限制: 同一站点每个作品间隔 {delay_min}-{delay_max} 秒（自适应），不同站点并行")
+    if bandwidth:
+        print(f"📶 带宽上限: {bandwidth / 1024 / 1024:.1f} MB/s")
+    if total is not None:
+        per_host = {}
+        for item in items:
+            host = host_key(item.get("url", item.get("link", "")))
+            per_host[host] = per_host.get(host, 0) + 1
+        busiest = max(per_host.values(), default=0)
+        print(f"🕐 预计耗时: {busiest * (delay_min + delay_max) / 2 / 60:.1f} 分钟")
+    print(f"📒 进度日志: {journal_path}")
     print("=" * 50)
 
     success = 0
     failed = []
     results = []
-
-    for i, item in enumerate(items, 1):
-        url = item.get("url", item.get("link", ""))
-        star = item.get("star", item.get("rating", 0))
-
-        print(f"\n[{i}/{total}] {url}")
-
-        try:
-            result = await archive_single(url, star=star, single=single)
+    count = 0
+    # 流式输入时逐条结果只写进度日志，内存占用不随输入增长
+    keep_results = total is not None or log_file is not None
+
+    client = get_client()
+    requests_before = client.requests_made
+    if prefetch:
+        items = prefetch_pixiv_metadata(items)
+
+    limiter = RateLimiter(delay_min, delay_max, bandwidth=bandwidth)
+    set_limiter(limiter)
+    metrics = Metrics()
+    set_metrics(metrics)
+
+    def on_done(job: dict):
+        nonlocal success, count
+        count += 1
+        url = job["url"]
+        progress = f"{job['index']}/{total}" if total is not None else f"{job['index']}"
+
+        if job["error"] is None:
             success += 1
-            results.append({"url": url, "status": "success", "result": result})
-            print(f"   ✅ 成功 ({i}/{total})")
-        except Exception as e:
-            error_msg = str(e)
-            print(f"   ❌ 失败: {error_msg}")
+            record = {"url": url, "status": "success", "result": job["result"]}
+            print(f"   ✅ [{progress}] 成功: {url}")
+        else:
+            error_msg = job["error"]
+            print(f"   ❌ [{progress}] 失败: {url}: {error_msg}")
             failed.append({"url": url, "error": error_msg})
-            results.append({"url": url, "status": "failed", "error": error_msg})
-
-        # 延迟（最后一个不等待）
-        if i < total:
-            delay = random.uniform(delay_min, delay_max)
-            print(f"   ⏳ 等待 {delay:.1f} 秒...")
-            time.sleep(delay)
+            record = {"url": url, "status": "failed", "error": error_msg}
+
+        if keep_results:
+            results.append(record)
+        journal.append(job["item"], record)
+        if on_result:
+            on_result(job["item"], record)
+
+    pipeline = ArchivePipeline(
+        {
+            "pixiv": PixivStages(client=client, single=single, ugoira_format=ugoira_format),
+            "behance": BehanceStages(),
+        },
+        limiter=limiter,
+        on_done=on_done,
+        **({"host_queue_size": read_ahead, "max_backlog": 1} if read_ahead else {})
+    )
+
+    async def write_metrics():
+        while True:
+            await asyncio.sleep(metrics_interval)
+            await asyncio.to_thread(metrics.write, metrics_dir)
+
+    # Behance 项目共用一个浏览器（首次用到时才启动）；调用方已设置浏览器池时直接复用
+    browser_pool = None
+    if get_browser_pool() is None:
+        browser_pool = BrowserPool()
+        set_browser_pool(browser_pool)
+
+    journal = ProgressJournal(journal_path)
+    if trace_file:
+        tracing.start(trace_file)
+    writer = asyncio.create_task(write_metrics()) if metrics_dir else None
+    try:
+        stats = await pipeline.run(items)
+    finally:
+        set_limiter(None)
+        set_metrics(None)
+        if browser_pool is not None:
+            set_browser_pool(None)
+            await browser_pool.close()
+        journal.close()
+        if trace_file:
+            tracing.stop()
+        if writer:
+            writer.cancel()
+            metrics.write(metrics_dir)
+
+    total = count
+    metadata_requests = client.requests_made - requests_before
+    hosts = limiter.summary()
+    summary = metrics.summary()
 
     # 输出结果
     print("\n" + "=" * 50)
     print(f"归档完成 ✅")
     print(f"成功: {success}/{total}")
     print(f"失败: {len(failed)}")
+    if seen.duplicates:
+        print(f"重复 URL: {seen.duplicates} 个（已跳过）")
+    print(f"Pixiv 元数据请求: {metadata_requests} 次")
+    print(f"总耗时: {stats['elapsed']:.1f} 秒（各阶段累计: " + ", ".join(
+        f"{name} {seconds:.1f}s" for name, seconds in stats["busy"].items()) + "）")
+    for host, host_stats in hosts.items():
+        print(
+            f"   {host}: {host_stats['requests']} 个作品, {host_stats['per_minute']:.1f} 个/分钟, "
+            f"当前间隔 {host_stats['interval']:.1f} 秒, 限流 {host_stats['throttled']} 次"
+        )
+    for host, trips in BREAKERS.summary().items():
+        print(f"   {host}: 熔断暂停 {trips} 次")
+    print(f"吞吐: {summary['artworks_per_minute']:.1f} 作品/分钟, {summary['images_per_minute']:.1f} 图片/分钟, "
+          f"{summary['bytes_per_second'] / 1024 / 1024:.2f} MB/s")
+    captured_bytes = summary["counters"].get("captured_bytes", 0)
+    if captured_bytes:
+        print(f"浏览器响应复用: {summary['counters'].get('captured_images', 0)} 张图片, "
+              f"节省下载 {captured_bytes / 1024 / 1024:.1f} MB")
+    print(f"{'阶段':<16}{'次数':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'累计':>9}")
+    for name, hist in summary["stages"].items():
+        print(f"{name:<16}{hist['count']:>6}{hist['p50']:>8.2f}s{hist['p95']:>8.2f}s"
+              f"{hist['p99']:>8.2f}s{hist['sum']:>8.1f}s")
+    if metrics_dir:
+        print(f"📈 指标已写出: {metrics_dir}")
 
     if failed:
         print("\n失败列表:")
         for f in failed:
             print(f"  - {f['url']}: {f['error']}")
+        print(f"\n重试失败的作品: python {Path(__file__).name} --resume {journal_path}")
 
     # 保存日志
     if log_file:
@@ -143,6 +333,10 @@ async def batch_archive(
             "total": total,
             "success": success,
             "failed": len(failed),
+            "metadata_requests": metadata_requests,
+            "hosts": hosts,
+            "stages": stats["busy"],
+            "metrics": summary,
             "results": results
         }
         log_path.write_text(json.dumps(log_data, ensure_ascii=False, indent=2))
@@ -152,22 +346,43 @@ async def batch_archive(
         "total": total,
         "success": success,
         "failed": len(failed),
+        "metadata_requests": metadata_requests,
+        "hosts": hosts,
+        "metrics": summary,
+        "journal": str(journal_path),
         "results": results
     }
 
 
-def main():
+def main(argv: list = None):
+    """命令行入口；argv 为 None 时读取 sys.argv（main.py --batch 在同一进程中调用）"""
     parser = argparse.ArgumentParser(description="批量归档网络图片到 Eagle 素材库")
-    parser.add_argument("--input", "-i", type=str, help="JSON 文件路径，包含 URL 列表")
+    parser.add_argument("--input", "-i", type=str,
+                        help="输入文件：JSON 数组、JSONL 或每行一个 URL，\"-\" 表示标准输入")
     parser.add_argument("--urls", "-u", nargs="+", help="直接传入 URL 列表")
-    parser.add_argument("--stars", "-s", nargs="+", type=int, help="评分列表（与 --urls 一一对应）")
+    parser.add_argument("--stars", "-s", nargs="+", type=int,
+                        help="评分列表（与 --urls 一一对应；与 --input 同用时为未指定评分条目的默认值）")
     parser.add_argument("--delay-min", type=float, default=4.0, help="最小延迟（秒，默认 4）")
     parser.add_argument("--delay-max", type=float, default=8.0, help="最大延迟（秒，默认 8）")
     parser.add_argument("--single", action="store_true", help="仅下载第一张图")
+    parser.add_argument("--ugoira-format", choices=["webp", "gif"], default="webp", help="Pixiv 动图输出格式（默认 webp）")
+    parser.add_argument("--no-prefetch", action="store_true", help="不批量预取 Pixiv 元数据")
+    parser.add_argument("--bandwidth", type=float, help="全局带宽上限（MB/s，默认不限）")
+    parser.add_argument("--memory-budget", type=int, metavar="MB",
+                        help="入库解码的内存上限（MB，默认 768；超出的图片使用占位缩略图）")
     parser.add_argument("--log", "-l", type=str, help="日志文件路径")
+    parser.add_argument("--journal", type=str, help="进度日志路径（JSONL，默认自动生成）")
+    parser.add_argument("--resume", type=str, metavar="JOURNAL",
+                        help="从进度日志继续：跳过已成功的作品，重试失败的作品")
+    parser.add_argument("--metrics-dir", type=str, help="指标输出目录（Prometheus textfile + metrics.json）")
+    parser.add_argument("--metrics-interval", type=float, default=30.0, help="指标写出间隔（秒，默认 30）")
+    parser.add_argument("--trace", type=str, help="写出时间线追踪（Chrome trace-event JSON）")
+    parser.add_argument("--profile", nargs="?", const="", metavar="DIR",
+                        help="性能剖析（CPU + 内存），报告写到 DIR（默认 ~/.cache/save-to-eagle/profiles/）")
+    parser.add_argument("--profile-interval", type=float, default=30.0, help="内存快照间隔（秒，默认 30）")
     parser.add_argument("--template", action="store_true", help="创建模板文件")
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     # 创建模板
     if args.template:
@@ -178,20 +393,15 @@ def main():
     items = []
 
     if args.input:
-        input_path = Path(args.input)
-        if not input_path.exists():
-            print(f"❌ 输入文件不存在: {input_path}")
+        if args.input != "-" and not Path(args.input).exists():
+            print(f"❌ 输入文件不存在: {args.input}")
             sys.exit(1)
 
-        data = json.loads(input_path.read_text())
-
-        # 支持两种格式：数组或对象
-        if isinstance(data, list):
-            items = data
-        elif isinstance(data, dict) and "urls" in data:
-            items = data["urls"]
-        else:
-            print("❌ JSON 格式错误，应为数组或包含 'urls' 键的对象")
+        # JSON 数组整体读入；JSONL / URL 列表 / 标准输入逐行读取
+        try:
+            items = read_items(args.input, default_star=args.stars[0] if args.stars else 0)
+        except ValueError as e:
+            print(f"❌ {e}")
             sys.exit(1)
 
     elif args.urls:
@@ -202,6 +412,10 @@ def main():
 
         items = [{"url": url, "star": star} for url, star in zip(args.urls, stars)]
 
+    elif args.resume:
+        # 只给出进度日志时，重试其中失败的作品
+        items = None
+
     else:
         print("❌ 请提供 --input 或 --urls 参数")
         print(f"用法: python {__file__} --input urls.json")
@@ -209,10 +423,23 @@ def main():
         print(f"      python {__file__} --template  # 创建模板")
         sys.exit(1)
 
-    if not items:
+    if isinstance(items, list) and not items:
         print("❌ URL 列表为空")
         sys.exit(1)
 
+    if args.resume and not Path(args.resume).exists():
+        print(f"❌ 进度日志不存在: {args.resume}")
+        sys.exit(1)
+
+    if args.memory_budget:
+        set_decode_budget(args.memory_budget)
+
+    profiler = None
+    if args.profile is not None:
+        from profiling import Profiler
+        profiler = Profiler(args.profile or None, memory_interval=args.profile_interval)
+        profiler.start()
+
     # 执行批量归档
     try:
         asyncio.run(batch_archive(
@@ -220,16 +447,27 @@ def main():
             delay_min=args.delay_min,
             delay_max=args.delay_max,
             single=args.single,
-            log_file=args.log
+            log_file=args.log,
+            prefetch=not args.no_prefetch,
+            bandwidth=args.bandwidth * 1024 * 1024 if args.bandwidth else None,
+            journal_file=args.resume or args.journal,
+            resume=bool(args.resume),
+            metrics_dir=args.metrics_dir,
+            metrics_interval=args.metrics_interval,
+            trace_file=args.trace,
+            ugoira_format=args.ugoira_format
         ))
     except KeyboardInterrupt:
-        print("\n\n⚠️ 用户中断")
+        print("\n\n⚠️ 用户中断，已完成的作品记录在进度日志中，可用 --resume 继续")
         sys.exit(1)
     except Exception as e:
         print(f"\n❌ 批量归档失败: {e}")
         import traceback
         traceback.print_exc()
         sys.exit(1)
+    finally:
+        if profiler:
+            profiler.stop()
 
 
 if __name__ == "__main__":
@@ -2,13 +2,18 @@
 """
 Behance 项目归档到 Eagle
 """
+import os
 import re
 import json
+import time
+import shutil
 import asyncio
+import tempfile
 from pathlib import Path
 from urllib.parse import urlparse
 from eagle_utils import (
     LIBRARY_ROOT,
+    LIBRARY_LOCK,
     FOLDER_IDS,
     create_eagle_asset,
     create_subfolder,
@@ -17,6 +22,26 @@ from eagle_utils import (
     download_image,
     extract_with_playwright
 )
+import metrics
+import tracing
+
+# Behance 站点根地址（可用环境变量指向本地 mock 服务）
+BEHANCE_ORIGIN = os.environ.get("BEHANCE_ORIGIN", "https://www.behance.net")
+
+# HAR 目录：设置后每个项目页录制为 {目录}/{项目 ID}.har，再次提取时从 HAR 离线回放
+BEHANCE_HAR_DIR = os.environ.get("BEHANCE_HAR_DIR")
+
+# HAR 模式（见 har.HAR_MODES）
+BEHANCE_HAR_MODE = os.environ.get("BEHANCE_HAR_MODE", "auto")
+
+# 归档的图片尺寸：1400px 是 Behance 支持的最大尺寸（/original/ 路径不存在）
+IMAGE_SIZE = "1400"
+
+# 每个项目最多截留的浏览器响应字节数（写入临时文件，不占内存），超出的图片改为下载
+CAPTURE_LIMIT = 256 * 1024 * 1024
+
+# 已归档项目记录（跟随素材库；资源的来源 URL 是图片地址，无法反查项目 ID）
+ARCHIVED_PATH = LIBRARY_ROOT / ".save-to-eagle" / "behance_archived.jsonl"
 
 # Behance 分类映射
 FIELD_MAP = {
@@ -58,6 +83,34 @@ def extract_project_info(url: str) -> dict:
     }
 
 
+def load_archived_ids(path: Path = None) -> set:
+    """读取已归档的 Behance 项目 ID"""
+    path = Path(path or ARCHIVED_PATH)
+    ids = set()
+    if not path.exists():
+        return ids
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                ids.add(int(json.loads(line)["id"]))
+            except (ValueError, KeyError, TypeError):
+                continue
+    return ids
+
+
+def mark_archived(url: str, title: str, images: int):
+    """记录已归档的项目（追加一行 JSON）"""
+    try:
+        project_id = int(extract_project_info(url)["id"])
+    except ValueError:
+        return
+    record = {"id": project_id, "url": url, "title": title, "images": images, "t": int(time.time())}
+    with LIBRARY_LOCK:
+        ARCHIVED_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(ARCHIVED_PATH, "a", encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
 def get_target_folder_id(creative_fields: list) -> str:
     """
     根据 Creative Fields 列表获取目标文件夹 ID
@@ -80,7 +133,76 @@ def get_target_folder_id(creative_fields: list) -> str:
     return FOLDER_IDS["Behance"]["未分类"]
 
 
-async def extract_project_data(url: str) -> dict:
+def wanted_image_url(src: str) -> str:
+    """页面中的图片地址 → 要归档的尺寸（IMAGE_SIZE 的 JPG 版本）"""
+    # 替换为最大可用尺寸
+    src = src.replace("/max_632_webp/", f"/{IMAGE_SIZE}_webp/")
+    src = src.replace("/max_632/", f"/{IMAGE_SIZE}/")
+    # 移除 _webp 后缀获取 JPG 版本（兼容性更好）
+    src = src.replace(f"/{IMAGE_SIZE}_webp/", f"/{IMAGE_SIZE}/")
+    return src
+
+
+class ImageCapture:
+    """
+    截留页面加载时浏览器已下载的项目图片
+
+    监听页面的 response 事件，地址已是归档尺寸（wanted_image_url 不改变）的
+    project_modules 图片把响应体写入 directory 下的临时文件，下载阶段直接移入，
+    不再用 requests 重复下载；内存中只有正在写出的一张。
+    其他尺寸、读取失败或超出 limit 的图片照常下载。
+
+    Args:
+        directory: 截留文件的存放目录
+        limit: 最多保留的字节数
+    """
+
+    def __init__(self, directory: Path, limit: int = CAPTURE_LIMIT):
+        self.directory = Path(directory)
+        self.limit = limit
+        self.size = 0
+        self.files = {}
+        self._pending = []
+
+    def attach(self, page):
+        page.on("response", self._on_response)
+
+    def _on_response(self, response):
+        url = response.url
+        if "project_modules" not in url or response.status != 200 or wanted_image_url(url) != url:
+            return
+        self._pending.append(asyncio.ensure_future(self._read(response)))
+
+    async def _read(self, response):
+        try:
+            body = await response.body()
+        except Exception:
+            # 页面已关闭、响应被重定向等取不到响应体时改为下载
+            return
+        if response.url in self.files or self.size + len(body) > self.limit:
+            return
+        path = self.directory / f"capture_{len(self.files)}"
+        self.files[response.url] = path
+        self.size += len(body)
+        await asyncio.to_thread(path.write_bytes, body)
+
+    async def wait(self):
+        """等待已开始读取的响应体（须在页面关闭前调用）"""
+        if self._pending:
+            await asyncio.gather(*self._pending)
+            self._pending = []
+
+
+def discard_captures(project_data: dict):
+    """删除未被下载阶段使用的截留文件，以及 extract_project_data 自建的截留目录"""
+    for path in (project_data.pop("captured", None) or {}).values():
+        Path(path).unlink(missing_ok=True)
+    capture_dir = project_data.pop("capture_dir", None)
+    if capture_dir:
+        shutil.rmtree(capture_dir, ignore_errors=True)
+
+
+async def extract_project_data(url: str, capture_images: bool = True, har=None, capture_dir: Path = None) -> dict:
     """
     从 Behance 项目页面提取数据
 
@@ -88,12 +210,23 @@ async def extract_project_data(url: str) -> dict:
 
     Args:
         url: Behance 项目 URL
+        capture_images: 截留浏览器加载页面时已下载的归档尺寸图片（见 ImageCapture）
+        har: har.HarArchive，从 HAR 离线回放项目页或录制 HAR；
+             未指定且设置了 BEHANCE_HAR_DIR 时使用 {BEHANCE_HAR_DIR}/{项目 ID}.har
+        capture_dir: 截留文件的存放目录（批量时为作品的下载目录），默认新建临时目录；
+                     未被下载阶段使用的文件（和新建的临时目录）由 discard_captures 删除
 
     Returns:
-        项目数据字典，包含 title, creativeField, author, images
+        项目数据字典，包含 title, creativeField, author, images；
+        capture_images 时另含 captured: {图片 URL: 截留文件路径}，新建临时目录时另含 capture_dir
+        （均为字符串，可序列化为 JSON）
     """
+    capture = None
+    if capture_images:
+        capture = ImageCapture(capture_dir or tempfile.mkdtemp(prefix="behance_capture_"))
+
     async def extract_fn(page):
-        return await page.evaluate("""() => {
+        data = await page.evaluate("""() => {
             const images = [];
             document.querySelectorAll("img").forEach((img) => {
                 if (img.src && img.src.includes("mir-s3-cdn")) {
@@ -157,84 +290,75 @@ async def extract_project_data(url: str) -> dict:
                 images: uniqueImages
             };
         }""")
+        if capture is not None:
+            await capture.wait()
+            # 只保留项目图片，其他模块（推荐、头像等）的响应体丢弃
+            wanted = {wanted_image_url(image["src"]) for image in data.get("images", [])}
+            data["captured"] = {src: str(path) for src, path in capture.files.items() if src in wanted}
+            if capture_dir is None:
+                data["capture_dir"] = str(capture.directory)
+            for src, path in capture.files.items():
+                if src not in wanted:
+                    path.unlink(missing_ok=True)
+        return data
+
+    page_url = url
+    if BEHANCE_ORIGIN != "https://www.behance.net":
+        info = extract_project_info(url)
+        page_url = f"{BEHANCE_ORIGIN}/gallery/{info['id']}/{info['slug']}"
+
+    if har is None and BEHANCE_HAR_DIR:
+        from har import HarArchive
+        har = HarArchive(Path(BEHANCE_HAR_DIR) / f"{extract_project_info(url)['id']}.har", BEHANCE_HAR_MODE)
 
     # 使用泛化提取函数，优先 networkidle 获取 Creative Fields，失败则降级
-    return await extract_with_playwright(
-        url,
-        extract_fn,
-        wait_strategies=["networkidle", "domcontentloaded"],
-        timeout=90000,
-        extra_wait=2.0
-    )
-
-
-def archive_behance(url: str, star: int, project_data: dict):
+    try:
+        return await extract_with_playwright(
+            page_url,
+            extract_fn,
+            wait_strategies=["networkidle", "domcontentloaded"],
+            timeout=90000,
+            extra_wait=2.0,
+            on_page=capture.attach if capture is not None else None,
+            har=har
+        )
+    except BaseException:
+        if capture is not None:
+            for path in capture.files.values():
+                path.unlink(missing_ok=True)
+            if capture_dir is None:
+                shutil.rmtree(capture.directory, ignore_errors=True)
+        raise
+
+
+def download_behance(project_data: dict, temp_dir: Path) -> tuple:
     """
-    归档 Behance 项目到 Eagle
+    下载阶段：下载项目的所有图片到临时目录
 
-    Args:
-        url: Behance 项目 URL
-        star: 评分（1-5星，0表示无评分）
-        project_data: 从浏览器提取的项目数据
-            {
-                "title": "项目名称",
-                "creativeField": "Illustration",
-                "author": "作者名",
-                "images": [
-                    {"src": "图片URL", "alt": "描述", "width": 1400, "height": 900}
-                ]
-            }
-    """
-    print(f"🎨 正在归档 Behance 项目...")
-    print(f"   URL: {url}")
+    单张图片失败不影响其他图片。页面加载时浏览器已下载的图片（project_data["captured"]）
+    直接移入临时目录，不再下载；节省的字节数记入 project_data["bytes_saved"]。
 
+    Returns:
+        (downloads, failed)
+        downloads: [{"index", "name", "src", "path", "captured"}, ...]
+        failed: [{"index", "error"}, ...]
+    """
     title = project_data.get("title", "Unknown")
-    creative_fields = project_data.get("creativeFields", [])
-    author = project_data.get("author", "Unknown")
     images = project_data.get("images", [])
-
-    print(f"   标题: {title}")
-    print(f"   作者: {author}")
-    print(f"   分类: {creative_fields}")
-    print(f"   图片数: {len(images)}")
-
-    if not images:
-        raise ValueError("没有找到可下载的图片")
-
-    # 确定目标文件夹（取第一个匹配的字段，默认未分类）
-    target_folder_id = get_target_folder_id(creative_fields)
-    folder_name = creative_fields[0] if creative_fields else "未分类"
-    print(f"\n📁 目标文件夹: {FIELD_MAP.get(folder_name, '未分类')}")
-
-    # 创建项目子文件夹
     safe_name = sanitize_filename(title, max_len=60)
-    project_folder_id = create_subfolder(
-        target_folder_id,
-        safe_name,
-        description=f"作者: {author}"
-    )
-    print(f"   创建项目文件夹: {safe_name}")
+    # 截留文件只在下载阶段使用，取出后不再随作品数据传递
+    captured = project_data.pop("captured", None) or {}
 
-    # 下载所有图片
-    temp_dir = Path("/tmp/behance_download")
-    temp_dir.mkdir(exist_ok=True)
-
-    downloaded = []
+    downloads = []
     failed = []
+    saved = 0
 
     print(f"\n📥 开始下载 {len(images)} 张图片...")
 
     for i, img_info in enumerate(images, 1):
         try:
             # 获取原图 URL
-            src = img_info.get("src", "")
-            # 替换为最大可用尺寸 (1400px 是 Behance 支持的最大尺寸)
-            # 注意：/original/ 路径不存在，使用 /1400/ 作为最大尺寸
-            src = src.replace("/max_632_webp/", "/1400_webp/")
-            src = src.replace("/max_632/", "/1400/")
-            # 如果已经是 /1400/ 或 /1400_webp/，保持不变
-            # 移除 _webp 后缀获取 JPG 版本（兼容性更好）
-            src = src.replace("/1400_webp/", "/1400/")
+            src = wanted_image_url(img_info.get("src", ""))
 
             alt = img_info.get("alt", "")
 
@@ -250,42 +374,96 @@ def archive_behance(url: str, star: int, project_data: dict):
                 ext = "jpg"
 
             temp_path = temp_dir / f"img_{i}.{ext}"
-            download_image(
-                src,
-                temp_path,
-                headers={"Referer": "https://www.behance.net/"}
-            )
+            capture_path = captured.pop(src, None)
+            if capture_path is not None:
+                saved += Path(capture_path).stat().st_size
+                shutil.move(capture_path, temp_path)
+            else:
+                with tracing.span("image", cat="download", index=i):
+                    download_image(
+                        src,
+                        temp_path,
+                        headers={"Referer": "https://www.behance.net/"}
+                    )
+
+            downloads.append({"index": i, "name": img_name, "src": src, "path": temp_path,
+                              "captured": capture_path is not None})
+
+        except Exception as e:
+            failed.append({"index": i, "error": str(e)})
+            print(f"   ❌ 图片 {i} 下载失败: {e}")
+
+    # 同一地址出现多次时只移入了第一次，剩余的截留文件删除
+    discard_captures({"captured": captured})
+
+    reused = sum(1 for entry in downloads if entry["captured"])
+    if reused:
+        print(f"   ♻️ {reused}/{len(images)} 张图片取自页面加载时的响应，节省 {saved / 1024 / 1024:.1f} MB")
+        metrics.add("captured_images", reused)
+        metrics.add("captured_bytes", saved)
+    project_data["bytes_saved"] = saved
 
+    return downloads, failed
+
+
+def ingest_behance(url: str, star: int, project_data: dict, downloads: list, failed: list) -> dict:
+    """
+    入库阶段：创建项目文件夹和 Eagle 资源（不重建索引）
+
+    Returns:
+        归档结果字典
+    """
+    title = project_data.get("title", "Unknown")
+    creative_fields = project_data.get("creativeFields", [])
+    author = project_data.get("author", "Unknown")
+
+    # 确定目标文件夹（取第一个匹配的字段，默认未分类）
+    target_folder_id = get_target_folder_id(creative_fields)
+    folder_name = creative_fields[0] if creative_fields else "未分类"
+    print(f"\n📁 目标文件夹: {FIELD_MAP.get(folder_name, '未分类')}")
+
+    # 创建项目子文件夹
+    safe_name = sanitize_filename(title, max_len=60)
+    project_folder_id = create_subfolder(
+        target_folder_id,
+        safe_name,
+        description=f"作者: {author}"
+    )
+    print(f"   创建项目文件夹: {safe_name}")
+
+    downloaded = []
+    failed = list(failed)
+
+    for entry in downloads:
+        try:
             # 创建 Eagle 资源
             metadata = create_eagle_asset(
-                image_path=temp_path,
-                name=img_name,
+                image_path=entry["path"],
+                name=entry["name"],
                 folder_id=project_folder_id,
-                source_url=src,
+                source_url=entry["src"],
                 annotation=f"作者: {author}",
                 tags=[],
                 star=star
             )
 
             downloaded.append({
-                "name": img_name,
+                "name": entry["name"],
                 "width": metadata["width"],
                 "height": metadata["height"],
                 "size": metadata["size"]
             })
 
-            print(f"   ✅ {img_name}")
+            print(f"   ✅ {entry['name']}")
 
         except Exception as e:
-            failed.append({"index": i, "error": str(e)})
-            print(f"   ❌ 图片 {i} 下载失败: {e}")
+            failed.append({"index": entry["index"], "error": str(e)})
+            print(f"   ❌ 图片 {entry['index']} 入库失败: {e}")
 
-    # 重建索引
-    rebuild_mtime_index()
+    failed.sort(key=lambda f: f["index"])
 
-    # 清理临时文件
-    import shutil
-    shutil.rmtree(temp_dir, ignore_errors=True)
+    if downloaded:
+        mark_archived(url, title, len(downloaded))
 
     # 返回结果
     return {
@@ -295,5 +473,82 @@ def archive_behance(url: str, star: int, project_data: dict):
         "creative_field": creative_fields[0] if creative_fields else "",
         "url": url,
         "downloaded": downloaded,
-        "failed": failed
+        "failed": failed,
+        "bytes_saved": project_data.get("bytes_saved", 0)
     }
+
+
+class BehanceStages:
+    """批量流水线中 Behance 项目的各阶段（见 pipeline.py）"""
+
+    platform = "behance"
+
+    async def metadata(self, job: dict):
+        # 截留文件直接写入作品的下载目录，失败时随下载目录一起由流水线清理
+        job["temp_dir"] = Path(tempfile.mkdtemp(prefix="behance_download_"))
+        job["project_data"] = await extract_project_data(job["url"], capture_dir=job["temp_dir"])
+        if not job["project_data"].get("images"):
+            raise ValueError("没有找到可下载的图片")
+
+    def download(self, job: dict):
+        job["downloads"], job["download_failed"] = download_behance(job["project_data"], job["temp_dir"])
+
+    def ingest(self, job: dict) -> dict:
+        return ingest_behance(
+            job["url"], job["star"], job["project_data"],
+            job["downloads"], job["download_failed"]
+        )
+
+
+def archive_behance(url: str, star: int, project_data: dict):
+    """
+    归档 Behance 项目到 Eagle
+
+    依次执行下载、入库两个阶段，最后重建索引。
+    批量归档时这些阶段由 pipeline.py 分别调度。
+
+    Args:
+        url: Behance 项目 URL
+        star: 评分（1-5星，0表示无评分）
+        project_data: 从浏览器提取的项目数据
+            {
+                "title": "项目名称",
+                "creativeField": "Illustration",
+                "author": "作者名",
+                "images": [
+                    {"src": "图片URL", "alt": "描述", "width": 1400, "height": 900}
+                ]
+            }
+    """
+    print(f"🎨 正在归档 Behance 项目...")
+    print(f"   URL: {url}")
+
+    title = project_data.get("title", "Unknown")
+    creative_fields = project_data.get("creativeFields", [])
+    author = project_data.get("author", "Unknown")
+    images = project_data.get("images", [])
+
+    print(f"   标题: {title}")
+    print(f"   作者: {author}")
+    print(f"   分类: {creative_fields}")
+    print(f"   图片数: {len(images)}")
+
+    if not images:
+        discard_captures(project_data)
+        raise ValueError("没有找到可下载的图片")
+
+    temp_dir = Path(tempfile.mkdtemp(prefix="behance_download_"))
+    try:
+        with tracing.span("download", cat="stage"):
+            downloads, failed = download_behance(project_data, temp_dir)
+        with tracing.span("ingest", cat="stage"):
+            result = ingest_behance(url, star, project_data, downloads, failed)
+    finally:
+        # 清理临时文件
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        discard_captures(project_data)
+
+    # 重建索引
+    rebuild_mtime_index()
+
+    return result
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Behance 批量归档：个人主页 / 收藏集 / 情绪板
+
+在常驻浏览器中打开列表页，逐页（滚动加载）枚举项目，流式送入批量归档流程；
+列表页与各项目页共用同一个浏览器进程，每个项目只新建一个页面。
+已归档过的项目（见 behance.ARCHIVED_PATH）直接跳过。
+
+用法:
+    # 个人主页的全部项目
+    python behance_sync.py https://www.behance.net/someone --star 3
+
+    # 收藏集 / 情绪板
+    python behance_sync.py https://www.behance.net/collection/123456/Inspiration
+    python behance_sync.py https://www.behance.net/moodboard/123456/Refs
+
+    # 只列出将要归档的项目，不下载
+    python behance_sync.py https://www.behance.net/someone --dry-run
+
+枚举是惰性的：流水线只提前读入少量项目（READ_AHEAD），需要更多项目时才滚动加载下一页，--limit 达到后不再翻页。
+"""
+import re
+import sys
+import asyncio
+import argparse
+import contextlib
+from pathlib import Path
+from urllib.parse import urlparse
+
+# 添加脚本目录到路径
+scripts_dir = Path(__file__).parent
+sys.path.insert(0, str(scripts_dir))
+
+from behance import BEHANCE_ORIGIN, load_archived_ids
+from eagle_utils import BrowserPool, get_browser_pool, set_browser_pool, set_decode_budget, load_page_with_fallback
+
+# 列表页路径中不是用户名的第一级路径
+RESERVED_PATHS = {
+    "gallery", "galleries", "search", "joblist", "assets", "hire", "live", "blog",
+    "about", "login", "signup", "onboarding", "pro", "misc", "dev", "v2", "v3",
+}
+
+# 滚动后等待新项目出现的时间（秒），超时视为已到末页
+SCROLL_TIMEOUT = 15.0
+
+# 等待期间检查新项目的间隔（秒）
+SCROLL_POLL = 0.5
+
+# 流水线每站点最多提前读入的项目数：略多于 metadata 并发数即可让工作协程不空等，
+# 再多只会提前翻完列表页（限速下每个项目要等数秒）
+READ_AHEAD = 4
+
+# 列表页占用一个页面，项目页最多同时打开 2 个（pipeline 中 metadata 阶段每站点并发数）
+POOL_PAGES = 3
+
+# 列表页中项目链接的 href（绝对地址）
+COLLECT_LINKS = """() => [...document.querySelectorAll('a[href*="/gallery/"]')].map(a => a.href)"""
+
+# 无限滚动加载失败时，尝试点击"加载更多"按钮
+CLICK_LOAD_MORE = """() => {
+    const button = [...document.querySelectorAll('button, a[role="button"]')]
+        .find(el => /load more|see more|show more|加载更多|查看更多/i.test(el.textContent));
+    if (button) {
+        button.click();
+        return true;
+    }
+    return false;
+}"""
+
+GALLERY_LINK_PATTERN = re.compile(r"/gallery/(\d+)(?:/([^/?#]+))?")
+
+
+def parse_list_url(url: str) -> dict:
+    """
+    解析 Behance 列表页 URL
+
+    Returns:
+        {"kind": "profile" | "collection" | "moodboard", "key": 来源标识, "path": 页面路径}
+
+    Raises:
+        ValueError: 不是个人主页 / 收藏集 / 情绪板 URL
+    """
+    parsed = urlparse(url if "://" in url else f"https://{url}")
+    if not parsed.netloc.lower().endswith("behance.net"):
+        raise ValueError(f"不是 Behance URL: {url}")
+    parts = [part for part in parsed.path.split("/") if part]
+
+    if len(parts) >= 2 and parts[0] in ("collection", "moodboard") and parts[1].isdigit():
+        slug = parts[2] if len(parts) > 2 else parts[0]
+        return {
+            "kind": parts[0],
+            "key": f"{parts[0]}:{parts[1]}",
+            "path": f"/{parts[0]}/{parts[1]}/{slug}",
+        }
+
+    if parts and parts[0].lower() not in RESERVED_PATHS and (len(parts) == 1 or parts[1] == "projects"):
+        return {"kind": "profile", "key": f"profile:{parts[0]}", "path": f"/{parts[0]}"}
+
+    raise ValueError(f"无法识别的 Behance 列表 URL（支持个人主页、收藏集、情绪板）: {url}")
+
+
+def gallery_url(project_id: int, slug: str) -> str:
+    return f"https://www.behance.net/gallery/{project_id}/{slug}"
+
+
+class ProjectLister:
+    """
+    在浏览器中逐页枚举列表页的项目
+
+    next_page() 第一次调用时打开列表页，之后每次滚动到底部（或点击"加载更多"）
+    并等待新项目出现，返回本页新出现的项目；到达末页后返回空列表。
+    须在浏览器池所在的事件循环中调用。
+
+    Args:
+        url: 列表页 URL
+        pool: 浏览器池
+    """
+
+    def __init__(self, url: str, pool: BrowserPool):
+        self.source = parse_list_url(url)
+        self.page_url = f"{BEHANCE_ORIGIN}{self.source['path']}"
+        self.pool = pool
+        self.pages = 0
+        self.exhausted = False
+        self._seen = set()
+        self._page = None
+        self._stack = None
+
+    async def _collect(self) -> list:
+        """返回页面上尚未见过的项目 [{"id", "url"}, ...]"""
+        projects = []
+        for href in await self._page.evaluate(COLLECT_LINKS):
+            match = GALLERY_LINK_PATTERN.search(urlparse(href).path)
+            if not match:
+                continue
+            project_id = int(match.group(1))
+            if project_id in self._seen:
+                continue
+            self._seen.add(project_id)
+            projects.append({"id": project_id, "url": gallery_url(project_id, match.group(2) or "project")})
+        return projects
+
+    async def next_page(self) -> list:
+        if self.exhausted:
+            return []
+
+        if self._page is None:
+            self._stack = contextlib.AsyncExitStack()
+            self._page = await self._stack.enter_async_context(self.pool.page())
+            strategy = await load_page_with_fallback(
+                self._page, self.page_url,
+                timeout=90000,
+                wait_strategies=["networkidle", "domcontentloaded"],
+                extra_wait=1.0
+            )
+            print(f"   列表页加载成功 (策略: {strategy})")
+            projects = await self._collect()
+        else:
+            # 滚动到底部触发下一页；虚拟列表会移除已滚过的卡片，按项目 ID 判断是否有新内容
+            await self._page.evaluate("() => window.scrollTo(0, document.body.scrollHeight)")
+            projects = []
+            clicked = False
+            waited = 0.0
+            while not projects and waited < SCROLL_TIMEOUT:
+                await asyncio.sleep(SCROLL_POLL)
+                waited += SCROLL_POLL
+                projects = await self._collect()
+                if not projects and not clicked and waited >= SCROLL_TIMEOUT / 2:
+                    clicked = await self._page.evaluate(CLICK_LOAD_MORE)
+
+        if not projects:
+            self.exhausted = True
+        else:
+            self.pages += 1
+        return projects
+
+    async def close(self):
+        if self._stack is not None:
+            await self._stack.aclose()
+            self._stack = None
+            self._page = None
+
+
+def iter_projects(lister: ProjectLister, loop, skip: set = None, limit: int = None, stats: dict = None):
+    """
+    逐个产出列表中的项目（同步生成器）
+
+    在 pipeline 的读取线程中运行，每页通过 run_coroutine_threadsafe 交给 loop 执行；
+    只有流水线取完当前页的项目后才加载下一页。
+
+    Args:
+        lister: ProjectLister
+        loop: 浏览器池所在的事件循环
+        skip: 跳过的项目 ID（已归档）
+        limit: 最多产出的项目数
+        stats: 计数 {"listed", "skipped"}（可选，原地更新）
+
+    Yields:
+        {"id", "url"}
+    """
+    skip = skip or set()
+    stats = stats if stats is not None else {}
+    stats.setdefault("listed", 0)
+    stats.setdefault("skipped", 0)
+    count = 0
+    while limit is None or count < limit:
+        projects = asyncio.run_coroutine_threadsafe(lister.next_page(), loop).result()
+        if not projects:
+            return
+        for project in projects:
+            if limit is not None and count >= limit:
+                return
+            stats["listed"] += 1
+            if project["id"] in skip:
+                stats["skipped"] += 1
+                continue
+            count += 1
+            yield project
+
+
+async def sync_behance(
+    url: str,
+    star: int = 0,
+    limit: int = None,
+    dry_run: bool = False,
+    include_archived: bool = False,
+    **batch_kwargs
+) -> dict:
+    """
+    归档 Behance 个人主页 / 收藏集 / 情绪板中的项目
+
+    Args:
+        url: 列表页 URL
+        star: 评分
+        limit: 本次最多归档的项目数（可选）
+        dry_run: 只列出项目，不归档
+        include_archived: 不跳过已归档的项目
+        **batch_kwargs: 透传给 batch_archive（delay_min, delay_max, log_file 等）
+
+    Returns:
+        batch_archive 的结果字典（另含 listed / skipped / pages）
+    """
+    source = parse_list_url(url)
+    skip = set() if include_archived else load_archived_ids()
+
+    print(f"🎨 Behance {source['kind']}: {url}")
+    if skip:
+        print(f"   已归档项目: {len(skip)} 个（跳过）")
+
+    # 列表页与项目页共用一个浏览器；守护进程等已设置浏览器池时直接复用
+    pool = get_browser_pool()
+    own_pool = pool is None
+    if own_pool:
+        pool = BrowserPool(max_pages=POOL_PAGES)
+        set_browser_pool(pool)
+
+    lister = ProjectLister(url, pool)
+    loop = asyncio.get_running_loop()
+    stats = {"listed": 0, "skipped": 0}
+    projects = iter_projects(lister, loop, skip=skip, limit=limit, stats=stats)
+
+    try:
+        if dry_run:
+            def list_projects():
+                count = 0
+                for project in projects:
+                    count += 1
+                    print(f"   {project['url']}")
+                return count
+
+            count = await asyncio.to_thread(list_projects)
+            print(f"共 {count} 个项目待归档（列表 {stats['listed']} 个，已归档 {stats['skipped']} 个，{lister.pages} 页）")
+            result = {"total": count, "success": 0, "failed": 0, "results": []}
+        else:
+            from batch_archive import batch_archive
+            items = ({"url": project["url"], "star": star} for project in projects)
+            # 不做 Pixiv 预取：预取按 50 条攒批，会提前翻完好几页列表；
+            # 流水线默认的大积压同理，只提前读入 READ_AHEAD 个
+            result = await batch_archive(items, prefetch=False, read_ahead=READ_AHEAD, **batch_kwargs)
+            print(f"📃 列表 {lister.pages} 页，共 {stats['listed']} 个项目，跳过已归档 {stats['skipped']} 个")
+    finally:
+        await lister.close()
+        if own_pool:
+            set_browser_pool(None)
+            await pool.close()
+
+    return {**result, "listed": stats["listed"], "skipped": stats["skipped"], "pages": lister.pages}
+
+
+def main(argv: list = None):
+    """命令行入口；argv 为 None 时读取 sys.argv（main.py 在同一进程中调用）"""
+    parser = argparse.ArgumentParser(description="归档 Behance 个人主页 / 收藏集 / 情绪板到 Eagle 素材库")
+    parser.add_argument("url", help="个人主页、收藏集或情绪板 URL")
+    parser.add_argument("--star", type=int, default=0, help="评分 (1-5星，默认为0)")
+    parser.add_argument("--limit", type=int, help="本次最多归档的项目数")
+    parser.add_argument("--dry-run", action="store_true", help="只列出项目，不归档")
+    parser.add_argument("--include-archived", action="store_true", help="不跳过已归档的项目")
+    parser.add_argument("--delay-min", type=float, default=4.0, help="最小延迟（秒，默认 4）")
+    parser.add_argument("--delay-max", type=float, default=8.0, help="最大延迟（秒，默认 8）")
+    parser.add_argument("--log", "-l", type=str, help="日志文件路径")
+    parser.add_argument("--bandwidth", type=float, help="全局带宽上限（MB/s，默认不限）")
+    parser.add_argument("--memory-budget", type=int, metavar="MB", help="入库解码的内存上限（MB，可选）")
+    parser.add_argument("--trace", type=str, help="写出时间线追踪（Chrome trace-event JSON）")
+    parser.add_argument("--profile", nargs="?", const="", metavar="DIR",
+                        help="性能剖析（CPU + 内存），报告写到 DIR（默认 ~/.cache/save-to-eagle/profiles/）")
+    parser.add_argument("--profile-interval", type=float, default=30.0, help="内存快照间隔（秒，默认 30）")
+    args = parser.parse_args(argv)
+
+    try:
+        parse_list_url(args.url)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    if args.memory_budget:
+        set_decode_budget(args.memory_budget)
+
+    profiler = None
+    if args.profile is not None:
+        from profiling import Profiler
+        profiler = Profiler(args.profile or None, memory_interval=args.profile_interval)
+        profiler.start()
+
+    try:
+        asyncio.run(sync_behance(
+            args.url,
+            star=args.star,
+            limit=args.limit,
+            dry_run=args.dry_run,
+            include_archived=args.include_archived,
+            delay_min=args.delay_min,
+            delay_max=args.delay_max,
+            log_file=args.log,
+            bandwidth=args.bandwidth * 1024 * 1024 if args.bandwidth else None,
+            trace_file=args.trace
+        ))
+    except KeyboardInterrupt:
+        print("\n\n⚠️ 用户中断，已归档的项目会在下次跳过")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n❌ 归档失败: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        if profiler:
+            profiler.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,580 @@
+#!/usr/bin/env python3
+"""
+归档守护进程
+
+常驻进程，保持 Pixiv 会话（cookies 只读一次）、Playwright 浏览器、
+按站点的限速器和熔断器处于热状态。归档任务通过本地 HTTP 接口提交，
+由一条长期运行的批量流水线（pipeline.py）执行，与 batch_archive 共用各阶段实现。
+
+监听地址:
+    默认 Unix socket ~/.cache/save-to-eagle/daemon.sock（创建时即为 0600，只有当前用户可连接）
+    --port 时改为 127.0.0.1 上的 TCP 端口；本机其他用户和网页也能连到该端口，
+    因此每个请求都须在 X-Daemon-Token 头中带上启动时生成的随机令牌
+运行中的地址（TCP 模式含令牌）记录在 ~/.cache/save-to-eagle/daemon.json（权限 0600），
+main.py 据此自动把单条归档交给守护进程。
+
+接口（JSON）:
+    POST /jobs              提交 {"url": ..., "star": 0, "single": false, "ugoira_format": "webp"}
+                            返回 202 与任务记录
+    GET  /jobs              最近的任务（?status=queued|running|success|failed）
+    GET  /jobs/{id}         任务状态与结果；?wait=N 时最多等待 N 秒直到任务结束
+    GET  /health            进程信息与各状态任务数
+    GET  /metrics           Prometheus 文本格式的阶段指标（见 metrics.py）
+    POST /shutdown          处理完已提交的任务后退出
+
+完成的任务另追加到进度日志 ~/.cache/save-to-eagle/journals/daemon.jsonl。
+
+用法:
+    python daemon.py                      # 前台运行（可交给 launchd / nohup）
+    python daemon.py --port 8777 --delay-min 2 --delay-max 4
+    python daemon.py --status
+    python daemon.py --stop
+"""
+import os
+import sys
+import json
+import time
+import hmac
+import uuid
+import queue
+import socket
+import secrets
+import argparse
+import threading
+import http.client
+import socketserver
+from pathlib import Path
+from collections import OrderedDict
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 与 eagle_utils.CACHE_ROOT 一致；这里不导入 eagle_utils，客户端只依赖标准库
+CACHE_ROOT = Path(os.environ.get("SAVE_TO_EAGLE_CACHE", Path.home() / ".cache" / "save-to-eagle"))
+
+# 运行中守护进程的地址
+STATE_PATH = CACHE_ROOT / "daemon.json"
+DEFAULT_SOCKET = CACHE_ROOT / "daemon.sock"
+
+# 保留的已结束任务数（更早的只在进度日志中）
+FINISHED_JOBS_KEPT = 1000
+
+# GET /jobs/{id}?wait= 单次最长等待（秒），客户端循环等待
+MAX_WAIT = 30
+
+# 客户端探测守护进程的超时（秒）
+PROBE_TIMEOUT = 0.5
+
+FINISHED = ("success", "failed")
+
+# TCP 模式下携带令牌的请求头
+TOKEN_HEADER = "X-Daemon-Token"
+
+
+# ---- 客户端 ----
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """通过 Unix socket 连接的 HTTP 连接"""
+
+    def __init__(self, path: str, timeout: float = None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class DaemonClient:
+    """
+    守护进程客户端（只依赖标准库）
+
+    Args:
+        address: {"socket": 路径} 或 {"port": 端口}
+        token: TCP 模式的访问令牌
+    """
+
+    def __init__(self, address: dict, token: str = None):
+        self.address = address
+        self.token = token
+
+    def request(self, method: str, path: str, body: dict = None, timeout: float = MAX_WAIT + 10) -> tuple:
+        """发送请求，返回 (状态码, JSON 数据)"""
+        if self.address.get("socket"):
+            conn = UnixHTTPConnection(self.address["socket"], timeout=timeout)
+        else:
+            conn = http.client.HTTPConnection("127.0.0.1", self.address["port"], timeout=timeout)
+        try:
+            payload = json.dumps(body).encode("utf-8") if body is not None else None
+            headers = {"Content-Type": "application/json"}
+            if self.token:
+                headers[TOKEN_HEADER] = self.token
+            conn.request(method, path, body=payload, headers=headers)
+            resp = conn.getresponse()
+            data = resp.read()
+            return resp.status, json.loads(data) if data else None
+        finally:
+            conn.close()
+
+    def health(self, timeout: float = PROBE_TIMEOUT) -> dict:
+        status, data = self.request("GET", "/health", timeout=timeout)
+        if status != 200:
+            raise ConnectionError(f"守护进程返回 {status}")
+        return data
+
+    def submit(self, url: str, star: int = 0, single: bool = False, ugoira_format: str = None) -> dict:
+        item = {"url": url, "star": star, "single": single}
+        if ugoira_format:
+            item["ugoira_format"] = ugoira_format
+        status, data = self.request("POST", "/jobs", item)
+        if status != 202:
+            raise ValueError(data.get("error", f"守护进程返回 {status}") if data else f"守护进程返回 {status}")
+        return data
+
+    def wait(self, job_id: str, timeout: float = None) -> dict:
+        """等待任务结束并返回任务记录；timeout 为 None 时一直等待"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            wait = MAX_WAIT if deadline is None else max(0, min(MAX_WAIT, deadline - time.monotonic()))
+            status, job = self.request("GET", f"/jobs/{job_id}?wait={wait:.0f}")
+            if status != 200:
+                raise KeyError(f"任务不存在: {job_id}")
+            if job["status"] in FINISHED or (deadline is not None and time.monotonic() >= deadline):
+                return job
+
+    def stop(self) -> dict:
+        return self.request("POST", "/shutdown")[1]
+
+
+def find_daemon() -> DaemonClient:
+    """
+    查找运行中的守护进程
+
+    Returns:
+        可用的 DaemonClient；没有运行或无响应时返回 None
+    """
+    try:
+        address = json.loads(STATE_PATH.read_text(encoding='utf-8'))
+    except (OSError, json.JSONDecodeError):
+        return None
+    client = DaemonClient(address, token=address.pop("token", None))
+    try:
+        client.health()
+    except (OSError, ConnectionError, ValueError):
+        return None
+    return client
+
+
+# ---- 服务端 ----
+
+class JobStore:
+    """任务记录（线程安全），已结束的任务只保留最近 FINISHED_JOBS_KEPT 个"""
+
+    def __init__(self):
+        self._jobs = OrderedDict()
+        self._changed = threading.Condition()
+        self._finished = 0
+
+    def add(self, item: dict) -> dict:
+        job = {
+            "id": uuid.uuid4().hex[:12],
+            "url": item["url"],
+            "item": item,
+            "status": "queued",
+            "created": time.time(),
+            "started": None,
+            "finished": None,
+            "result": None,
+            "error": None,
+            "timings": {},
+        }
+        item["job_id"] = job["id"]
+        with self._changed:
+            self._jobs[job["id"]] = job
+        return job
+
+    def update(self, job_id: str, **fields):
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(fields)
+            if fields.get("status") in FINISHED:
+                self._finished += 1
+                self._prune()
+            self._changed.notify_all()
+
+    def _prune(self):
+        excess = self._finished - FINISHED_JOBS_KEPT
+        if excess <= 0:
+            return
+        for job_id in [j for j, job in self._jobs.items() if job["status"] in FINISHED][:excess]:
+            del self._jobs[job_id]
+            self._finished -= 1
+
+    def get(self, job_id: str, wait: float = 0) -> dict:
+        """返回任务记录副本；wait > 0 时等待任务结束（最多 wait 秒）"""
+        deadline = time.monotonic() + wait
+        with self._changed:
+            while True:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    return None
+                remaining = deadline - time.monotonic()
+                if job["status"] in FINISHED or remaining <= 0:
+                    return dict(job)
+                self._changed.wait(remaining)
+
+    def list(self, status: str = None, limit: int = 100) -> list:
+        with self._changed:
+            jobs = [dict(job) for job in self._jobs.values() if status is None or job["status"] == status]
+        return jobs[-limit:]
+
+    def counts(self) -> dict:
+        with self._changed:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return counts
+
+
+class DaemonHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def daemon(self) -> "ArchiveDaemon":
+        return self.server.archive_daemon
+
+    def send_json(self, data, status: int = 200):
+        body = json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def authorized(self) -> bool:
+        """TCP 模式下校验令牌，不通过时返回 403"""
+        token = self.daemon.token
+        if token is None or hmac.compare_digest(self.headers.get(TOKEN_HEADER, ""), token):
+            return True
+        self.send_json({"error": "forbidden"}, 403)
+        return False
+
+    def do_GET(self):
+        if not self.authorized():
+            return
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        parts = parsed.path.strip("/").split("/")
+
+        if parsed.path == "/health":
+            return self.send_json(self.daemon.health())
+
+        if parsed.path == "/metrics":
+            body = self.daemon.metrics.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        if parts[0] == "jobs" and len(parts) == 1:
+            status = query.get("status", [None])[0]
+            return self.send_json(self.daemon.jobs.list(status))
+
+        if parts[0] == "jobs" and len(parts) == 2:
+            try:
+                wait = min(float(query.get("wait", ["0"])[0]), MAX_WAIT)
+            except ValueError:
+                return self.send_json({"error": "wait 应为秒数"}, 400)
+            job = self.daemon.jobs.get(parts[1], wait=wait)
+            if job is None:
+                return self.send_json({"error": f"任务不存在: {parts[1]}"}, 404)
+            return self.send_json(job)
+
+        self.send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        if not self.authorized():
+            return
+        path = urlparse(self.path).path
+
+        if path == "/jobs":
+            try:
+                job = self.daemon.submit(self.read_json())
+            except (ValueError, json.JSONDecodeError) as e:
+                return self.send_json({"error": str(e)}, 400)
+            return self.send_json(job, 202)
+
+        if path == "/shutdown":
+            self.send_json({"status": "stopping", "pending": self.daemon.pending()})
+            self.daemon.shutdown()
+            return
+
+        self.send_json({"error": "not found"}, 404)
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        # Unix socket 没有客户端地址，补一个占位元组供 BaseHTTPRequestHandler 使用
+        request, _ = super().get_request()
+        return request, ("local", 0)
+
+
+class ArchiveDaemon:
+    """
+    守护进程主体：HTTP 接口线程 + 事件循环中长期运行的归档流水线
+
+    Args:
+        socket_path: Unix socket 路径（与 port 二选一）
+        port: 127.0.0.1 上的 TCP 端口（请求须携带令牌）
+        delay_min: 同一站点的最小间隔（秒）
+        delay_max: 同一站点的初始间隔上限（秒）
+        max_pages: 常驻浏览器同时打开的页面数
+    """
+
+    def __init__(
+        self,
+        socket_path: Path = None,
+        port: int = None,
+        delay_min: float = 4.0,
+        delay_max: float = 8.0,
+        max_pages: int = 2
+    ):
+        self.socket_path = Path(socket_path) if socket_path else (None if port else DEFAULT_SOCKET)
+        self.port = port
+        # 只有 TCP 模式需要令牌；Unix socket 靠文件权限限制访问
+        self.token = secrets.token_urlsafe(32) if self.socket_path is None else None
+        self.delay_min = delay_min
+        self.delay_max = delay_max
+        self.max_pages = max_pages
+        self.jobs = JobStore()
+        self.metrics = None
+        self.started = None
+        self._queue = queue.Queue()
+        self._stopping = False
+        self._httpd = None
+
+    # ---- 任务 ----
+
+    def submit(self, item: dict) -> dict:
+        from pipeline import detect_platform
+
+        if self._stopping:
+            raise ValueError("守护进程正在退出")
+        url = item.get("url", "")
+        if not isinstance(url, str) or not detect_platform(url):
+            raise ValueError(f"不支持的 URL: {url}")
+        job = self.jobs.add({
+            "url": url,
+            "star": int(item.get("star", 0)),
+            **{key: item[key] for key in ("single", "ugoira_format") if key in item},
+        })
+        self._queue.put(job["item"])
+        print(f"📨 [{job['id']}] 已提交: {url}")
+        return job
+
+    def pending(self) -> int:
+        counts = self.jobs.counts()
+        return counts.get("queued", 0) + counts.get("running", 0)
+
+    def _items(self):
+        """流水线的输入：阻塞读取任务队列，shutdown() 后结束"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            self.jobs.update(item["job_id"], status="running", started=time.time())
+            yield item
+
+    def _on_done(self, job: dict):
+        job_id = job["item"]["job_id"]
+        status = "success" if job["error"] is None else "failed"
+        self.jobs.update(
+            job_id,
+            status=status,
+            finished=time.time(),
+            result=job["result"],
+            error=job["error"],
+            timings={name: round(seconds, 3) for name, seconds in job["timings"].items()}
+        )
+        record = {"url": job["url"], "status": status}
+        if job["error"] is None:
+            record["result"] = job["result"]
+            print(f"   ✅ [{job_id}] 成功: {job['url']}")
+        else:
+            record["error"] = job["error"]
+            print(f"   ❌ [{job_id}] 失败: {job['url']}: {job['error']}")
+        self._journal.append(job["item"], record)
+
+    def health(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "uptime": round(time.monotonic() - self.started, 1) if self.started else 0.0,
+            "jobs": self.jobs.counts(),
+            "address": self.address(),
+        }
+
+    def address(self) -> dict:
+        return {"socket": str(self.socket_path)} if self.socket_path else {"port": self.port}
+
+    # ---- 生命周期 ----
+
+    def _serve_http(self):
+        if self.socket_path:
+            self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+            if self.socket_path.exists():
+                try:
+                    DaemonClient({"socket": str(self.socket_path)}).health()
+                except (OSError, ConnectionError, ValueError):
+                    # 上次异常退出残留的 socket 文件
+                    self.socket_path.unlink()
+                else:
+                    raise RuntimeError(f"守护进程已在运行: {self.socket_path}")
+            # bind 时按 umask 创建 socket 文件，之后再 chmod 会留下其他用户可连接的窗口
+            old_umask = os.umask(0o077)
+            try:
+                httpd = ThreadingUnixHTTPServer(str(self.socket_path), DaemonHandler)
+            finally:
+                os.umask(old_umask)
+            os.chmod(self.socket_path, 0o600)
+        else:
+            httpd = ThreadingHTTPServer(("127.0.0.1", self.port), DaemonHandler)
+            httpd.daemon_threads = True
+            self.port = httpd.server_port
+        httpd.archive_daemon = self
+        self._httpd = httpd
+        threading.Thread(target=httpd.serve_forever, name="daemon-http", daemon=True).start()
+
+        STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        temp = STATE_PATH.with_name(STATE_PATH.name + ".tmp")
+        state = {**self.address(), "pid": os.getpid()}
+        if self.token:
+            state["token"] = self.token
+        # 状态文件含令牌，只允许当前用户读取
+        temp.unlink(missing_ok=True)
+        with os.fdopen(os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "w", encoding='utf-8') as fp:
+            json.dump(state, fp)
+        temp.replace(STATE_PATH)
+
+    def shutdown(self):
+        """停止接收新任务，处理完已提交的任务后退出"""
+        if not self._stopping:
+            self._stopping = True
+            self._queue.put(None)
+
+    async def run(self):
+        import signal
+        import asyncio
+        from eagle_utils import BrowserPool, set_browser_pool
+        from journal import ProgressJournal, JOURNAL_DIR
+        from metrics import Metrics, set_metrics
+        from pipeline import ArchivePipeline
+        from pixiv import PixivStages, get_client
+        from behance import BehanceStages
+        from rate_limit import RateLimiter, set_limiter
+
+        self.started = time.monotonic()
+        limiter = RateLimiter(self.delay_min, self.delay_max)
+        set_limiter(limiter)
+        self.metrics = Metrics()
+        set_metrics(self.metrics)
+        browser_pool = BrowserPool(max_pages=self.max_pages)
+        set_browser_pool(browser_pool)
+        self._journal = ProgressJournal(JOURNAL_DIR / "daemon.jsonl")
+
+        pipeline = ArchivePipeline(
+            {
+                "pixiv": PixivStages(client=get_client()),
+                "behance": BehanceStages(),
+            },
+            limiter=limiter,
+            # 每个作品完成后立即重建索引，Eagle 中马上可见
+            index_every=1,
+            on_done=self._on_done
+        )
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.shutdown)
+
+        self._serve_http()
+        print(f"🛰️  归档守护进程已启动 (pid {os.getpid()})")
+        print(f"   地址: {self.socket_path or f'http://127.0.0.1:{self.port}'}")
+        print(f"   速率限制: 同一站点每个作品间隔 {self.delay_min}-{self.delay_max} 秒（自适应）")
+        try:
+            stats = await pipeline.run(self._items())
+            print(f"🛰️  守护进程已退出: 成功 {stats['success']} 个, 失败 {stats['failed']} 个, "
+                  f"浏览器启动 {browser_pool.launches} 次")
+        finally:
+            # 流水线出错退出时，读取任务队列的线程仍在等待，放入结束标记让它返回
+            self.shutdown()
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            if self.socket_path:
+                self.socket_path.unlink(missing_ok=True)
+            STATE_PATH.unlink(missing_ok=True)
+            await browser_pool.close()
+            set_browser_pool(None)
+            set_limiter(None)
+            set_metrics(None)
+            self._journal.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="save-to-eagle 归档守护进程")
+    parser.add_argument("--socket", type=str, help=f"Unix socket 路径（默认 {DEFAULT_SOCKET}）")
+    parser.add_argument("--port", type=int, help="改为监听 127.0.0.1 上的 TCP 端口（请求须携带令牌）")
+    parser.add_argument("--delay-min", type=float, default=4.0, help="同一站点最小间隔（秒，默认 4）")
+    parser.add_argument("--delay-max", type=float, default=8.0, help="同一站点初始间隔上限（秒，默认 8）")
+    parser.add_argument("--max-pages", type=int, default=2, help="常驻浏览器同时打开的页面数（默认 2）")
+    parser.add_argument("--memory-budget", type=int, metavar="MB", help="入库解码的内存上限（MB，默认 768）")
+    parser.add_argument("--status", action="store_true", help="查看运行中的守护进程")
+    parser.add_argument("--stop", action="store_true", help="处理完已提交的任务后停止守护进程")
+    args = parser.parse_args()
+
+    if args.status or args.stop:
+        client = find_daemon()
+        if client is None:
+            print("守护进程未运行")
+            sys.exit(1)
+        if args.stop:
+            data = client.stop()
+            print(f"🛑 守护进程将在处理完 {data['pending']} 个任务后退出")
+        else:
+            print(json.dumps(client.health(), ensure_ascii=False, indent=2))
+        return
+
+    if find_daemon():
+        print(f"❌ 守护进程已在运行，见 {STATE_PATH}")
+        sys.exit(1)
+
+    import asyncio
+    sys.path.insert(0, str(Path(__file__).parent))
+    if args.memory_budget:
+        from eagle_utils import set_decode_budget
+        set_decode_budget(args.memory_budget)
+    daemon = ArchiveDaemon(
+        socket_path=args.socket,
+        port=args.port,
+        delay_min=args.delay_min,
+        delay_max=args.delay_max,
+        max_pages=args.max_pages
+    )
+    asyncio.run(daemon.run())
+
+
+if __name__ == "__main__":
+    main()
@@ -2,17 +2,42 @@
 """
 Eagle 素材库共用工具函数
 """
+import os
 import json
+import time
 import random
 import string
 import shutil
+import warnings
+import threading
 import requests
 from pathlib import Path
 from datetime import datetime
+from contextlib import contextmanager, asynccontextmanager
 from PIL import Image
+from rate_limit import observe_response
+from retry import RetryPolicy, with_retry
+import metrics
+import tracing
 
-# 默认 Eagle 库路径
-LIBRARY_ROOT = Path("/Users/lionad/Library/CloudStorage/OneDrive-Personal/素材/@/素材.library")
+# 默认 Eagle 库路径（可用环境变量指向其他素材库，如基准测试的临时库）
+LIBRARY_ROOT = Path(os.environ.get(
+    "SAVE_TO_EAGLE_LIBRARY",
+    "/Users/lionad/Library/CloudStorage/OneDrive-Personal/素材/@/素材.library"
+))
+
+# 素材库 metadata.json / mtime.json 的读改写锁（批量归档时多个主机并行）
+LIBRARY_LOCK = threading.RLock()
+
+# 本地缓存目录（不放在云同步的素材库里）
+CACHE_ROOT = Path(os.environ.get("SAVE_TO_EAGLE_CACHE", Path.home() / ".cache" / "save-to-eagle"))
+
+# 入库解码预算：单张图片解码后的最大像素数，以及所有入库线程同时解码占用的内存上限
+MAX_DECODE_PIXELS = int(os.environ.get("SAVE_TO_EAGLE_MAX_PIXELS", 150_000_000))
+DECODE_BUDGET_MB = int(os.environ.get("SAVE_TO_EAGLE_DECODE_BUDGET_MB", 768))
+
+# 读取超大图片文件头时临时放宽 Pillow 解压炸弹上限（进程级设置）的锁，见 open_image_header
+_BOMB_CHECK_LOCK = threading.Lock()
 
 # 文件夹 ID 缓存
 FOLDER_IDS = {
@@ -49,19 +74,200 @@ def generate_folder_id() -> str:
     return ''.join(random.choices(chars, k=13))
 
 
-def create_thumbnail(img_path: Path, thumb_path: Path, max_size=240):
-    """创建保持原图比例的 Eagle 缩略图"""
-    with Image.open(img_path) as img:
-        if img.mode in ('RGBA', 'P'):
-            img = img.convert('RGB')
-        # 保持比例缩放到最大边为 max_size
-        img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
-        # 直接保存，不添加白色背景，保持原图比例
-        img.save(thumb_path, 'PNG')
+class DiskTTLCache:
+    """
+    基于文件的 TTL 缓存，每个键一个 JSON 文件
+
+    键可以包含 "/"，用于分命名空间，如 "illust/123456"。
+    过期或损坏的条目视为未命中。
+    """
+
+    def __init__(self, root: Path, ttl: float):
+        self.root = Path(root)
+        self.ttl = ttl
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.json"
+
+    def get(self, key: str):
+        """读取缓存，未命中或已过期返回 None"""
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry.get("t", 0) > self.ttl:
+            return None
+        return entry.get("v")
+
+    def set(self, key: str, value):
+        """写入缓存（原子写入）"""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_suffix('.tmp')
+        temp.write_text(json.dumps({"t": time.time(), "v": value}, ensure_ascii=False), encoding='utf-8')
+        temp.replace(path)
+
+
+# Pillow 各模式每像素占用的字节数（RGB 等按 4 字节对齐存储）
+MODE_BYTES = {"1": 1, "L": 1, "P": 1, "I;16": 2, "LA": 4, "RGB": 4, "RGBA": 4, "CMYK": 4, "YCbCr": 4, "I": 4, "F": 4}
+
+
+def decode_cost(img, original_size: tuple) -> int:
+    """
+    估算生成缩略图时的峰值内存（字节）
+
+    解码后的整图（JPEG 为 draft 缩小后的尺寸），加上 RGBA / P 转换为 RGB 时的整图副本。
+    渐进式 JPEG 解码时 libjpeg 还要缓存原始尺寸的全部 DCT 系数（每分量每像素 2 字节，按色度采样折算），
+    draft 不能减少这部分。
+    """
+    pixels = img.width * img.height
+    cost = pixels * MODE_BYTES.get(img.mode, 4)
+    if img.mode in ('RGBA', 'P'):
+        cost += pixels * 4
+    layers = getattr(img, "layer", None)
+    if img.format == 'JPEG' and img.info.get("progressive") and layers:
+        original_pixels = original_size[0] * original_size[1]
+        h_max = max(layer[1] for layer in layers)
+        v_max = max(layer[2] for layer in layers)
+        cost += sum(original_pixels * 2 * layer[1] * layer[2] // (h_max * v_max) for layer in layers)
+    return cost
+
+
+class DecodeBudget:
+    """
+    入库解码的内存预算（进程内各入库线程共享）
+
+    每次解码前按 decode_cost 预留内存，预留总量超出上限时等待其他线程释放；
+    单张图片超出像素上限或内存上限时不解码（由调用方降级）。
+    """
+
+    def __init__(self, max_bytes: int, max_pixels: int):
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+        self.used = 0
+        self._cond = threading.Condition()
+
+    def allows(self, size: tuple, cost: int) -> bool:
+        """单张图片是否在预算内"""
+        return size[0] * size[1] <= self.max_pixels and cost <= self.max_bytes
+
+    @contextmanager
+    def reserve(self, cost: int):
+        """预留解码内存，退出时释放"""
+        with self._cond:
+            # 只有本次预留时不等待，保证超出总量的单张图片也能执行（调用方已用 allows 检查）
+            while self.used and self.used + cost > self.max_bytes:
+                self._cond.wait()
+            self.used += cost
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.used -= cost
+                self._cond.notify_all()
+
+
+_active_decode_budget = DecodeBudget(DECODE_BUDGET_MB * 1024 * 1024, MAX_DECODE_PIXELS)
+
+
+def set_decode_budget(max_mb: int = None, max_pixels: int = None):
+    """替换入库解码预算（batch_archive --memory-budget）"""
+    global _active_decode_budget
+    _active_decode_budget = DecodeBudget(
+        (max_mb or DECODE_BUDGET_MB) * 1024 * 1024,
+        max_pixels or MAX_DECODE_PIXELS
+    )
+
+
+def get_decode_budget() -> DecodeBudget:
+    return _active_decode_budget
+
+
+def open_image_header(path: Path):
+    """
+    打开图片（只读取文件头），超出 Pillow 解压炸弹上限的图片也能取得尺寸
+
+    超大图片由 DecodeBudget 在解码前检查并降级；Pillow 的检查在打开时就报错，
+    只对这一次打开临时放宽，其他位置的 Image.open 仍受默认上限保护。
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+        try:
+            return Image.open(path)
+        except Image.DecompressionBombError:
+            pass
+    with _BOMB_CHECK_LOCK:
+        limit = Image.MAX_IMAGE_PIXELS
+        Image.MAX_IMAGE_PIXELS = None
+        try:
+            return Image.open(path)
+        finally:
+            Image.MAX_IMAGE_PIXELS = limit
+
+
+def create_placeholder_thumbnail(size: tuple, thumb_path: Path, max_size=240):
+    """按原图比例生成灰色占位缩略图（图片超出解码预算时使用）"""
+    scale = max_size / max(size)
+    thumb_size = (max(1, round(size[0] * scale)), max(1, round(size[1] * scale)))
+    Image.new('RGB', thumb_size, (200, 200, 200)).save(thumb_path, 'PNG')
+
+
+def create_thumbnail(img_path: Path, thumb_path: Path, max_size=240) -> dict:
+    """
+    创建保持原图比例的 Eagle 缩略图
+
+    内存受控：
+    - JPEG 用 draft 在解码时按 1/2 ~ 1/8 缩小（DCT 缩放），只解码缩略图所需的分辨率
+    - 动图（GIF / WebP）只解码第一帧
+    - 解码峰值超出 DecodeBudget 时不解码，改用占位缩略图（原图照常入库）
+
+    Returns:
+        {"width", "height", "orientation", "decode"}，宽高为原图尺寸，
+        decode 为 "full" / "draft" / "placeholder"
+    """
+    with open_image_header(img_path) as img:
+        # 只读取了文件头：原图尺寸和 EXIF 在缩小解码前取得
+        info = {"width": img.width, "height": img.height, "orientation": get_exif_orientation(img)}
+        budget = get_decode_budget()
+
+        if img.format == 'JPEG':
+            img.draft('RGB', (max_size * 2, max_size * 2))
+        decode = "draft" if img.size != (info["width"], info["height"]) else "full"
+
+        cost = decode_cost(img, (info["width"], info["height"]))
+        if not budget.allows(img.size, cost):
+            print(f"   ⚠️ 图片过大（{info['width']}x{info['height']}，解码约 {cost / 1024 / 1024:.0f} MB），"
+                  f"超出解码预算，使用占位缩略图")
+            create_placeholder_thumbnail(img.size, thumb_path, max_size)
+            metrics.add("thumbnail_placeholder")
+            return {**info, "decode": "placeholder"}
+
+        with budget.reserve(cost):
+            with metrics.timer("decode"), tracing.span("decode", cat="ingest", mode=decode):
+                # 动图停留在第一帧，load 只解码该帧
+                img.load()
+            with metrics.timer("thumbnail"), tracing.span("thumbnail", cat="ingest"):
+                if img.mode in ('RGBA', 'P'):
+                    img = img.convert('RGB')
+                # 保持比例缩放到最大边为 max_size
+                img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+                # 直接保存，不添加白色背景，保持原图比例
+                img.save(thumb_path, 'PNG')
+
+    if decode == "draft":
+        metrics.add("thumbnail_draft")
+    return {**info, "decode": decode}
 
 
 def get_exif_orientation(img) -> int:
-    """获取 EXIF 方向信息，默认为 1 (正常)"""
+    """
+    获取 EXIF 方向信息，默认为 1 (正常)
+
+    只读取文件头中的 EXIF：PNG 等格式查找图像数据之后的 EXIF 块时会解码整图。
+    """
+    if img.format != 'JPEG' and "exif" not in img.info:
+        return 1
     try:
         exif = img._getexif()
         if exif and 274 in exif:
@@ -113,6 +319,11 @@ def create_eagle_asset(
     Returns:
         创建的元数据字典
     """
+    with tracing.span("create_asset", cat="ingest", asset=name):
+        return _create_eagle_asset(image_path, name, folder_id, source_url, annotation, tags, star)
+
+
+def _create_eagle_asset(image_path, name, folder_id, source_url, annotation, tags, star) -> dict:
     # 生成资源 ID 和目录
     asset_id = generate_eagle_id()
     asset_dir = LIBRARY_ROOT / "images" / f"{asset_id}.info"
@@ -132,12 +343,7 @@ def create_eagle_asset(
 
     # 创建缩略图（必需）
     thumb_path = asset_dir / f"{safe_name}_thumbnail.png"
-    create_thumbnail(dest_path, thumb_path)
-
-    # 获取图片信息
-    with Image.open(dest_path) as img:
-        width, height = img.size
-        orientation = get_exif_orientation(img)
+    image_info = create_thumbnail(dest_path, thumb_path)
 
     stat = dest_path.stat()
     now_ms = int(datetime.now().timestamp() * 1000)
@@ -147,12 +353,13 @@ def create_eagle_asset(
         "id": asset_id,
         "name": safe_name,
         "size": stat.st_size,
-        "btime": int(stat.st_birthtime * 1000),
+        # st_birthtime 仅 macOS/BSD 提供，其他平台以 ctime 代替
+        "btime": int(getattr(stat, "st_birthtime", stat.st_ctime) * 1000),
         "mtime": int(stat.st_mtime * 1000),
         "ext": ext,
-        "width": width,
-        "height": height,
-        "orientation": orientation,
+        "width": image_info["width"],
+        "height": image_info["height"],
+        "orientation": image_info["orientation"],
         "modificationTime": now_ms,
         "lastModified": now_ms,
         "folders": [folder_id],
@@ -166,7 +373,9 @@ def create_eagle_asset(
 
     # 保存元数据
     meta_path = asset_dir / "metadata.json"
-    meta_path.write_text(json.dumps(metadata, ensure_ascii=False, indent=2))
+    with metrics.timer("metadata_write"), tracing.span("metadata_write", cat="ingest"):
+        meta_path.write_text(json.dumps(metadata, ensure_ascii=False, indent=2))
+    metrics.add("images")
 
     return metadata
 
@@ -180,60 +389,61 @@ def create_subfolder(parent_id: str, name: str, description: str = "") -> str:
     Returns:
         文件夹的 ID
     """
-    metadata_path = LIBRARY_ROOT / "metadata.json"
-
-    with open(metadata_path, 'r', encoding='utf-8') as f:
-        metadata = json.load(f)
-
-    # 递归查找父文件夹，并检查是否已存在同名子文件夹
-    def find_parent_and_check_duplicate(folder_list):
-        for folder in folder_list:
-            if folder["id"] == parent_id:
-                # 检查是否已存在同名子文件夹
-                for child in folder.get("children", []):
-                    if child.get("name") == name:
-                        return folder, child["id"]  # 返回父文件夹和现有子文件夹 ID
-                return folder, None  # 返回父文件夹，无重复
-            if folder.get("children"):
-                result = find_parent_and_check_duplicate(folder["children"])
-                if result[0] is not None:
-                    return result
-        return None, None
-
-    parent_folder, existing_id = find_parent_and_check_duplicate(metadata.get("folders", []))
-
-    if parent_folder is None:
-        raise ValueError(f"父文件夹 {parent_id} 未找到")
-
-    # 如果已存在同名文件夹，返回现有 ID
-    if existing_id:
-        print(f"   使用现有文件夹: {name}")
-        return existing_id
-
-    # 创建新文件夹
-    folder_id = generate_folder_id()
-    now_ms = int(datetime.now().timestamp() * 1000)
-
-    new_folder = {
-        "id": folder_id,
-        "name": name,
-        "description": description,
-        "children": [],
-        "modificationTime": now_ms,
-        "tags": [],
-        "password": "",
-        "passwordTips": ""
-    }
-
-    parent_folder.setdefault("children", []).append(new_folder)
-
-    # 原子写入
-    temp_path = metadata_path.with_suffix('.tmp')
-    with open(temp_path, 'w', encoding='utf-8') as f:
-        json.dump(metadata, f, ensure_ascii=False, indent=2)
-    temp_path.replace(metadata_path)
-
-    return folder_id
+    with LIBRARY_LOCK:
+        metadata_path = LIBRARY_ROOT / "metadata.json"
+
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+
+        # 递归查找父文件夹，并检查是否已存在同名子文件夹
+        def find_parent_and_check_duplicate(folder_list):
+            for folder in folder_list:
+                if folder["id"] == parent_id:
+                    # 检查是否已存在同名子文件夹
+                    for child in folder.get("children", []):
+                        if child.get("name") == name:
+                            return folder, child["id"]  # 返回父文件夹和现有子文件夹 ID
+                    return folder, None  # 返回父文件夹，无重复
+                if folder.get("children"):
+                    result = find_parent_and_check_duplicate(folder["children"])
+                    if result[0] is not None:
+                        return result
+            return None, None
+
+        parent_folder, existing_id = find_parent_and_check_duplicate(metadata.get("folders", []))
+
+        if parent_folder is None:
+            raise ValueError(f"父文件夹 {parent_id} 未找到")
+
+        # 如果已存在同名文件夹，返回现有 ID
+        if existing_id:
+            print(f"   使用现有文件夹: {name}")
+            return existing_id
+
+        # 创建新文件夹
+        folder_id = generate_folder_id()
+        now_ms = int(datetime.now().timestamp() * 1000)
+
+        new_folder = {
+            "id": folder_id,
+            "name": name,
+            "description": description,
+            "children": [],
+            "modificationTime": now_ms,
+            "tags": [],
+            "password": "",
+            "passwordTips": ""
+        }
+
+        parent_folder.setdefault("children", []).append(new_folder)
+
+        # 原子写入
+        temp_path = metadata_path.with_suffix('.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, ensure_ascii=False, indent=2)
+        temp_path.replace(metadata_path)
+
+        return folder_id
 
 
 def set_folder_cover(folder_id: str, asset_id: str):
@@ -244,32 +454,33 @@ def set_folder_cover(folder_id: str, asset_id: str):
         folder_id: 目标文件夹 ID
         asset_id: 作为封面的资源 ID
     """
-    metadata_path = LIBRARY_ROOT / "metadata.json"
+    with LIBRARY_LOCK:
+        metadata_path = LIBRARY_ROOT / "metadata.json"
 
-    with open(metadata_path, 'r', encoding='utf-8') as f:
-        metadata = json.load(f)
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
 
-    # 递归查找文件夹
-    def find_and_update(folder_list):
-        for folder in folder_list:
-            if folder["id"] == folder_id:
-                folder["coverId"] = asset_id
-                return True
-            if folder.get("children"):
-                if find_and_update(folder["children"]):
+        # 递归查找文件夹
+        def find_and_update(folder_list):
+            for folder in folder_list:
+                if folder["id"] == folder_id:
+                    folder["coverId"] = asset_id
                     return True
-        return False
+                if folder.get("children"):
+                    if find_and_update(folder["children"]):
+                        return True
+            return False
 
-    if not find_and_update(metadata.get("folders", [])):
-        raise ValueError(f"文件夹 {folder_id} 未找到")
+        if not find_and_update(metadata.get("folders", [])):
+            raise ValueError(f"文件夹 {folder_id} 未找到")
 
-    # 原子写入
-    temp_path = metadata_path.with_suffix('.tmp')
-    with open(temp_path, 'w', encoding='utf-8') as f:
-        json.dump(metadata, f, ensure_ascii=False, indent=2)
-    temp_path.replace(metadata_path)
+        # 原子写入
+        temp_path = metadata_path.with_suffix('.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, ensure_ascii=False, indent=2)
+        temp_path.replace(metadata_path)
 
-    print(f"   设置封面: {asset_id}")
+        print(f"   设置封面: {asset_id}")
 
 
 def rebuild_mtime_index():
@@ -278,24 +489,25 @@ def rebuild_mtime_index():
 
     只包含有效的资源 ID（K 开头，13 字符），清理异常的文件夹 ID。
     """
-    mtime_data = {}
+    with LIBRARY_LOCK, tracing.span("rebuild_index", cat="index"):
+        mtime_data = {}
 
-    for asset_dir in LIBRARY_ROOT.glob('images/*.info'):
-        meta_path = asset_dir / 'metadata.json'
-        if meta_path.exists():
-            asset_id = asset_dir.name.replace('.info', '')
-            # 验证 ID 格式：K 开头，13 字符
-            if len(asset_id) == 13 and asset_id.startswith('K'):
-                stat = meta_path.stat()
-                mtime_data[asset_id] = int(stat.st_mtime * 1000)
+        for asset_dir in LIBRARY_ROOT.glob('images/*.info'):
+            meta_path = asset_dir / 'metadata.json'
+            if meta_path.exists():
+                asset_id = asset_dir.name.replace('.info', '')
+                # 验证 ID 格式：K 开头，13 字符
+                if len(asset_id) == 13 and asset_id.startswith('K'):
+                    stat = meta_path.stat()
+                    mtime_data[asset_id] = int(stat.st_mtime * 1000)
 
-    mtime_path = LIBRARY_ROOT / 'mtime.json'
-    temp = mtime_path.with_suffix('.tmp')
-    temp.write_text(json.dumps(mtime_data, ensure_ascii=False))
-    temp.replace(mtime_path)
+        mtime_path = LIBRARY_ROOT / 'mtime.json'
+        temp = mtime_path.with_suffix('.tmp')
+        temp.write_text(json.dumps(mtime_data, ensure_ascii=False))
+        temp.replace(mtime_path)
 
-    print(f"  重建索引: {len(mtime_data)} 个资源")
-    return len(mtime_data)
+        print(f"  重建索引: {len(mtime_data)} 个资源")
+        return len(mtime_data)
 
 
 def clean_mtime_json():
@@ -456,9 +668,9 @@ def repair_library():
     print(f"   - 索引资源: {count} 个")
 
 
-def download_image(url: str, dest_path: Path, headers: dict = None, max_retries: int = 3) -> int:
+def download_image(url: str, dest_path: Path, headers: dict = None, policy: RetryPolicy = None) -> int:
     """
-    下载图片，带重试机制
+    下载图片，按共用重试策略重试（见 retry.py）
 
     Returns:
         下载的文件大小（字节）
@@ -469,17 +681,59 @@ def download_image(url: str, dest_path: Path, headers: dict = None, max_retries:
     if headers:
         default_headers.update(headers)
 
-    for attempt in range(max_retries):
-        try:
+    def attempt():
+        started = time.monotonic()
+        with tracing.span("GET", cat="http", url=url):
             response = requests.get(url, headers=default_headers, timeout=60)
+        observe_response(url, response.status_code, time.monotonic() - started,
+                         len(response.content), response.headers)
+        response.raise_for_status()
+        dest_path.write_bytes(response.content)
+        metrics.observe("download_file", time.monotonic() - started)
+        metrics.add("download_bytes", len(response.content))
+        return len(response.content)
+
+    return with_retry(url, attempt, policy)
+
+
+def download_stream(url: str, fp, headers: dict = None, policy: RetryPolicy = None, chunk_size: int = 1 << 20) -> int:
+    """
+    分块下载到文件对象（用于大文件，内存中只保留一个分块），按共用重试策略重试
+
+    Args:
+        fp: 可写、可 seek 的文件对象，重试时会从头覆盖
+
+    Returns:
+        下载的字节数
+    """
+    default_headers = {
+        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36",
+    }
+    if headers:
+        default_headers.update(headers)
+
+    def attempt():
+        fp.seek(0)
+        fp.truncate()
+        size = 0
+        started = time.monotonic()
+        with tracing.span("GET", cat="http", url=url), \
+                requests.get(url, headers=default_headers, timeout=60, stream=True) as response:
+            if not response.ok:
+                observe_response(url, response.status_code, time.monotonic() - started,
+                                 0, response.headers)
             response.raise_for_status()
-            dest_path.write_bytes(response.content)
-            return len(response.content)
-        except Exception:
-            if attempt == max_retries - 1:
-                raise
-            import time
-            time.sleep(1)
+            for chunk in response.iter_content(chunk_size):
+                fp.write(chunk)
+                size += len(chunk)
+        observe_response(url, response.status_code, time.monotonic() - started,
+                         size, response.headers)
+        fp.flush()
+        metrics.observe("download_file", time.monotonic() - started)
+        metrics.add("download_bytes", size)
+        return size
+
+    return with_retry(url, attempt, policy)
 
 
 async def load_page_with_fallback(
@@ -521,7 +775,8 @@ async def load_page_with_fallback(
 
     for strategy in wait_strategies:
         try:
-            await page.goto(url, wait_until=strategy, timeout=timeout)
+            with metrics.timer("page_load"), tracing.span("page_load", cat="browser", strategy=strategy):
+                await page.goto(url, wait_until=strategy, timeout=timeout)
             # 额外等待，确保动态内容加载
             if extra_wait > 0:
                 import asyncio
@@ -545,7 +800,9 @@ async def extract_with_playwright(
     wait_strategies: list = None,
     timeout: int = 60000,
     extra_wait: float = 2.0,
-    headless: bool = True
+    headless: bool = True,
+    on_page: callable = None,
+    har=None
 ) -> dict:
     """
     泛化的 Playwright 数据提取函数
@@ -560,6 +817,8 @@ async def extract_with_playwright(
         timeout: 加载超时时间（毫秒）
         extra_wait: 加载后额外等待时间（秒）
         headless: 是否使用无头模式
+        on_page: 加载页面前调用 on_page(page)，用于注册事件监听（可选）
+        har: har.HarArchive，从 HAR 离线回放页面或录制 HAR（可选）
 
     Returns:
         extract_fn 返回的数据
@@ -569,25 +828,113 @@ async def extract_with_playwright(
         ...     return page.evaluate("() => document.images.length")
         >>> result = await extract_with_playwright(url, extract_images)
     """
+    async def run(page):
+        if on_page is not None:
+            on_page(page)
+
+        # 使用降级策略加载页面
+        strategy = await load_page_with_fallback(
+            page, url,
+            timeout=timeout,
+            wait_strategies=wait_strategies,
+            extra_wait=extra_wait
+        )
+        print(f"   页面加载成功 (策略: {strategy})")
+
+        # 执行提取函数
+        return await extract_fn(page)
+
+    # 守护进程等长期运行的场景复用常驻浏览器
+    pool = _active_browser_pool
+    if pool is not None:
+        async with pool.page(har) as page:
+            return await run(page)
+
     from playwright.async_api import async_playwright
 
     async with async_playwright() as p:
         browser = await p.chromium.launch(headless=headless)
-        page = await browser.new_page()
+        context = await browser.new_context(**(har.context_options() if har is not None else {}))
+        if har is not None:
+            await har.attach(context)
+        page = await context.new_page()
 
         try:
-            # 使用降级策略加载页面
-            strategy = await load_page_with_fallback(
-                page, url,
-                timeout=timeout,
-                wait_strategies=wait_strategies,
-                extra_wait=extra_wait
-            )
-            print(f"   页面加载成功 (策略: {strategy})")
-
-            # 执行提取函数
-            result = await extract_fn(page)
-            return result
-
+            return await run(page)
         finally:
+            # 录制 HAR 时在关闭 context 时写出
+            await context.close()
             await browser.close()
+
+
+class BrowserPool:
+    """
+    常驻的 Playwright 浏览器
+
+    首次使用时启动 Chromium，之后每次提取只新建一个浏览器上下文（隔离 cookies 和缓存），
+    省去每个作品启动浏览器的数秒开销。浏览器崩溃或断开时下次使用自动重启。
+    所有调用须在同一个事件循环中进行。
+
+    Args:
+        max_pages: 同时打开的页面数上限
+        headless: 是否使用无头模式
+    """
+
+    def __init__(self, max_pages: int = 2, headless: bool = True):
+        self.max_pages = max_pages
+        self.headless = headless
+        self.launches = 0
+        self._playwright = None
+        self._browser = None
+        self._lock = None
+        self._slots = None
+
+    async def _ensure_browser(self):
+        import asyncio
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+            self._slots = asyncio.Semaphore(self.max_pages)
+        async with self._lock:
+            if self._browser is not None and self._browser.is_connected():
+                return self._browser
+            if self._playwright is None:
+                from playwright.async_api import async_playwright
+                self._playwright = await async_playwright().start()
+            with tracing.span("browser_launch", cat="browser"):
+                self._browser = await self._playwright.chromium.launch(headless=self.headless)
+            self.launches += 1
+            return self._browser
+
+    @asynccontextmanager
+    async def page(self, har=None):
+        """借出一个新页面，退出时关闭其上下文（har: 可选的 har.HarArchive）"""
+        browser = await self._ensure_browser()
+        async with self._slots:
+            context = await browser.new_context(**(har.context_options() if har is not None else {}))
+            try:
+                if har is not None:
+                    await har.attach(context)
+                yield await context.new_page()
+            finally:
+                await context.close()
+
+    async def close(self):
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+
+# 当前生效的浏览器池；未设置时 extract_with_playwright 每次启动新浏览器
+_active_browser_pool = None
+
+
+def set_browser_pool(pool: BrowserPool):
+    global _active_browser_pool
+    _active_browser_pool = pool
+
+
+def get_browser_pool() -> BrowserPool:
+    return _active_browser_pool
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+HAR 录制与离线回放
+
+第一次访问页面时把所有请求的响应录入 HAR 文件，之后的访问经 Playwright 路由
+（BrowserContext.route_from_har）直接从 HAR 返回响应，不再访问网络：
+    - 页面加载时间稳定且接近瞬时，适合重复录制 / 截图、回归测试素材和基准测试
+    - HAR 存在后完全不需要网络（回放时 HAR 中没有的请求直接中止）
+
+模式:
+    record  访问网络并录制，context 关闭时写出 HAR（覆盖已有文件）
+    replay  只从 HAR 回放；HAR 中没有的请求中止（fallback=True 时改为访问网络）
+    auto    HAR 文件已存在时回放，否则录制
+
+HAR 按 URL 和请求方法（POST 还比较请求体）匹配，URL 中带时间戳、随机数的请求回放时匹配不到。
+路径以 .zip 结尾时响应体作为单独的条目存入 ZIP，否则以 base64 内嵌在 HAR 中。
+Service Worker 发出的请求不经过路由，使用 HAR 的 context 禁用 Service Worker。
+"""
+from pathlib import Path
+
+# 支持的模式
+HAR_MODES = ("auto", "record", "replay")
+
+
+class HarArchive:
+    """
+    HAR 录制 / 回放设置
+
+    用法:
+        har = HarArchive("fixtures/example.har")
+        context = await browser.new_context(**har.context_options())
+        await har.attach(context)
+        ...
+        await context.close()   # 录制模式下此时写出 HAR
+
+    Args:
+        path: HAR 文件路径（.har 或 .zip）
+        mode: 见 HAR_MODES
+        fallback: 回放时 HAR 中没有的请求改为访问网络（默认中止）
+    """
+
+    def __init__(self, path, mode: str = "auto", fallback: bool = False):
+        if mode not in HAR_MODES:
+            raise ValueError(f"不支持的 HAR 模式: {mode}")
+        self.path = Path(path)
+        self.requested_mode = mode
+        self.fallback = fallback
+        if mode == "auto":
+            mode = "replay" if self.path.exists() else "record"
+        elif mode == "replay" and not self.path.exists():
+            raise FileNotFoundError(f"HAR 文件不存在: {self.path}")
+        self.mode = mode
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def child(self, name: str) -> "HarArchive":
+        """以 path 为目录、同样的模式为单个任务创建 HAR（批量任务各用一个文件）"""
+        return HarArchive(self.path / name, self.requested_mode, self.fallback)
+
+    def context_options(self) -> dict:
+        """新建 context 时附加的参数"""
+        return {"service_workers": "block"}
+
+    async def attach(self, context):
+        """在 context 上注册 HAR 路由（须在打开页面前调用）"""
+        if self.replaying:
+            await context.route_from_har(self.path, not_found="fallback" if self.fallback else "abort")
+            print(f"   HAR 回放: {self.path}")
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            await context.route_from_har(
+                self.path,
+                update=True,
+                update_content="attach" if self.path.suffix == ".zip" else "embed",
+            )
+            print(f"   HAR 录制: {self.path}（关闭页面后写出）")
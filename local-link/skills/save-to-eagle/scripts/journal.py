@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+批量归档进度日志（JSONL）
+
+每个作品完成（成功或失败）后立即追加一行，中断或崩溃时已完成的进度不会丢失。
+配合 batch_archive.py --resume 使用：跳过已成功的作品，只重试失败和未执行的作品。
+
+每行格式:
+    {"t": "2026-03-01T12:00:00", "url": "...", "status": "success", "item": {...}, "result": {...}}
+    {"t": "2026-03-01T12:00:05", "url": "...", "status": "failed", "item": {...}, "error": "..."}
+
+同一 URL 出现多次时以最后一行为准（重试成功后覆盖之前的失败）。
+"""
+import json
+from pathlib import Path
+from datetime import datetime
+
+from eagle_utils import CACHE_ROOT
+
+# 记录的状态取值
+STATUSES = ("success", "failed")
+
+# 未指定 --journal 时进度日志的存放目录
+JOURNAL_DIR = CACHE_ROOT / "journals"
+
+
+def default_journal_path() -> Path:
+    """按启动时间生成进度日志路径"""
+    return JOURNAL_DIR / f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+
+
+def load_journal(path: Path) -> dict:
+    """
+    读取进度日志
+
+    Returns:
+        URL -> 最后一条记录；崩溃时写了一半的末行、缺少 url 或 status 无效的行（手工编辑、旧版本写入）会被忽略
+    """
+    records = {}
+    path = Path(path)
+    if not path.exists():
+        return records
+    with open(path, encoding='utf-8') as fp:
+        for line in fp:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if not isinstance(record, dict) or not isinstance(record.get("url"), str) \
+                    or record.get("status") not in STATUSES:
+                continue
+            records[record["url"]] = record
+    return records
+
+
+def resume_items(items, records: dict):
+    """
+    过滤掉日志中已成功的作品
+
+    Args:
+        items: 本次输入的条目（列表或迭代器），为 None 时只重试日志中失败的作品
+        records: load_journal 的结果
+
+    Returns:
+        输入为列表时返回列表（保留总数和预计耗时），否则返回生成器
+    """
+    if items is None:
+        return [
+            record.get("item") or {"url": url}
+            for url, record in records.items()
+            if record.get("status") != "success"
+        ]
+
+    def keep(item):
+        url = item.get("url", item.get("link", ""))
+        record = records.get(url)
+        return record is None or record.get("status") != "success"
+
+    if isinstance(items, list):
+        return [item for item in items if keep(item)]
+    return (item for item in items if keep(item))
+
+
+class ProgressJournal:
+    """
+    追加写入的进度日志
+
+    每条记录只有一次小的 write + flush（不 fsync），
+    写入在 index 阶段的事件循环中完成，开销远小于单个作品的归档耗时。
+    进程崩溃时已 flush 的内容仍由操作系统写入磁盘。
+    续写的日志若以写了一半的行结尾，先补一个换行，新记录不会接在残行后面。
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fp = open(self.path, "a", encoding='utf-8')
+        if self._fp.tell() and not self._ends_with_newline():
+            self._fp.write("\n")
+            self._fp.flush()
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as fp:
+            fp.seek(-1, 2)
+            return fp.read(1) == b"\n"
+
+    def append(self, item: dict, record: dict):
+        entry = {"t": datetime.now().isoformat(timespec="seconds"), **record, "item": item}
+        self._fp.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        self._fp.flush()
+
+    def close(self):
+        if not self._fp.closed:
+            self._fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
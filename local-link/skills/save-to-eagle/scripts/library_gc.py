@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+素材库垃圾回收
+
+一次扫描找出拖慢 eagle_utils 各类遍历（重建索引、修复、验证）的无用内容:
+    orphan_info       没有有效 metadata.json 或原图已缺失的 .info 目录（入库中断等）
+    staging           原子写入残留的 .tmp 文件（metadata.tmp、mtime.tmp 等）
+    deleted           Eagle 中已删除（isDeleted）但仍占用空间的资源
+    orphan_thumbnail  原图已不存在的缩略图（改名或重复入库残留）
+
+- 扫描: 每个 .info 目录只列一次目录、读一次 metadata.json，多线程执行
+  （素材库在云同步目录中时，单个文件的读取延迟远大于解析开销）
+- 默认只报告（dry-run），列出每类的数量和可回收字节数
+- --quarantine 移动到素材库下的 .quarantine/<时间>/（保留相对路径，可手动恢复），
+  --delete 直接删除；两者都按 --rate 限速，避免云同步客户端一次收到大量变更
+- 最近 --grace 秒内修改过的目录和 .tmp 文件视为正在写入，不处理
+- 处理了资源目录后重建 mtime 索引
+
+用法:
+    python library_gc.py                          # 只报告
+    python library_gc.py --only staging orphan_thumbnail --delete
+    python library_gc.py --quarantine --rate 100 --report gc.jsonl
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import unicodedata
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from eagle_utils import LIBRARY_ROOT, rebuild_mtime_index
+
+CATEGORIES = {
+    "orphan_info": "无效资源目录",
+    "staging": ".tmp 残留",
+    "deleted": "已删除资源",
+    "orphan_thumbnail": "孤立缩略图",
+}
+
+# 视为正在写入的时间窗口（秒）
+GRACE_SECONDS = 3600
+
+# 每秒最多处理的条目数
+DEFAULT_RATE = 200
+
+# 每个扫描任务处理的资源目录数
+SCAN_CHUNK = 256
+
+THUMBNAIL_SUFFIX = "_thumbnail.png"
+
+
+def _finding(category: str, path: str, size: int, reason: str) -> dict:
+    return {"category": category, "path": path, "size": size, "reason": reason}
+
+
+def _is_recent(path: str, cutoff: float) -> bool:
+    try:
+        return os.stat(path).st_mtime > cutoff
+    except FileNotFoundError:
+        return False
+
+
+def scan_asset(path: str, cutoff: float, categories: set) -> list:
+    """
+    检查一个 .info 目录
+
+    Args:
+        path: 资源目录路径
+        cutoff: 修改时间晚于此时间戳的视为正在写入
+        categories: 要检查的类别
+
+    Returns:
+        发现的条目列表
+    """
+    try:
+        files = {entry.name: entry for entry in os.scandir(path) if entry.is_file()}
+    except FileNotFoundError:
+        return []
+
+    findings = []
+    if "staging" in categories:
+        for name, entry in files.items():
+            if name.endswith(".tmp") and entry.stat().st_mtime <= cutoff:
+                findings.append(_finding("staging", entry.path, entry.stat().st_size, "原子写入残留"))
+
+    def whole_dir(category: str, reason: str):
+        size = sum(entry.stat().st_size for entry in files.values())
+        return [_finding(category, path, size, reason)]
+
+    meta_entry = files.get("metadata.json")
+    meta = None
+    reason = "缺少 metadata.json"
+    if meta_entry is not None:
+        try:
+            with open(meta_entry.path, "rb") as fp:
+                meta = json.loads(fp.read())
+            reason = None
+        except (OSError, ValueError):
+            reason = "metadata.json 无法解析"
+
+    if meta is not None and "name" in meta and "ext" in meta:
+        original = f"{meta['name']}.{meta['ext']}"
+        # 不与目录列表逐字比较：文件名的 Unicode 规范化形式可能不同（macOS 上为 NFD）
+        if not (os.path.exists(os.path.join(path, original)) or
+                unicodedata.normalize("NFC", original) in {unicodedata.normalize("NFC", name) for name in files}):
+            meta, reason = None, f"缺少原图 {original}"
+    elif meta is not None:
+        meta, reason = None, "metadata.json 缺少 name/ext"
+
+    if meta is None:
+        # 入库过程中目录先于 metadata.json 创建，最近修改过的目录跳过
+        if "orphan_info" in categories and not _is_recent(path, cutoff):
+            return whole_dir("orphan_info", reason)
+        return findings
+
+    if meta.get("isDeleted"):
+        if "deleted" in categories:
+            return whole_dir("deleted", "isDeleted")
+        return findings
+
+    if "orphan_thumbnail" in categories:
+        # 只有当前名称的缩略图有效；原图本身也可能以 _thumbnail.png 结尾
+        keep = {unicodedata.normalize("NFC", original),
+                unicodedata.normalize("NFC", f"{meta['name']}{THUMBNAIL_SUFFIX}")}
+        for name, entry in files.items():
+            if name.endswith(THUMBNAIL_SUFFIX) and unicodedata.normalize("NFC", name) not in keep:
+                findings.append(_finding("orphan_thumbnail", entry.path, entry.stat().st_size, "原图不存在"))
+
+    return findings
+
+
+class GcReport:
+    """扫描结果：按类别汇总数量和字节数"""
+
+    def __init__(self):
+        self.findings = []
+        self.counts = {category: 0 for category in CATEGORIES}
+        self.bytes = {category: 0 for category in CATEGORIES}
+        self.scanned = 0
+        self.elapsed = 0.0
+
+    def add(self, findings: list):
+        for finding in findings:
+            self.findings.append(finding)
+            self.counts[finding["category"]] += 1
+            self.bytes[finding["category"]] += finding["size"]
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self.bytes.values())
+
+
+def scan_library(
+    root: Path = None,
+    categories: set = None,
+    grace: float = GRACE_SECONDS,
+    workers: int = 8,
+    progress: bool = True
+) -> GcReport:
+    """
+    扫描素材库
+
+    Args:
+        root: 素材库路径，默认 LIBRARY_ROOT
+        categories: 要检查的类别，默认全部
+        grace: 最近 grace 秒内修改过的内容不处理
+        workers: 扫描线程数
+        progress: 是否打印进度
+
+    Returns:
+        GcReport
+    """
+    root = Path(root or LIBRARY_ROOT)
+    categories = set(categories or CATEGORIES)
+    cutoff = time.time() - grace
+    report = GcReport()
+    started = time.monotonic()
+
+    # 素材库根目录下的 .tmp（metadata.json / mtime.json 的原子写入）
+    if "staging" in categories:
+        for entry in os.scandir(root):
+            if entry.is_file() and entry.name.endswith(".tmp") and entry.stat().st_mtime <= cutoff:
+                report.add([_finding("staging", entry.path, entry.stat().st_size, "原子写入残留")])
+
+    def chunks():
+        chunk = []
+        with os.scandir(root / "images") as it:
+            for entry in it:
+                if entry.name.endswith(".info") and entry.is_dir():
+                    chunk.append(entry.path)
+                    if len(chunk) >= SCAN_CHUNK:
+                        yield chunk
+                        chunk = []
+        if chunk:
+            yield chunk
+
+    def scan_chunk(paths: list) -> tuple:
+        findings = []
+        for path in paths:
+            findings.extend(scan_asset(path, cutoff, categories))
+        return len(paths), findings
+
+    next_progress = 10000
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gc-scan") as executor:
+        for scanned, findings in executor.map(scan_chunk, chunks()):
+            report.scanned += scanned
+            report.add(findings)
+            if progress and report.scanned >= next_progress:
+                rate = report.scanned / (time.monotonic() - started)
+                print(f"   已扫描 {report.scanned} 个资源（{rate:.0f} 个/秒），发现 {len(report.findings)} 项")
+                next_progress += 10000
+
+    report.elapsed = time.monotonic() - started
+    return report
+
+
+class Throttle:
+    """把操作速率限制在每秒 rate 次以内"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self._next > now:
+            time.sleep(self._next - now)
+        self._next = max(self._next, now) + self.interval
+
+
+def apply_report(
+    report: GcReport,
+    root: Path = None,
+    quarantine: bool = True,
+    rate: float = DEFAULT_RATE
+) -> dict:
+    """
+    删除或隔离扫描到的条目
+
+    Args:
+        report: scan_library 的结果
+        root: 素材库路径，默认 LIBRARY_ROOT
+        quarantine: True 时移动到 .quarantine/<时间>/，False 时直接删除
+        rate: 每秒最多处理的条目数（0 为不限）
+
+    Returns:
+        {"processed", "bytes", "errors", "quarantine_dir"}
+    """
+    root = Path(root or LIBRARY_ROOT)
+    quarantine_dir = root / ".quarantine" / datetime.now().strftime('%Y%m%d_%H%M%S') if quarantine else None
+    throttle = Throttle(rate)
+    stats = {"processed": 0, "bytes": 0, "errors": 0, "quarantine_dir": str(quarantine_dir) if quarantine_dir else None}
+    assets_removed = False
+
+    for i, finding in enumerate(report.findings, 1):
+        throttle.wait()
+        path = Path(finding["path"])
+        try:
+            if quarantine_dir is not None:
+                dest = quarantine_dir / path.relative_to(root)
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                shutil.move(str(path), str(dest))
+            elif path.is_dir():
+                shutil.rmtree(path)
+            else:
+                path.unlink()
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            stats["errors"] += 1
+            print(f"   ⚠️ 处理失败 {path}: {e}")
+            continue
+        stats["processed"] += 1
+        stats["bytes"] += finding["size"]
+        assets_removed = assets_removed or finding["category"] in ("orphan_info", "deleted")
+        if i % 1000 == 0:
+            print(f"   已处理 {i}/{len(report.findings)}")
+
+    if assets_removed:
+        rebuild_mtime_index()
+    return stats
+
+
+def format_bytes(n: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+
+def print_report(report: GcReport, examples: int = 5):
+    print(f"\n扫描 {report.scanned} 个资源，耗时 {report.elapsed:.1f} 秒"
+          f"（{report.scanned / report.elapsed if report.elapsed else 0:.0f} 个/秒）")
+    print(f"{'类别':<18} {'数量':>8} {'可回收':>12}")
+    for category, label in CATEGORIES.items():
+        print(f"{category:<18} {report.counts[category]:8d} {format_bytes(report.bytes[category]):>12}  {label}")
+    print(f"{'合计':<18} {len(report.findings):8d} {format_bytes(report.total_bytes):>12}")
+
+    for category in CATEGORIES:
+        shown = [f for f in report.findings if f["category"] == category][:examples]
+        if shown:
+            print(f"\n-- {category} 示例 --")
+            for finding in shown:
+                print(f"   {finding['path']}  ({finding['reason']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="素材库垃圾回收（默认只报告）")
+    parser.add_argument("--only", nargs="+", choices=list(CATEGORIES), help="只处理指定类别")
+    action = parser.add_mutually_exclusive_group()
+    action.add_argument("--quarantine", action="store_true", help="移动到素材库下的 .quarantine/ 目录")
+    action.add_argument("--delete", action="store_true", help="直接删除")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                        help=f"每秒最多处理的条目数（默认 {DEFAULT_RATE}，0 为不限）")
+    parser.add_argument("--grace", type=float, default=GRACE_SECONDS,
+                        help=f"跳过最近 N 秒内修改过的内容（默认 {GRACE_SECONDS}）")
+    parser.add_argument("--workers", type=int, default=8, help="扫描线程数（默认 8）")
+    parser.add_argument("--report", type=str, help="把全部条目写出到 JSONL 文件")
+    args = parser.parse_args()
+
+    if not (LIBRARY_ROOT / "images").is_dir():
+        print(f"❌ 素材库不存在: {LIBRARY_ROOT}")
+        sys.exit(1)
+
+    print(f"🧹 扫描素材库: {LIBRARY_ROOT}")
+    report = scan_library(categories=args.only, grace=args.grace, workers=args.workers)
+    print_report(report)
+
+    if args.report:
+        with open(args.report, "w", encoding='utf-8') as fp:
+            for finding in report.findings:
+                fp.write(json.dumps(finding, ensure_ascii=False) + "\n")
+        print(f"\n📄 条目列表: {args.report}")
+
+    if not (args.quarantine or args.delete):
+        print("\n（dry-run：未做任何修改，使用 --quarantine 或 --delete 执行）")
+        return
+    if not report.findings:
+        print("\n✅ 没有需要清理的内容")
+        return
+
+    print(f"\n{'🗃️ 隔离' if args.quarantine else '🗑️ 删除'} {len(report.findings)} 项"
+          f"（{f'每秒最多 {args.rate:.0f} 项' if args.rate else '不限速'}）...")
+    stats = apply_report(report, quarantine=args.quarantine, rate=args.rate)
+    print(f"✅ 已处理 {stats['processed']} 项，回收 {format_bytes(stats['bytes'])}，失败 {stats['errors']} 项")
+    if stats["quarantine_dir"]:
+        print(f"   隔离目录: {stats['quarantine_dir']}（确认无误后可手动删除）")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,23 @@ save-to-eagle 主入口
     # 批量归档（URL 数量 > 6 时自动启用速率限制）
     python main.py --batch urls.json
     python main.py --batch urls.json --delay-min 3 --delay-max 6
+    python main.py --batch urls.jsonl       # JSONL 或每行一个 URL，逐行读取
+    python main.py --batch urls.txt --single --star 3   # 参数转交 batch_archive，在当前进程中执行
+
+    # 记录时间线追踪（Chrome trace-event JSON，可在 https://ui.perfetto.dev 打开）
+    python main.py "https://www.pixiv.net/artworks/123456" --trace trace.json
+
+    # 性能剖析（cProfile + 调用栈采样 + tracemalloc，结束时写出报告）
+    python main.py "https://www.pixiv.net/artworks/123456" --profile
+
+    # Behance 个人主页 / 收藏集 / 情绪板：批量归档其中的项目（跳过已归档的项目）
+    python main.py "https://www.behance.net/someone" --star 3
+    python main.py "https://www.behance.net/collection/123456/Inspiration"
+
+    # 归档守护进程（daemon.py）运行中时，单条归档自动提交给守护进程执行
+    python daemon.py &
+    python main.py "https://www.pixiv.net/artworks/123456"              # 只有提交与等待的开销
+    python main.py "https://www.pixiv.net/artworks/123456" --no-daemon  # 强制在本进程中执行
 
 批量模式说明:
     - 自动反爬虫：每作品间隔 4-8 秒随机延迟（可调）
@@ -18,8 +35,6 @@ save-to-eagle 主入口
     - 自动保存日志到 logs/batch_YYYYMMDD_HHMMSS.json
 """
 import sys
-import subprocess
-import asyncio
 import argparse
 from pathlib import Path
 
@@ -27,8 +42,9 @@ from pathlib import Path
 scripts_dir = Path(__file__).parent
 sys.path.insert(0, str(scripts_dir))
 
-from pixiv import archive_pixiv
-from behance import archive_behance, extract_project_data
+# 平台模块（requests、Pillow、Playwright 辅助函数）按 URL 所属平台在用到时才导入，
+# --help 和参数错误不加载任何重依赖，Pixiv 单条归档不加载 Behance 模块
+import tracing
 
 
 def detect_platform(url: str) -> str:
@@ -49,7 +65,13 @@ def detect_platform(url: str) -> str:
     return None
 
 
-async def archive(url: str, star: int = 0, behance_data: dict = None, single: bool = False):
+async def archive(
+    url: str,
+    star: int = 0,
+    behance_data: dict = None,
+    single: bool = False,
+    ugoira_format: str = "webp"
+):
     """
     归档 URL 到 Eagle
 
@@ -58,6 +80,7 @@ async def archive(url: str, star: int = 0, behance_data: dict = None, single: bo
         star: 评分（1-5星，0表示无评分）
         behance_data: Behance 项目数据（可选，如不提供则自动提取）
         single: 仅下载第一张图（仅 Pixiv 多图作品有效）
+        ugoira_format: Pixiv 动图输出格式，"webp" 或 "gif"
 
     Returns:
         归档结果字典
@@ -68,84 +91,194 @@ async def archive(url: str, star: int = 0, behance_data: dict = None, single: bo
         raise ValueError(f"不支持的 URL: {url}\n目前仅支持 Behance 和 Pixiv")
 
     if platform == "pixiv":
-        return archive_pixiv(url, star, single=single)
+        from pixiv import archive_pixiv
+        with tracing.span("archive", cat="artwork", url=url):
+            return archive_pixiv(url, star, single=single, ugoira_format=ugoira_format)
 
     elif platform == "behance":
+        from behance import archive_behance, extract_project_data
         # 如果没有提供项目数据，自动提取
-        if not behance_data:
-            print("🔍 自动提取 Behance 项目数据...")
-            behance_data = await extract_project_data(url)
-            print(f"   标题: {behance_data.get('title', 'Unknown')}")
-            print(f"   作者: {behance_data.get('author', 'Unknown')}")
-            print(f"   图片: {len(behance_data.get('images', []))} 张")
-        return archive_behance(url, star, behance_data)
-
-
-async def main():
+        with tracing.span("archive", cat="artwork", url=url):
+            if not behance_data:
+                print("🔍 自动提取 Behance 项目数据...")
+                with tracing.span("metadata", cat="stage"):
+                    behance_data = await extract_project_data(url)
+                print(f"   标题: {behance_data.get('title', 'Unknown')}")
+                print(f"   作者: {behance_data.get('author', 'Unknown')}")
+                print(f"   图片: {len(behance_data.get('images', []))} 张")
+            return archive_behance(url, star, behance_data)
+
+
+def main():
     parser = argparse.ArgumentParser(description="归档网络图片到 Eagle 素材库")
     parser.add_argument("url", nargs="?", help="作品链接 (Behance 或 Pixiv)")
     parser.add_argument("--star", type=int, default=0, help="评分 (1-5星，默认为0)")
     parser.add_argument("--single", action="store_true", help="仅下载第一张图（仅 Pixiv 多图作品有效）")
+    parser.add_argument("--ugoira-format", choices=["webp", "gif"], default="webp", help="Pixiv 动图输出格式（默认 webp）")
 
     # 批量模式参数
-    parser.add_argument("--batch", "-b", type=str, help="批量归档：JSON 文件路径（URL 数量 > 6 时建议启用）")
+    parser.add_argument("--batch", "-b", type=str, help="批量归档：JSON / JSONL / URL 列表文件路径，- 为标准输入（URL 数量 > 6 时建议启用）")
     parser.add_argument("--delay-min", type=float, default=4.0, help="批量模式最小延迟（秒，默认 4）")
     parser.add_argument("--delay-max", type=float, default=8.0, help="批量模式最大延迟（秒，默认 8）")
     parser.add_argument("--log", "-l", type=str, help="批量模式日志文件路径（可选）")
+    parser.add_argument("--bandwidth", type=float, help="批量模式全局带宽上限（MB/s，可选）")
+    parser.add_argument("--memory-budget", type=int, metavar="MB", help="批量模式入库解码的内存上限（MB，可选）")
+    parser.add_argument("--trace", type=str, help="写出时间线追踪（Chrome trace-event JSON）")
+    parser.add_argument("--profile", nargs="?", const="", metavar="DIR",
+                        help="性能剖析（CPU + 内存），报告写到 DIR（默认 ~/.cache/save-to-eagle/profiles/）")
+    parser.add_argument("--profile-interval", type=float, default=30.0, help="内存快照间隔（秒，默认 30）")
+    parser.add_argument("--no-daemon", action="store_true", help="不使用运行中的守护进程，在本进程中归档")
 
     args = parser.parse_args()
 
-    # 批量模式
+    # 批量模式：在当前进程中执行 batch_archive（不再启动新的解释器重复导入）
     if args.batch:
         print("🔄 批量归档模式（带反爬虫保护）")
         print(f"   输入文件: {args.batch}")
         print(f"   延迟: {args.delay_min}-{args.delay_max} 秒/作品")
         print()
 
-        batch_script = scripts_dir / "batch_archive.py"
-        cmd = [
-            sys.executable, str(batch_script),
+        argv = [
             "--input", args.batch,
             "--delay-min", str(args.delay_min),
             "--delay-max", str(args.delay_max)
         ]
 
+        if args.star:
+            argv.extend(["--stars", str(args.star)])
+        if args.single:
+            argv.append("--single")
+        argv.extend(["--ugoira-format", args.ugoira_format])
         if args.log:
-            cmd.extend(["--log", args.log])
-
-        result = subprocess.run(cmd)
-        sys.exit(result.returncode)
+            argv.extend(["--log", args.log])
+        if args.bandwidth:
+            argv.extend(["--bandwidth", str(args.bandwidth)])
+        if args.memory_budget:
+            argv.extend(["--memory-budget", str(args.memory_budget)])
+        if args.trace:
+            argv.extend(["--trace", args.trace])
+        if args.profile is not None:
+            argv.extend(["--profile"] + ([args.profile] if args.profile else []))
+            argv.extend(["--profile-interval", str(args.profile_interval)])
+
+        import batch_archive
+        batch_archive.main(argv)
+        return
 
     # 单条模式
     if not args.url:
         parser.print_help()
         sys.exit(1)
 
+    # Behance 个人主页 / 收藏集 / 情绪板：在当前进程中批量归档其中的项目
+    if "behance.net" in args.url.lower() and "/gallery/" not in args.url.lower():
+        if args.single:
+            parser.error("--single 仅对 Pixiv 多图作品有效，不能用于 Behance 个人主页 / 收藏集 / 情绪板")
+        argv = [args.url, "--delay-min", str(args.delay_min), "--delay-max", str(args.delay_max)]
+        if args.star:
+            argv.extend(["--star", str(args.star)])
+        if args.log:
+            argv.extend(["--log", args.log])
+        if args.bandwidth:
+            argv.extend(["--bandwidth", str(args.bandwidth)])
+        if args.memory_budget:
+            argv.extend(["--memory-budget", str(args.memory_budget)])
+        if args.trace:
+            argv.extend(["--trace", args.trace])
+        if args.profile is not None:
+            argv.extend(["--profile"] + ([args.profile] if args.profile else []))
+            argv.extend(["--profile-interval", str(args.profile_interval)])
+        import behance_sync
+        behance_sync.main(argv)
+        return
+
+    # 守护进程运行中时只提交任务并等待结果（--trace / --profile 针对本进程，不走守护进程）
+    if not args.no_daemon and args.trace is None and args.profile is None:
+        from daemon import find_daemon
+        client = find_daemon()
+        if client is not None:
+            code = archive_via_daemon(client, args)
+            if code is not None:
+                sys.exit(code)
+
+    import asyncio
+    asyncio.run(archive_single(args))
+
+
+def print_result(result: dict):
+    print("\n" + "=" * 50)
+    print("归档完成 ✅")
+    print(f"平台: {result['platform']}")
+    print(f"标题: {result['title']}")
+    print(f"作者: {result['author']}")
+
+    if result['platform'] == "Behance":
+        print(f"分类: {result['creative_field']}")
+        if result.get('bytes_saved'):
+            print(f"复用浏览器响应: 节省下载 {result['bytes_saved'] / 1024 / 1024:.1f} MB")
+
+    print(f"图片数: {len(result['downloaded'])}")
+
+    if result.get('failed'):
+        print(f"失败: {len(result['failed'])}")
+
+    print("\n现在打开 Eagle 即可查看！")
+
+
+def archive_via_daemon(client, args) -> int:
+    """
+    提交到守护进程并等待结果
+
+    Returns:
+        退出码；守护进程无法连接时返回 None（回退到本进程归档）
+    """
+    try:
+        job = client.submit(args.url, star=args.star, single=args.single, ugoira_format=args.ugoira_format)
+    except ValueError as e:
+        print(f"❌ 归档失败: {e}")
+        return 1
+    except OSError as e:
+        print(f"⚠️ 无法连接归档守护进程，改为在本进程中归档: {e}")
+        return None
+    print(f"📨 已提交到归档守护进程（任务 {job['id']}），等待结果...")
     try:
-        result = await archive(args.url, star=args.star, single=args.single)
+        job = client.wait(job["id"])
+    except KeyboardInterrupt:
+        print(f"\n⚠️ 已停止等待，任务 {job['id']} 仍在守护进程中执行")
+        return 1
 
-        print("\n" + "=" * 50)
-        print("归档完成 ✅")
-        print(f"平台: {result['platform']}")
-        print(f"标题: {result['title']}")
-        print(f"作者: {result['author']}")
+    if job["status"] != "success":
+        print(f"\n❌ 归档失败: {job['error']}")
+        return 1
+    print_result(job["result"])
+    return 0
 
-        if result['platform'] == "Behance":
-            print(f"分类: {result['creative_field']}")
 
-        print(f"图片数: {len(result['downloaded'])}")
+async def archive_single(args):
+    """单条归档并打印结果"""
+    if args.trace:
+        tracing.start(args.trace)
 
-        if result.get('failed'):
-            print(f"失败: {len(result['failed'])}")
+    profiler = None
+    if args.profile is not None:
+        from profiling import Profiler
+        profiler = Profiler(args.profile or None, memory_interval=args.profile_interval)
+        profiler.start()
 
-        print("\n现在打开 Eagle 即可查看！")
+    try:
+        result = await archive(args.url, star=args.star, single=args.single, ugoira_format=args.ugoira_format)
+        print_result(result)
 
     except Exception as e:
         print(f"\n❌ 归档失败: {e}")
         import traceback
         traceback.print_exc()
         sys.exit(1)
+    finally:
+        tracing.stop()
+        if profiler:
+            profiler.stop()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+批量归档的分阶段指标
+
+各阶段耗时记录为直方图（指数分桶，内存占用固定），从分桶估算 p50/p95/p99；
+另有下载字节数、图片数、作品数等计数器。
+
+批量归档时（batch_archive.py --metrics-dir）定期和结束时写出：
+    - save_to_eagle.prom: Prometheus textfile（可由 node_exporter textfile collector 采集）
+    - metrics.json: JSON 摘要（各阶段分位数、字节/秒、图片/分钟）
+
+阶段:
+    metadata        获取作品元数据（流水线 metadata 阶段）
+    page_load       Playwright 页面加载（Behance）
+    download        流水线下载阶段（一个作品的全部文件）
+    download_file   单个文件的 HTTP 下载
+    ingest          流水线入库阶段（一个作品的全部资源）
+    decode          图片解码
+    thumbnail       缩略图缩放与编码
+    metadata_write  写入资源 metadata.json
+    index           重建 mtime.json 索引
+
+未启用时（单条归档）timer()/add() 为空操作。
+"""
+import json
+import time
+import bisect
+import threading
+from pathlib import Path
+from contextlib import contextmanager, nullcontext
+
+# 直方图分桶上界（秒）：1ms 到约 17 分钟，每档 ×√2
+BUCKETS = tuple(0.001 * 2 ** (i / 2) for i in range(41))
+
+# 指标名前缀
+PREFIX = "save_to_eagle"
+
+
+class Histogram:
+    """固定分桶直方图"""
+
+    def __init__(self, bounds: tuple = BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """在所在分桶内线性插值估算分位数（误差不超过一档，约 ±40%）"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(self.max, lower + (upper - lower) * (rank - seen) / n)
+            seen += n
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 3),
+            "mean": round(self.sum / self.count, 4) if self.count else 0.0,
+            "p50": round(self.quantile(0.50), 4),
+            "p95": round(self.quantile(0.95), 4),
+            "p99": round(self.quantile(0.99), 4),
+            "max": round(self.max, 4),
+        }
+
+
+class Metrics:
+    """阶段耗时直方图 + 计数器，线程安全"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.stages = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            if stage not in self.stages:
+                self.stages[stage] = Histogram()
+            self.stages[stage].observe(seconds)
+
+    def add(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def timer(self, stage: str):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.monotonic() - started)
+
+    def summary(self) -> dict:
+        """JSON 摘要"""
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            counters = dict(self.counters)
+            stages = {name: hist.summary() for name, hist in self.stages.items()}
+
+        download = stages.get("download_file", {})
+        nbytes = counters.get("download_bytes", 0)
+        return {
+            "elapsed": round(elapsed, 1),
+            "counters": counters,
+            "images_per_minute": round(counters.get("images", 0) / elapsed * 60, 2) if elapsed else 0.0,
+            "artworks_per_minute": round(counters.get("artworks_success", 0) / elapsed * 60, 2) if elapsed else 0.0,
+            # 墙钟吞吐量，以及扣除等待后单个连接的下载速度
+            "bytes_per_second": round(nbytes / elapsed) if elapsed else 0,
+            "download_bytes_per_second": round(nbytes / download["sum"]) if download.get("sum") else 0,
+            "stages": stages,
+        }
+
+    def prometheus(self) -> str:
+        """Prometheus 文本格式"""
+        lines = []
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            name = f"{PREFIX}_stage_seconds"
+            lines.append(f"# HELP {name} Time spent per archive stage.")
+            lines.append(f"# TYPE {name} histogram")
+            for stage, hist in sorted(self.stages.items()):
+                cumulative = 0
+                for bound, n in zip(hist.bounds, hist.counts):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound:.6g}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {hist.count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {hist.sum:.6f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {hist.count}')
+
+            for counter, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {PREFIX}_{counter}_total counter")
+                lines.append(f"{PREFIX}_{counter}_total {value}")
+
+            lines.append(f"# TYPE {PREFIX}_elapsed_seconds gauge")
+            lines.append(f"{PREFIX}_elapsed_seconds {elapsed:.3f}")
+            lines.append(f"# TYPE {PREFIX}_last_update_timestamp_seconds gauge")
+            lines.append(f"{PREFIX}_last_update_timestamp_seconds {time.time():.0f}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, directory: Path):
+        """原子写出 Prometheus textfile 和 JSON 摘要"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for filename, content in (
+            (f"{PREFIX}.prom", self.prometheus()),
+            ("metrics.json", json.dumps(self.summary(), ensure_ascii=False, indent=2)),
+        ):
+            path = directory / filename
+            temp = path.with_name(path.name + ".tmp")
+            temp.write_text(content, encoding='utf-8')
+            temp.replace(path)
+
+
+# 当前生效的指标；未设置时 timer()/add() 为空操作
+_active_metrics = None
+
+
+def set_metrics(metrics: Metrics):
+    global _active_metrics
+    _active_metrics = metrics
+
+
+def get_metrics() -> Metrics:
+    return _active_metrics
+
+
+def timer(stage: str):
+    """计时上下文：with timer("decode"): ..."""
+    metrics = _active_metrics
+    if metrics is None:
+        return nullcontext()
+    return metrics.timer(stage)
+
+
+def observe(stage: str, seconds: float):
+    metrics = _active_metrics
+    if metrics is not None:
+        metrics.observe(stage, seconds)
+
+
+def add(name: str, value: float = 1):
+    metrics = _active_metrics
+    if metrics is not None:
+        metrics.add(name, value)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+画面静止检测
+
+录制动画时按帧判断画面是否还在变化，用于在动画结束后提前停止录制，
+并裁掉开头（加载完成到动画开始）和结尾（动画结束后）的静止片段。
+
+每帧按 JPEG 的 DCT 缩放直接解码为 1/8 大小的灰度图（几乎不花解码时间），
+与上一次变化时的画面逐像素相减：差值超过 MOTION_PIXEL_DELTA 的像素占比
+超过 MOTION_AREA 才算变化，光标闪烁、抗锯齿抖动等小范围变化不算。
+与"上一次变化时的画面"而不是上一帧比较，缓慢的渐变累积到阈值后同样能检测到。
+"""
+import io
+
+import numpy as np
+from PIL import Image
+
+# 缩小后灰度图上，差值超过此值的像素视为变化（0-255）
+MOTION_PIXEL_DELTA = 8
+
+# 变化像素占比超过此值视为画面在动
+MOTION_AREA = 0.002
+
+# 解码缩小倍数（JPEG 支持 1/2、1/4、1/8 的 DCT 缩放）
+SAMPLE_SCALE = 8
+
+# 默认空闲窗口（秒）：画面静止这么久后停止录制
+DEFAULT_IDLE_WINDOW = 2.0
+
+# 裁掉首尾静止片段时，在第一次变化前、最后一次变化后各保留的时长（秒）
+TRIM_PADDING = 0.3
+
+
+def decode_sample(data: bytes) -> np.ndarray:
+    """把 JPEG / PNG 帧解码为缩小的灰度数组"""
+    with Image.open(io.BytesIO(data)) as img:
+        size = (max(1, img.width // SAMPLE_SCALE), max(1, img.height // SAMPLE_SCALE))
+        img.draft("L", size)
+        if img.size != size:
+            img = img.convert("L").resize(size, Image.Resampling.BILINEAR)
+        return np.asarray(img.convert("L"), dtype=np.int16)
+
+
+class MotionDetector:
+    """
+    检测画面变化与静止
+
+    Args:
+        window: 空闲窗口（秒）
+        start: 开始检测的时间戳
+        grace: 画面从未变化时，额外等待的时长（秒；页面加载后动画可能稍晚才开始）
+    """
+
+    def __init__(self, window: float = DEFAULT_IDLE_WINDOW, start: float = None, grace: float = 0.0):
+        self.window = window
+        self.padding = TRIM_PADDING
+        self.start = start
+        self.grace = grace
+        self.first_motion = None
+        self.last_motion = None
+        self.samples = 0
+        self._reference = None
+
+    def update(self, data: bytes, timestamp: float) -> bool:
+        """
+        加入一帧
+
+        Returns:
+            与上一次变化时的画面相比是否有变化（第一帧为 False）
+        """
+        sample = decode_sample(data)
+        self.samples += 1
+        if self.start is None:
+            self.start = timestamp
+
+        reference = self._reference
+        if reference is None or reference.shape != sample.shape:
+            self._reference = sample
+            return False
+
+        changed = np.count_nonzero(np.abs(sample - reference) > MOTION_PIXEL_DELTA)
+        if changed <= MOTION_AREA * sample.size:
+            return False
+
+        self._reference = sample
+        if self.first_motion is None:
+            self.first_motion = timestamp
+        self.last_motion = timestamp
+        return True
+
+    def idle(self, now: float) -> bool:
+        """画面是否已静止 window 秒（从未变化时从 start + grace 开始计时）"""
+        if self.last_motion is not None:
+            since = self.last_motion
+        elif self.start is not None:
+            since = self.start + self.grace
+        else:
+            return False
+        return now - since >= self.window
+
+    def trim_range(self, start: float, end: float) -> tuple:
+        """
+        裁掉首尾静止片段后的时间范围
+
+        Args:
+            start: 录制开始的时间戳
+            end: 录制结束的时间戳
+
+        Returns:
+            (开始, 结束) 时间戳；画面从未变化时原样返回
+        """
+        if self.first_motion is None:
+            return start, end
+        return (max(start, self.first_motion - self.padding),
+                min(end, self.last_motion + self.padding))
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+批量归档流水线
+
+resolve → metadata → download → ingest → index
+
+- resolve: 识别平台和站点（读取输入时完成）
+- metadata: 每个站点独立的队列和工作协程，按站点令牌桶限速；
+  站点熔断（见 retry.py）时只暂停该站点的队列
+- download: 在线程中执行的网络下载，总并发和每站点并发均有上限
+- ingest: 在线程池中执行的图片解码、缩略图和元数据写入（CPU 阶段）
+- index: 单个协程汇总结果，每 INDEX_EVERY 个作品重建一次 mtime 索引
+
+阶段之间用有界队列连接：下游处理不过来时上游自动暂停（背压），
+输入按需读取，内存占用与批量大小无关。
+
+启用追踪（tracing.start）时，每个作品一条轨道，记录各阶段以及
+限速、熔断、下载名额的等待时间。
+
+平台通过 stages 对象接入（见 pixiv.PixivStages、behance.BehanceStages），需提供：
+    async metadata(job)   获取元数据，写入 job
+    download(job)         下载到 job["temp_dir"]（阻塞，线程中执行；metadata 已创建时沿用）
+    ingest(job) -> dict   创建 Eagle 资源，返回归档结果（阻塞，线程池中执行）
+"""
+import time
+import shutil
+import asyncio
+import tempfile
+import functools
+import contextvars
+from collections import deque
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from rate_limit import host_key
+from retry import BREAKERS
+import metrics
+import tracing
+
+# 各阶段并发数（metadata 为每个站点的并发数）
+DEFAULT_CONCURRENCY = {
+    "metadata": 2,
+    "download": 4,
+    "ingest": 2,
+}
+
+# 同一站点同时下载的作品数上限
+HOST_DOWNLOAD_CONCURRENCY = 2
+
+# 阶段之间的队列长度
+QUEUE_SIZE = 4
+
+# 每个站点 metadata 队列的长度（限速等待发生在这里）
+HOST_QUEUE_SIZE = 100
+
+# 站点队列已满时作品先进入该站点的积压列表，读取输入不等待，其他站点的作品照常分发；
+# 所有站点积压的作品总数超过此值时才暂停读取输入
+MAX_BACKLOG = 10000
+
+# 每完成多少个作品重建一次索引（批量结束时总会重建）
+INDEX_EVERY = 20
+
+
+def detect_platform(url: str) -> str:
+    """检测 URL 所属平台"""
+    url_lower = url.lower()
+    if "pixiv.net" in url_lower:
+        return "pixiv"
+    if "behance.net" in url_lower:
+        return "behance"
+    return None
+
+
+class ArchivePipeline:
+    """
+    分阶段的批量归档流水线
+
+    Args:
+        stages: 平台名 -> stages 对象，如 {"pixiv": PixivStages(), "behance": BehanceStages()}
+        limiter: RateLimiter，metadata 阶段每个作品取一个令牌（可选）
+        concurrency: 覆盖 DEFAULT_CONCURRENCY 中的部分阶段
+        host_download_concurrency: 同一站点同时下载的作品数上限
+        queue_size: 阶段之间的队列长度
+        host_queue_size: 每个站点 metadata 队列的长度
+        max_backlog: 所有站点积压（队列已满、尚未入队）的作品总数上限
+        index_every: 每完成多少个作品重建一次索引
+        on_done: 每个作品完成（成功或失败）后的回调 on_done(job)；回调出错只打印警告，不中断流水线
+        rebuild_index: 重建索引的函数，默认为 eagle_utils.rebuild_mtime_index
+        breakers: 按站点的熔断器，默认为 retry.BREAKERS
+    """
+
+    def __init__(
+        self,
+        stages: dict,
+        limiter=None,
+        concurrency: dict = None,
+        host_download_concurrency: int = HOST_DOWNLOAD_CONCURRENCY,
+        queue_size: int = QUEUE_SIZE,
+        host_queue_size: int = HOST_QUEUE_SIZE,
+        max_backlog: int = MAX_BACKLOG,
+        index_every: int = INDEX_EVERY,
+        on_done=None,
+        rebuild_index=None,
+        breakers=None
+    ):
+        if rebuild_index is None:
+            from eagle_utils import rebuild_mtime_index
+            rebuild_index = rebuild_mtime_index
+
+        self.stages = stages
+        self.limiter = limiter
+        self.concurrency = {**DEFAULT_CONCURRENCY, **(concurrency or {})}
+        self.host_download_concurrency = host_download_concurrency
+        self.queue_size = queue_size
+        self.host_queue_size = host_queue_size
+        self.max_backlog = max_backlog
+        self.index_every = index_every
+        self.on_done = on_done
+        self.rebuild_index = rebuild_index
+        self.breakers = breakers or BREAKERS
+
+        self._host_slots = {}
+        self._backlog = 0
+        self._backlog_cond = None
+        self._unindexed = 0
+        self._runner = None
+        self._failure = None
+        self.stats = {"jobs": 0, "success": 0, "failed": 0, "busy": {}, "elapsed": 0.0}
+
+    # ---- 各阶段 ----
+
+    async def _metadata(self, job: dict):
+        with tracing.span("wait_breaker", cat="wait"):
+            await self.breakers.wait_async(job["host"])
+        if self.limiter:
+            with tracing.span("wait_rate_limit", cat="wait", host=job["host"]):
+                await self.limiter.acquire_async(job["url"])
+        await job["stages"].metadata(job)
+
+    async def _download(self, job: dict):
+        host = job["host"]
+        if host not in self._host_slots:
+            self._host_slots[host] = asyncio.Semaphore(self.host_download_concurrency)
+        with tracing.span("wait_download_slot", cat="wait", host=host):
+            await self._host_slots[host].acquire()
+        try:
+            with tracing.span("wait_breaker", cat="wait"):
+                await self.breakers.wait_async(host)
+            if job["temp_dir"] is None:
+                # metadata 阶段可能已创建（如 Behance 截留的图片）
+                job["temp_dir"] = Path(tempfile.mkdtemp(prefix=f"{job['platform']}_download_"))
+            await asyncio.to_thread(job["stages"].download, job)
+        finally:
+            self._host_slots[host].release()
+
+    async def _ingest(self, job: dict):
+        loop = asyncio.get_running_loop()
+        # 线程池不会自动继承 contextvars，手动带上作品的追踪轨道
+        context = contextvars.copy_context()
+        job["result"] = await loop.run_in_executor(
+            self._executor, functools.partial(context.run, job["stages"].ingest, job))
+
+    async def _run_stage(self, name: str, queue_in: asyncio.Queue, queue_out: asyncio.Queue, fn):
+        """阶段工作协程：失败的作品跳过后续阶段，直接流向 index"""
+        while True:
+            job = await queue_in.get()
+            if job is None:
+                return
+            if job["error"] is None:
+                started = time.monotonic()
+                track = tracing.current_track.set(job["track"])
+                try:
+                    with tracing.span(name, cat="stage"):
+                        await fn(job)
+                except Exception as e:
+                    job["error"] = str(e)
+                finally:
+                    tracing.current_track.reset(track)
+                elapsed = time.monotonic() - started
+                job["timings"][name] = elapsed
+                self.stats["busy"][name] = self.stats["busy"].get(name, 0.0) + elapsed
+                metrics.observe(name, elapsed)
+            await queue_out.put(job)
+
+    async def _index(self, queue: asyncio.Queue):
+        while True:
+            job = await queue.get()
+            if job is None:
+                break
+
+            if job.get("temp_dir"):
+                shutil.rmtree(job["temp_dir"], ignore_errors=True)
+
+            if job["error"] is None:
+                self.stats["success"] += 1
+                self._unindexed += 1
+                metrics.add("artworks_success")
+            else:
+                self.stats["failed"] += 1
+                metrics.add("artworks_failed")
+
+            tracer = tracing.get_tracer()
+            if tracer and job["track"] is not None:
+                tracer.complete("artwork", job["trace_start"], tracer.now() - job["trace_start"],
+                                cat="artwork", track=job["track"],
+                                args={"url": job["url"], "error": job["error"]})
+
+            if self.on_done:
+                try:
+                    self.on_done(job)
+                except Exception as e:
+                    # 进度日志等写入失败不能让 index 停下，否则上游阶段会在已满的队列上永远等待
+                    print(f"   ⚠️ 完成回调出错: {job['url']}: {e}")
+
+            if self._unindexed >= self.index_every:
+                await self._flush_index()
+
+        await self._flush_index()
+
+    async def _flush_index(self):
+        if not self._unindexed:
+            return
+        started = time.monotonic()
+        self._unindexed = 0
+        await asyncio.to_thread(self.rebuild_index)
+        elapsed = time.monotonic() - started
+        self.stats["busy"]["index"] = self.stats["busy"].get("index", 0.0) + elapsed
+        metrics.observe("index", elapsed)
+
+    # ---- 调度 ----
+
+    def _supervise(self, task: asyncio.Task) -> asyncio.Task:
+        """阶段协程异常退出时取消 run()，由 run() 抛出该异常，而不是在队列上永远等待"""
+        def done(task):
+            if task.cancelled() or task.exception() is None or self._failure is not None:
+                return
+            self._failure = task.exception()
+            self._runner.cancel()
+
+        task.add_done_callback(done)
+        return task
+
+    def _host_feed(self, host: str, download_q: asyncio.Queue, metadata: dict) -> dict:
+        """站点的 metadata 队列、工作协程和积压列表，首次出现时创建"""
+        if host not in metadata:
+            queue = asyncio.Queue(maxsize=self.host_queue_size)
+            feed = {"queue": queue, "backlog": deque(), "ready": asyncio.Event()}
+            feed["workers"] = [
+                self._supervise(asyncio.create_task(self._run_stage("metadata", queue, download_q, self._metadata)))
+                for _ in range(self.concurrency["metadata"])
+            ]
+            feed["feeder"] = self._supervise(asyncio.create_task(self._host_feeder(feed)))
+            metadata[host] = feed
+        return metadata[host]
+
+    async def _host_feeder(self, feed: dict):
+        """把积压的作品依次放入站点队列；只有该站点因队列已满而等待。收到 None 时关闭该站点的工作协程"""
+        backlog, ready = feed["backlog"], feed["ready"]
+        while True:
+            while not backlog:
+                ready.clear()
+                await ready.wait()
+            job = backlog.popleft()
+            if job is None:
+                for _ in feed["workers"]:
+                    await feed["queue"].put(None)
+                return
+            await feed["queue"].put(job)
+            async with self._backlog_cond:
+                self._backlog -= 1
+                self._backlog_cond.notify_all()
+
+    async def _feed(self, items, download_q: asyncio.Queue, index_q: asyncio.Queue, metadata: dict):
+        """读取输入并完成 resolve 阶段，按站点分发到 metadata 队列"""
+        iterator = iter(items)
+        while True:
+            # 输入可能是带网络请求的生成器（预取、分页枚举），放到线程中读取
+            item = await asyncio.to_thread(next, iterator, None)
+            if item is None:
+                return
+
+            self.stats["jobs"] += 1
+            url = item.get("url", item.get("link", ""))
+            platform = detect_platform(url)
+            job = {
+                "index": self.stats["jobs"],
+                "item": item,
+                "url": url,
+                "star": item.get("star", item.get("rating", 0)),
+                "platform": platform,
+                "host": host_key(url),
+                "stages": self.stages.get(platform),
+                "temp_dir": None,
+                "result": None,
+                "error": None,
+                "timings": {},
+                "track": None,
+                "trace_start": tracing.now(),
+            }
+            tracer = tracing.get_tracer()
+            if tracer:
+                job["track"] = tracer.new_track(f"#{job['index']} {url}")
+
+            if job["stages"] is None:
+                job["error"] = f"不支持的 URL: {url}"
+                await index_q.put(job)
+                continue
+
+            # 不在站点队列上等待：一个站点排满时其他站点的作品照常分发
+            feed = self._host_feed(job["host"], download_q, metadata)
+            async with self._backlog_cond:
+                await self._backlog_cond.wait_for(lambda: self._backlog < self.max_backlog)
+                self._backlog += 1
+            feed["backlog"].append(job)
+            feed["ready"].set()
+
+    async def run(self, items) -> dict:
+        """
+        运行流水线直到输入耗尽、所有作品完成
+
+        Returns:
+            统计信息 {"jobs", "success", "failed", "busy", "elapsed"}，
+            busy 为各阶段累计耗时（秒），可用于判断瓶颈阶段
+        """
+        started = time.monotonic()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.concurrency["ingest"],
+            thread_name_prefix="ingest"
+        )
+
+        download_q = asyncio.Queue(maxsize=self.queue_size)
+        ingest_q = asyncio.Queue(maxsize=self.queue_size)
+        index_q = asyncio.Queue(maxsize=self.queue_size)
+        metadata = {}
+        self._backlog = 0
+        self._backlog_cond = asyncio.Condition()
+        self._runner = asyncio.current_task()
+        self._failure = None
+
+        downloaders = [
+            self._supervise(asyncio.create_task(self._run_stage("download", download_q, ingest_q, self._download)))
+            for _ in range(self.concurrency["download"])
+        ]
+        ingesters = [
+            self._supervise(asyncio.create_task(self._run_stage("ingest", ingest_q, index_q, self._ingest)))
+            for _ in range(self.concurrency["ingest"])
+        ]
+        indexer = self._supervise(asyncio.create_task(self._index(index_q)))
+        tasks = downloaders + ingesters + [indexer]
+
+        try:
+            await self._feed(items, download_q, index_q, metadata)
+
+            # 按阶段顺序依次关闭（积压的作品先全部入队）
+            for feed in metadata.values():
+                feed["backlog"].append(None)
+                feed["ready"].set()
+            await asyncio.gather(*(task for feed in metadata.values() for task in [feed["feeder"]] + feed["workers"]))
+
+            for _ in downloaders:
+                await download_q.put(None)
+            await asyncio.gather(*downloaders)
+
+            for _ in ingesters:
+                await ingest_q.put(None)
+            await asyncio.gather(*ingesters)
+
+            await index_q.put(None)
+            await indexer
+        except asyncio.CancelledError:
+            if self._failure is not None:
+                # 取消来自 _supervise 而非外部，撤销取消计数后抛出阶段协程的异常
+                if hasattr(self._runner, "uncancel"):
+                    self._runner.uncancel()
+                raise self._failure from None
+            raise
+        finally:
+            for task in tasks + [t for feed in metadata.values() for t in [feed["feeder"]] + feed["workers"]]:
+                task.cancel()
+            self._executor.shutdown(wait=False)
+            # 中断时也保证已入库的作品出现在索引中
+            if self._unindexed:
+                self._unindexed = 0
+                self.rebuild_index()
+            self.stats["elapsed"] = time.monotonic() - started
+
+        return self.stats
@@ -2,8 +2,13 @@
 """
 Pixiv 作品归档到 Eagle
 """
+import os
 import json
+import asyncio
 import re
+import time
+import shutil
+import tempfile
 import requests
 from pathlib import Path
 from urllib.parse import urlparse
@@ -15,12 +20,42 @@ from eagle_utils import (
     set_folder_cover,
     rebuild_mtime_index,
     sanitize_filename,
-    download_image
+    download_image,
+    download_stream,
+    CACHE_ROOT,
+    DiskTTLCache
 )
+from rate_limit import observe_response
+from retry import with_retry
+import tracing
 
 # Pixiv cookies 文件路径
 COOKIES_PATH = LIBRARY_ROOT / ".secrets" / "pixiv_cookies.json"
 
+# Pixiv 站点根地址（可用环境变量指向本地 mock 服务）
+PIXIV_ORIGIN = os.environ.get("PIXIV_ORIGIN", "https://www.pixiv.net")
+
+PIXIV_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36",
+    "Referer": "https://www.pixiv.net/",
+}
+
+# 批量预取时每次请求的作品数
+PREFETCH_CHUNK_SIZE = 50
+
+# 原图扩展名候选（批量接口只给缩略图，原图扩展名需要探测）
+ORIGINAL_EXTS = ("jpg", "png", "gif")
+
+# 动图作品类型（illustType）
+ILLUST_TYPE_UGOIRA = 2
+
+# 动图输出格式："webp" 或 "gif"
+UGOIRA_FORMAT = "webp"
+
+# 作品元数据缓存（作品发布后很少变化）
+METADATA_CACHE_DIR = CACHE_ROOT / "pixiv"
+METADATA_TTL = 7 * 24 * 3600
+
 
 def load_cookies():
     """加载 Pixiv cookies"""
@@ -37,7 +72,7 @@ def load_cookies():
 def extract_artwork_id(url: str) -> str:
     """从 URL 提取作品 ID"""
     patterns = [
-        r"pixiv\.net/artworks/(\d+)",
+        r"pixiv\.net/(?:[a-z]{2}/)?artworks/(\d+)",
         r"pixiv\.net/member_illust\.php.*illust_id=(\d+)",
     ]
 
@@ -49,112 +84,331 @@ def extract_artwork_id(url: str) -> str:
     raise ValueError(f"无法从 URL 提取作品 ID: {url}")
 
 
-def fetch_artwork_info(artwork_id: str) -> dict:
-    """获取 Pixiv 作品信息"""
-    cookies = load_cookies()
+def original_base_from_thumb(thumb_url: str) -> str:
+    """
+    由缩略图 URL 推导原图 URL 前缀（不含页码和扩展名）
 
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36",
-        "Referer": "https://www.pixiv.net/",
-    }
+    .../c/250x250_80_a2/img-master/img/2026/01/01/00/00/00/123_p0_square1200.jpg
+    -> .../img-original/img/2026/01/01/00/00/00/123_p
 
-    # 获取作品详情
-    ajax_url = f"https://www.pixiv.net/ajax/illust/{artwork_id}"
-    resp = requests.get(ajax_url, headers=headers, cookies=cookies)
-    resp.raise_for_status()
+    无法识别时返回 None
+    """
+    match = re.match(r"(https?://[^/]+)/.*?/img/((?:\d+/){6})(\d+)_p0", thumb_url or "")
+    if not match:
+        return None
+    host, date_path, artwork_id = match.groups()
+    return f"{host}/img-original/img/{date_path}{artwork_id}_p"
 
-    data = resp.json()
-    if data.get("error"):
-        raise Exception(f"Pixiv API 错误: {data.get('message', '未知错误')}")
 
-    illust = data["body"]
+class PixivClient:
+    """
+    Pixiv ajax 客户端
 
-    return {
-        "id": artwork_id,
-        "title": illust["illustTitle"],
-        "author": illust["userName"],
-        "author_id": illust["userId"],
-        "page_count": illust["pageCount"],
-        "urls": illust["urls"],
-    }
+    - cookies 首次请求时加载一次，之后复用同一个 HTTP 会话
+    - 作品详情与分页结果写入磁盘 TTL 缓存（按作品 ID），
+      重跑或重试时已见过的作品不再发起元数据请求
+    """
 
+    def __init__(self, cookies: dict = None, cache: DiskTTLCache = None, origin: str = None):
+        self.origin = (origin or PIXIV_ORIGIN).rstrip("/")
+        self._cookies = cookies
+        self._session = None
+        self.cache = cache if cache is not None else DiskTTLCache(METADATA_CACHE_DIR, METADATA_TTL)
+        # 实际发出的元数据请求数（不含缓存命中）
+        self.requests_made = 0
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            if self._cookies is None:
+                self._cookies = load_cookies()
+            self._session = requests.Session()
+            self._session.headers.update(PIXIV_HEADERS)
+            self._session.cookies.update(self._cookies)
+        return self._session
+
+    @property
+    def user_id(self) -> str:
+        """当前登录用户 ID（PHPSESSID 形如 "{user_id}_{token}"）"""
+        self.session
+        sessid = self._cookies.get("PHPSESSID", "")
+        if "_" not in sessid:
+            raise ValueError("无法从 cookies 中识别登录用户，请指定用户 ID")
+        return sessid.split("_", 1)[0]
+
+    def get_json(self, path: str, params: dict = None) -> dict:
+        """请求站内 JSON 接口，path 相对于站点根地址"""
+        url = f"{self.origin}{path}"
+
+        def attempt():
+            self.requests_made += 1
+            started = time.monotonic()
+            with tracing.span("GET", cat="http", url=url):
+                resp = self.session.get(url, params=params, timeout=30)
+            observe_response(url, resp.status_code, time.monotonic() - started,
+                             len(resp.content), resp.headers)
+            resp.raise_for_status()
+            return resp.json()
+
+        return with_retry(url, attempt)
+
+    def _get_body(self, path: str, params: dict = None):
+        """请求 ajax 接口并返回 body 字段"""
+        data = self.get_json(path, params)
+        if data.get("error"):
+            raise Exception(f"Pixiv API 错误: {data.get('message', '未知错误')}")
+        return data["body"]
+
+    def fetch_artwork_info(self, artwork_id: str) -> dict:
+        """获取 Pixiv 作品信息"""
+        key = f"illust/{artwork_id}"
+        info = self.cache.get(key)
+        if info is not None:
+            return info
+
+        illust = self._get_body(f"/ajax/illust/{artwork_id}")
+        info = {
+            "id": artwork_id,
+            "title": illust["illustTitle"],
+            "author": illust["userName"],
+            "author_id": illust["userId"],
+            "page_count": illust["pageCount"],
+            "urls": illust["urls"],
+            "illust_type": illust.get("illustType", 0),
+        }
+        self.cache.set(key, info)
+        return info
+
+    def fetch_artwork_pages(self, artwork_id: str) -> list:
+        """获取多图作品的所有页面 URL"""
+        key = f"pages/{artwork_id}"
+        page_urls = self.cache.get(key)
+        if page_urls is not None:
+            return page_urls
+
+        body = self._get_body(f"/ajax/illust/{artwork_id}/pages")
+        page_urls = [page["urls"]["original"] for page in body]
+        self.cache.set(key, page_urls)
+        return page_urls
+
+    def fetch_ugoira_meta(self, artwork_id: str) -> dict:
+        """
+        获取动图的帧 ZIP 地址和帧延迟
+
+        Returns:
+            {"zip": 原始尺寸帧 ZIP 地址, "frames": [{"file": ..., "delay": 毫秒}, ...]}
+        """
+        key = f"ugoira/{artwork_id}"
+        meta = self.cache.get(key)
+        if meta is not None:
+            return meta
+
+        body = self._get_body(f"/ajax/illust/{artwork_id}/ugoira_meta")
+        meta = {
+            "zip": body.get("originalSrc") or body["src"],
+            "frames": body["frames"],
+        }
+        self.cache.set(key, meta)
+        return meta
+
+    def prefetch_artworks(self, artwork_ids: list) -> int:
+        """
+        通过多 ID 接口批量获取作品信息并写入缓存
+
+        每 PREFETCH_CHUNK_SIZE 个作品一次请求。批量接口不返回原图地址，
+        这里记录由缩略图推导的原图前缀，下载时按 ORIGINAL_EXTS 探测扩展名。
+        已缓存的作品不会再次请求；接口未返回的作品（已删除、受限等）
+        留给 fetch_artwork_info 单独处理。
+
+        Returns:
+            新写入缓存的作品数
+        """
+        missing = [str(a) for a in artwork_ids if self.cache.get(f"illust/{a}") is None]
+        prefetched = 0
+
+        for start in range(0, len(missing), PREFETCH_CHUNK_SIZE):
+            chunk = missing[start:start + PREFETCH_CHUNK_SIZE]
+            body = self._get_body(
+                "/ajax/illust/recommend/illusts",
+                {"illust_ids[]": chunk}
+            )
+            for illust in body.get("illusts", []):
+                base = original_base_from_thumb(illust.get("url", ""))
+                if not base or str(illust.get("id")) not in chunk:
+                    continue
+                self.cache.set(f"illust/{illust['id']}", {
+                    "id": str(illust["id"]),
+                    "title": illust["title"],
+                    "author": illust["userName"],
+                    "author_id": illust["userId"],
+                    "page_count": illust["pageCount"],
+                    "urls": {},
+                    "original_base": base,
+                    "illust_type": illust.get("illustType", 0),
+                })
+                prefetched += 1
+
+        return prefetched
+
+    def page_candidates(self, artwork_id: str, info: dict) -> list:
+        """
+        返回每一页原图的候选 URL 列表
+
+        预取过的作品直接按原图前缀拼出各页地址，无需请求 pages 接口。
+        """
+        base = info.get("original_base")
+        if base:
+            return [
+                [f"{base}{i}.{ext}" for ext in ORIGINAL_EXTS]
+                for i in range(info["page_count"])
+            ]
+        if info["page_count"] == 1 and info["urls"].get("original"):
+            return [[info["urls"]["original"]]]
+        return [[page_url] for page_url in self.fetch_artwork_pages(artwork_id)]
+
+
+_default_client = None
+
+
+def get_client() -> PixivClient:
+    """返回进程内共享的 PixivClient"""
+    global _default_client
+    if _default_client is None:
+        _default_client = PixivClient()
+    return _default_client
 
-def fetch_artwork_pages(artwork_id: str) -> list:
-    """获取多图作品的所有页面 URL"""
-    cookies = load_cookies()
 
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36",
-        "Referer": "https://www.pixiv.net/",
-    }
+def fetch_artwork_info(artwork_id: str) -> dict:
+    """获取 Pixiv 作品信息"""
+    return get_client().fetch_artwork_info(artwork_id)
 
-    pages_url = f"https://www.pixiv.net/ajax/illust/{artwork_id}/pages"
-    resp = requests.get(pages_url, headers=headers, cookies=cookies)
-    resp.raise_for_status()
 
-    data = resp.json()
-    if data.get("error"):
-        raise Exception(f"Pixiv API 错误: {data.get('message', '未知错误')}")
+def fetch_artwork_pages(artwork_id: str) -> list:
+    """获取多图作品的所有页面 URL"""
+    return get_client().fetch_artwork_pages(artwork_id)
 
-    return [page["urls"]["original"] for page in data["body"]]
 
+def download_original(candidates: list, temp_dir: Path, stem: str) -> Path:
+    """
+    依次尝试候选 URL 下载原图，404 时换下一个扩展名
 
-def archive_pixiv(url: str, star: int = 0, single: bool = False):
+    Returns:
+        下载后的临时文件路径（扩展名与实际原图一致）
     """
-    归档 Pixiv 作品到 Eagle
+    for i, image_url in enumerate(candidates):
+        ext = image_url.split(".")[-1].split("?")[0]
+        temp_path = temp_dir / f"{stem}.{ext}"
+        try:
+            download_image(image_url, temp_path, headers={"Referer": "https://www.pixiv.net/"})
+            return temp_path
+        except requests.HTTPError as e:
+            not_found = e.response is not None and e.response.status_code == 404
+            if not_found and i < len(candidates) - 1:
+                continue
+            raise
 
-    单图：直接放入 Pixiv 文件夹，文件名 = 标题
-    多图：创建子文件夹，图片命名为 p1, p2...
-    多图 + single=True：只下载第一张图，直接放入 Pixiv 文件夹
 
-    Args:
-        url: 作品链接
-        star: 评分（1-5星，0表示无评分）
-        single: 仅下载第一张图（仅 Pixiv 多图作品有效）
+def plan_pixiv(url: str, single: bool = False, client: PixivClient = None) -> dict:
     """
-    print(f"🎨 正在归档 Pixiv 作品...")
-    print(f"   URL: {url}")
+    元数据阶段：解析作品并确定要下载的内容
+
+    Returns:
+        {"artwork_id", "info", "mode", "pages", "ugoira"}
+        mode 为 "ugoira" | "single" | "multi"；pages 为每页原图候选 URL 列表
+    """
+    client = client or get_client()
 
     # 提取作品 ID
     artwork_id = extract_artwork_id(url)
     print(f"   作品 ID: {artwork_id}")
 
     # 获取作品信息
-    info = fetch_artwork_info(artwork_id)
-    title = info["title"]
-    author = info["author"]
-    page_count = info["page_count"]
+    info = client.fetch_artwork_info(artwork_id)
+    print(f"   标题: {info['title']}")
+    print(f"   作者: {info['author']}")
+    print(f"   页数: {info['page_count']}")
+
+    plan = {"artwork_id": artwork_id, "info": info, "pages": [], "ugoira": None}
+
+    if info.get("illust_type") == ILLUST_TYPE_UGOIRA:
+        plan["mode"] = "ugoira"
+        plan["ugoira"] = client.fetch_ugoira_meta(artwork_id)
+    elif info["page_count"] == 1 or single:
+        plan["mode"] = "single"
+        plan["pages"] = client.page_candidates(artwork_id, info)[:1]
+    else:
+        plan["mode"] = "multi"
+        plan["pages"] = client.page_candidates(artwork_id, info)
+
+    return plan
+
+
+def download_pixiv(plan: dict, temp_dir: Path) -> list:
+    """
+    下载阶段：下载原图（动图为帧 ZIP）到临时目录
+
+    Returns:
+        下载的文件路径列表，与 plan["pages"] 一一对应；动图为 [帧 ZIP 路径]
+    """
+    if plan["mode"] == "ugoira":
+        zip_path = temp_dir / "frames.zip"
+        with open(zip_path, "w+b") as zip_fp, tracing.span("frames.zip", cat="download"):
+            size = download_stream(plan["ugoira"]["zip"], zip_fp, headers={"Referer": "https://www.pixiv.net/"})
+        print(f"   帧 ZIP: {size / 1024 / 1024:.1f} MB, {len(plan['ugoira']['frames'])} 帧")
+        return [zip_path]
+
+    stems = ["image"] if plan["mode"] == "single" else [f"p{i}" for i in range(1, len(plan["pages"]) + 1)]
+    files = []
+    for page, (candidates, stem) in enumerate(zip(plan["pages"], stems), 1):
+        with tracing.span("page", cat="download", page=page):
+            files.append(download_original(candidates, temp_dir, stem))
+    return files
+
+
+def ingest_pixiv(
+    plan: dict,
+    files: list,
+    url: str,
+    star: int = 0,
+    ugoira_format: str = UGOIRA_FORMAT
+) -> dict:
+    """
+    入库阶段：合成动图、创建 Eagle 资源、文件夹和封面（不重建索引）
 
-    print(f"   标题: {title}")
-    print(f"   作者: {author}")
-    print(f"   页数: {page_count}")
+    单图：直接放入 Pixiv 文件夹，文件名 = 标题
+    多图：创建子文件夹，图片命名为 p1, p2...
+    动图：合成为动画 WebP/GIF，直接放入 Pixiv 文件夹，缩略图取自第一帧
 
-    # 准备下载
+    Returns:
+        归档结果字典
+    """
+    info = plan["info"]
+    title = info["title"]
+    author = info["author"]
     pixiv_folder_id = FOLDER_IDS["Pixiv"]
-    temp_dir = Path("/tmp/pixiv_download")
-    temp_dir.mkdir(exist_ok=True)
 
     downloaded = []
 
-    if page_count == 1 or single:
-        # 单图模式：直接放入 Pixiv 文件夹
-        if page_count == 1:
-            print(f"\n📥 单图模式，直接归档到 Pixiv 文件夹")
-            image_url = info["urls"]["original"]
-        else:
-            print(f"\n📥 多图作品，仅下载第一张图")
-            # 获取第一张图的 URL
-            page_urls = fetch_artwork_pages(artwork_id)
-            image_url = page_urls[0]
-
-        ext = image_url.split(".")[-1].split("?")[0]
-        temp_path = temp_dir / f"image.{ext}"
+    if plan["mode"] in ("ugoira", "single"):
+        if plan["mode"] == "ugoira":
+            # 动图：帧直接从 ZIP 中解码，不解压到磁盘
+            from ugoira import assemble_ugoira
 
-        download_image(image_url, temp_path, headers={"Referer": "https://www.pixiv.net/"})
+            print(f"\n🎞️ 动图作品，合成 {ugoira_format.upper()}")
+            image_path = files[0].with_name(f"ugoira.{ugoira_format}")
+            with tracing.span("assemble_ugoira", cat="ingest", frames=len(plan["ugoira"]["frames"])):
+                assemble_ugoira(files[0], plan["ugoira"]["frames"], image_path, fmt=ugoira_format)
+        else:
+            if info["page_count"] == 1:
+                print(f"\n📥 单图模式，直接归档到 Pixiv 文件夹")
+            else:
+                print(f"\n📥 多图作品，仅下载第一张图")
+            image_path = files[0]
 
+        ext = image_path.suffix.lstrip(".")
         safe_title = sanitize_filename(title)
         metadata = create_eagle_asset(
-            image_path=temp_path,
+            image_path=image_path,
             name=safe_title,
             folder_id=pixiv_folder_id,
             source_url=url,
@@ -184,18 +438,10 @@ def archive_pixiv(url: str, star: int = 0, single: bool = False):
         )
         print(f"   创建文件夹: {safe_folder_name}")
 
-        # 获取所有页面 URL
-        page_urls = fetch_artwork_pages(artwork_id)
-
         first_asset_id = None
-        for i, image_url in enumerate(page_urls, 1):
-            ext = image_url.split(".")[-1].split("?")[0]
-            temp_path = temp_dir / f"p{i}.{ext}"
-
-            download_image(image_url, temp_path, headers={"Referer": "https://www.pixiv.net/"})
-
+        for i, image_path in enumerate(files, 1):
             metadata = create_eagle_asset(
-                image_path=temp_path,
+                image_path=image_path,
                 name=f"p{i}",
                 folder_id=subfolder_id,
                 source_url=url,
@@ -221,19 +467,80 @@ def archive_pixiv(url: str, star: int = 0, single: bool = False):
         if first_asset_id:
             set_folder_cover(subfolder_id, first_asset_id)
 
-    # 重建索引
-    rebuild_mtime_index()
-
-    # 清理临时文件
-    import shutil
-    shutil.rmtree(temp_dir, ignore_errors=True)
-
     # 返回结果
     return {
         "platform": "Pixiv",
         "title": title,
         "author": author,
         "url": url,
-        "page_count": page_count,
+        "page_count": info["page_count"],
         "downloaded": downloaded
     }
+
+
+class PixivStages:
+    """
+    批量流水线中 Pixiv 作品的各阶段（见 pipeline.py）
+
+    条目中的 "single" / "ugoira_format" 字段优先于这里的默认值（守护进程按作品指定）。
+    """
+
+    platform = "pixiv"
+
+    def __init__(self, client: PixivClient = None, single: bool = False, ugoira_format: str = UGOIRA_FORMAT):
+        self.client = client
+        self.single = single
+        self.ugoira_format = ugoira_format
+
+    async def metadata(self, job: dict):
+        single = job["item"].get("single", self.single)
+        job["plan"] = await asyncio.to_thread(plan_pixiv, job["url"], single, self.client)
+
+    def download(self, job: dict):
+        job["files"] = download_pixiv(job["plan"], job["temp_dir"])
+
+    def ingest(self, job: dict) -> dict:
+        ugoira_format = job["item"].get("ugoira_format", self.ugoira_format)
+        return ingest_pixiv(job["plan"], job["files"], job["url"], job["star"], ugoira_format)
+
+
+def archive_pixiv(
+    url: str,
+    star: int = 0,
+    single: bool = False,
+    client: PixivClient = None,
+    ugoira_format: str = UGOIRA_FORMAT
+):
+    """
+    归档 Pixiv 作品到 Eagle
+
+    依次执行元数据、下载、入库三个阶段，最后重建索引。
+    批量归档时这些阶段由 pipeline.py 分别调度。
+
+    Args:
+        url: 作品链接
+        star: 评分（1-5星，0表示无评分）
+        single: 仅下载第一张图（仅 Pixiv 多图作品有效）
+        client: PixivClient（可选，默认使用进程内共享实例）
+        ugoira_format: 动图输出格式，"webp" 或 "gif"
+    """
+    print(f"🎨 正在归档 Pixiv 作品...")
+    print(f"   URL: {url}")
+
+    with tracing.span("metadata", cat="stage"):
+        plan = plan_pixiv(url, single=single, client=client)
+
+    temp_dir = Path(tempfile.mkdtemp(prefix="pixiv_download_"))
+    try:
+        with tracing.span("download", cat="stage"):
+            files = download_pixiv(plan, temp_dir)
+        with tracing.span("ingest", cat="stage"):
+            result = ingest_pixiv(plan, files, url, star=star, ugoira_format=ugoira_format)
+    finally:
+        # 清理临时文件
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    # 重建索引
+    rebuild_mtime_index()
+
+    return result
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Pixiv 增量批量同步
+
+按来源（用户作品 / 我的收藏 / 排行榜）分页枚举作品，流式送入批量归档流程。
+每个来源记录一个 high-water mark，下次同步只处理比上次更新的作品。
+
+用法:
+    # 同步某个用户的全部作品
+    python pixiv_sync.py user 123456 --star 3
+
+    # 同步我的收藏（默认从 cookies 识别登录用户）
+    python pixiv_sync.py bookmarks
+    python pixiv_sync.py bookmarks --user 123456 --rest hide
+
+    # 同步排行榜
+    python pixiv_sync.py ranking --mode daily
+    python pixiv_sync.py ranking --mode weekly --content illust --date 20260301
+
+    # 只列出将要归档的作品，不下载、不更新进度
+    python pixiv_sync.py user 123456 --dry-run
+
+进度说明:
+    - high_water: 已完整同步到的位置（用户作品为作品 ID，收藏为收藏 ID，排行榜为日期）
+    - done: 未跑完的同步中已完成的作品，下次跳过
+    - pending: 失败或中断时未完成的作品，下次同步时优先重试
+"""
+import sys
+import json
+import asyncio
+import argparse
+from pathlib import Path
+
+# 添加脚本目录到路径
+scripts_dir = Path(__file__).parent
+sys.path.insert(0, str(scripts_dir))
+
+from eagle_utils import LIBRARY_ROOT
+from pixiv import get_client
+
+# 同步进度文件（跟随素材库，避免换机器后重复归档）
+SYNC_STATE_PATH = LIBRARY_ROOT / ".save-to-eagle" / "pixiv_sync.json"
+
+# 收藏接口每页数量上限
+BOOKMARKS_PAGE_SIZE = 48
+
+
+def artwork_url(artwork_id: int) -> str:
+    return f"https://www.pixiv.net/artworks/{artwork_id}"
+
+
+def iter_user_artworks(client, user_id: str, since: int = 0):
+    """
+    枚举用户的插画和漫画作品，从新到旧
+
+    profile/all 只返回作品 ID，详情由归档流程按需获取。
+
+    Yields:
+        (作品 ID, 游标)，游标即作品 ID
+    """
+    body = client._get_body(f"/ajax/user/{user_id}/profile/all")
+
+    # 没有作品时接口返回 [] 而不是 {}
+    ids = [
+        int(artwork_id)
+        for key in ("illusts", "manga")
+        for artwork_id in (body.get(key) or {})
+        if int(artwork_id) > since
+    ]
+    ids.sort(reverse=True)
+
+    for artwork_id in ids:
+        yield artwork_id, artwork_id
+
+
+def iter_bookmarks(client, user_id: str, since: int = 0, rest: str = "show"):
+    """
+    按收藏时间从新到旧分页枚举收藏，遇到已同步的收藏即停止
+
+    Yields:
+        (作品 ID, 游标)，游标为收藏 ID（随收藏时间递增）
+    """
+    offset = 0
+    while True:
+        body = client._get_body(
+            f"/ajax/user/{user_id}/illusts/bookmarks",
+            {"tag": "", "offset": offset, "limit": BOOKMARKS_PAGE_SIZE, "rest": rest}
+        )
+        works = body.get("works", [])
+        if not works:
+            return
+
+        for work in works:
+            mark = int((work.get("bookmarkData") or {}).get("id", 0))
+            if mark <= since:
+                return
+            # 已删除或不可见的作品
+            if work.get("isMasked"):
+                continue
+            yield int(work["id"]), mark
+
+        offset += len(works)
+        if offset >= body.get("total", 0):
+            return
+
+
+def iter_ranking(client, mode: str = "daily", content: str = None, date: str = None, since: int = 0):
+    """
+    分页枚举排行榜，榜单日期不晚于上次同步时直接跳过
+
+    Yields:
+        (作品 ID, 游标)，游标为榜单日期（YYYYMMDD 整数）
+    """
+    page = 1
+    while page:
+        params = {"mode": mode, "p": page, "format": "json"}
+        if content:
+            params["content"] = content
+        if date:
+            params["date"] = date
+
+        data = client.get_json("/ranking.php", params)
+        ranking_date = int(data["date"])
+        if ranking_date <= since:
+            return
+
+        for entry in data.get("contents", []):
+            yield int(entry["illust_id"]), ranking_date
+
+        page = data.get("next") or None
+
+
+class SyncState:
+    """各来源的同步进度，保存在单个 JSON 文件中"""
+
+    def __init__(self, path: Path = SYNC_STATE_PATH):
+        self.path = Path(path)
+        if self.path.exists():
+            self.data = json.loads(self.path.read_text(encoding='utf-8'))
+        else:
+            self.data = {}
+
+    def source(self, key: str) -> dict:
+        return self.data.setdefault(key, {"high_water": 0, "done": [], "pending": []})
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.path.with_suffix('.tmp')
+        temp.write_text(json.dumps(self.data, ensure_ascii=False, indent=2), encoding='utf-8')
+        temp.replace(self.path)
+
+
+async def sync_source(
+    key: str,
+    enumerate_fn,
+    state: SyncState,
+    star: int = 0,
+    single: bool = False,
+    limit: int = None,
+    dry_run: bool = False,
+    **batch_kwargs
+) -> dict:
+    """
+    同步单个来源
+
+    Args:
+        key: 来源标识，如 "user:123456"
+        enumerate_fn: enumerate_fn(since) 返回 (作品 ID, 游标) 迭代器
+        state: 同步进度
+        star: 评分
+        single: 仅下载第一张图（仅 Pixiv 多图作品有效）
+        limit: 本次最多归档的作品数（可选）
+        dry_run: 只列出作品，不归档、不更新进度
+        **batch_kwargs: 透传给 batch_archive（delay_min, delay_max, log_file）
+
+    Returns:
+        batch_archive 的结果字典
+    """
+    from batch_archive import batch_archive
+
+    src = state.source(key)
+    since = src["high_water"]
+    done = set(src["done"])
+    pending = set(src["pending"])
+    # yielded: 已送入归档流程的作品；reported: 已收到归档结果的作品
+    yielded = set()
+    reported = set()
+    run = {"top": since, "exhausted": False, "complete": False}
+
+    print(f"🔄 同步来源: {key}")
+    print(f"   上次位置: {since or '首次同步'}")
+    if pending:
+        print(f"   待重试: {len(pending)} 个")
+
+    def items():
+        count = 0
+
+        def entries():
+            # 先重试上次失败的作品，再枚举新作品
+            for artwork_id in sorted(pending, reverse=True):
+                yield artwork_id
+            for artwork_id, cursor in enumerate_fn(since):
+                run["top"] = max(run["top"], cursor)
+                yield artwork_id
+
+        for artwork_id in entries():
+            if artwork_id in done or artwork_id in yielded:
+                continue
+            if limit is not None and count >= limit:
+                return
+            yielded.add(artwork_id)
+            count += 1
+            yield {"url": artwork_url(artwork_id), "star": star, "pixiv_id": artwork_id}
+
+        # 枚举结束不代表归档结束：流水线会提前读入输入，须等 batch_archive 返回
+        run["exhausted"] = True
+
+    if dry_run:
+        count = 0
+        for item in items():
+            count += 1
+            print(f"   {item['url']}")
+        print(f"共 {count} 个作品待归档")
+        return {"total": count, "success": 0, "failed": 0, "results": []}
+
+    def on_result(item, record):
+        artwork_id = item["pixiv_id"]
+        reported.add(artwork_id)
+        if record["status"] == "success":
+            done.add(artwork_id)
+            pending.discard(artwork_id)
+        else:
+            pending.add(artwork_id)
+        src["done"] = sorted(done)
+        src["pending"] = sorted(pending)
+        state.save()
+
+    finished = False
+    try:
+        result = await batch_archive(items(), single=single, on_result=on_result, **batch_kwargs)
+        finished = True
+    finally:
+        # 正常返回、枚举到底且每个送入的作品都有结果，才算完整跑完
+        run["complete"] = finished and run["exhausted"] and yielded <= reported
+        if run["complete"]:
+            # 完整跑完：推进 high-water mark，失败的留到下次重试
+            src["high_water"] = run["top"]
+            src["done"] = []
+        else:
+            # 已送入但未完成的作品（中断时仍在流水线中）下次优先重试
+            pending.update(yielded - reported - done)
+        src["pending"] = sorted(pending)
+        state.save()
+
+    if run["complete"]:
+        print(f"\n📌 同步位置已更新: {src['high_water']}")
+    else:
+        print(f"\n📌 同步未完成，已完成 {len(src['done'])} 个作品，下次继续")
+
+    return result
+
+
+def main():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--star", type=int, default=0, help="评分 (1-5星，默认为0)")
+    common.add_argument("--single", action="store_true", help="仅下载第一张图")
+    common.add_argument("--limit", type=int, help="本次最多归档的作品数")
+    common.add_argument("--dry-run", action="store_true", help="只列出作品，不归档")
+    common.add_argument("--delay-min", type=float, default=4.0, help="最小延迟（秒，默认 4）")
+    common.add_argument("--delay-max", type=float, default=8.0, help="最大延迟（秒，默认 8）")
+    common.add_argument("--log", "-l", type=str, help="日志文件路径")
+    common.add_argument("--state", type=str, help=f"同步进度文件（默认 {SYNC_STATE_PATH}）")
+
+    parser = argparse.ArgumentParser(description="Pixiv 增量批量同步到 Eagle 素材库")
+    sub = parser.add_subparsers(dest="source", required=True)
+
+    p_user = sub.add_parser("user", parents=[common], help="同步用户的全部作品")
+    p_user.add_argument("user_id", help="Pixiv 用户 ID")
+
+    p_bm = sub.add_parser("bookmarks", parents=[common], help="同步我的收藏")
+    p_bm.add_argument("--user", dest="user_id", help="用户 ID（默认从 cookies 识别）")
+    p_bm.add_argument("--rest", choices=["show", "hide"], default="show", help="公开/非公开收藏")
+
+    p_rank = sub.add_parser("ranking", parents=[common], help="同步排行榜")
+    p_rank.add_argument("--mode", default="daily", help="榜单类型，如 daily/weekly/monthly/rookie")
+    p_rank.add_argument("--content", help="内容类型，如 illust/manga/ugoira")
+    p_rank.add_argument("--date", help="榜单日期 YYYYMMDD（默认最新）")
+
+    args = parser.parse_args()
+
+    client = get_client()
+    state = SyncState(Path(args.state)) if args.state else SyncState()
+
+    if args.source == "user":
+        key = f"user:{args.user_id}"
+        enumerate_fn = lambda since: iter_user_artworks(client, args.user_id, since)
+    elif args.source == "bookmarks":
+        user_id = args.user_id or client.user_id
+        key = f"bookmarks:{user_id}:{args.rest}"
+        enumerate_fn = lambda since: iter_bookmarks(client, user_id, since, rest=args.rest)
+    else:
+        key = f"ranking:{args.mode}:{args.content or 'all'}"
+        enumerate_fn = lambda since: iter_ranking(client, args.mode, args.content, args.date, since)
+
+    try:
+        asyncio.run(sync_source(
+            key,
+            enumerate_fn,
+            state,
+            star=args.star,
+            single=args.single,
+            limit=args.limit,
+            dry_run=args.dry_run,
+            delay_min=args.delay_min,
+            delay_max=args.delay_max,
+            log_file=args.log
+        ))
+    except KeyboardInterrupt:
+        print("\n\n⚠️ 用户中断，进度已保存")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n❌ 同步失败: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+内置性能剖析（--profile）
+
+- CPU: cProfile 覆盖主线程和之后启动的所有线程（流水线的下载/入库线程）：
+  Python 3.12 以下每个线程各用一个 cProfile；3.12 起同一时间只能有一个 cProfile 在运行，
+  只剖析主线程，其他线程由采样器覆盖；
+  另有内置采样器定期读取各线程调用栈（sys._current_frames），不与 cProfile 冲突；
+  已安装 py-spy 时额外从外部进程采样（含原生代码），输出 speedscope 格式
+- 内存: tracemalloc 按间隔记录已分配内存和增长最多的分配位置
+
+结束时在输出目录写出:
+    report.txt          热点函数排名（重点列出 eagle_utils / pixiv / behance）与分配位置排名
+    cpu.prof            cProfile 原始数据（可用 snakeviz / pstats 查看）
+    memory.jsonl        每次内存快照的已分配量、峰值和增长最多的位置
+    memory.snapshot     最后一次 tracemalloc 快照（tracemalloc.Snapshot.load 读取）
+    py-spy.json         （已安装 py-spy 时）可在 https://www.speedscope.app 打开
+
+用法:
+    python main.py <url> --profile
+    python batch_archive.py --input urls.jsonl --profile ./profile --profile-interval 10
+"""
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import subprocess
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from pathlib import Path
+from datetime import datetime
+from collections import Counter
+
+from eagle_utils import CACHE_ROOT
+
+# 未指定目录时的输出位置
+PROFILE_DIR = CACHE_ROOT / "profiles"
+
+# 报告中重点关注的模块
+FOCUS_MODULES = ("eagle_utils", "pixiv", "behance")
+
+# 采样间隔（秒）
+SAMPLE_INTERVAL = 0.01
+
+# tracemalloc 保存的调用栈深度
+TRACEMALLOC_FRAMES = 10
+
+# 报告中每个排名列出的条数
+TOP_N = 20
+
+# 是否为每个线程单独启动 cProfile（3.12 起只能有一个 cProfile 在运行，再 enable() 会抛 ValueError）
+PER_THREAD_PROFILES = sys.version_info < (3, 12)
+
+
+def default_profile_dir() -> Path:
+    return PROFILE_DIR / datetime.now().strftime('%Y%m%d_%H%M%S')
+
+
+def _module_of(filename: str) -> str:
+    return Path(filename).stem
+
+
+class StackSampler(threading.Thread):
+    """
+    内置采样器：定期读取所有线程的调用栈
+
+    self 计数为栈顶函数，total 计数为栈中出现的函数（每个样本每个函数只计一次）。
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.self_counts = Counter()
+        self.total_counts = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == self.ident:
+                    continue
+                self.samples += 1
+                seen = set()
+                leaf = True
+                while frame is not None:
+                    code = frame.f_code
+                    key = (code.co_filename, code.co_firstlineno, code.co_name)
+                    if leaf:
+                        self.self_counts[key] += 1
+                        leaf = False
+                    if key not in seen:
+                        self.total_counts[key] += 1
+                        seen.add(key)
+                    frame = frame.f_back
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class MemorySampler(threading.Thread):
+    """按间隔记录 tracemalloc 快照，写入 memory.jsonl"""
+
+    def __init__(self, path: Path, interval: float):
+        super().__init__(name="profile-memory", daemon=True)
+        self.path = path
+        self.interval = interval
+        self.baseline = None
+        self.latest = None
+        self._stop_event = threading.Event()
+
+    def snapshot(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            # 剖析器自身的采样数据
+            tracemalloc.Filter(False, __file__),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        if self.baseline is None:
+            self.baseline = snapshot
+        growth = snapshot.compare_to(self.baseline, "lineno")[:5]
+        self.latest = snapshot
+        with open(self.path, "a", encoding='utf-8') as fp:
+            fp.write(json.dumps({
+                "t": datetime.now().isoformat(timespec="seconds"),
+                "current": current,
+                "peak": peak,
+                "growth": [
+                    {"site": str(stat.traceback[0]), "size_diff": stat.size_diff, "count_diff": stat.count_diff}
+                    for stat in growth
+                ],
+            }, ensure_ascii=False) + "\n")
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.snapshot()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.snapshot()
+
+
+class Profiler:
+    """
+    CPU + 内存剖析会话
+
+    Args:
+        out_dir: 输出目录，默认按时间生成在 ~/.cache/save-to-eagle/profiles/ 下
+        memory_interval: tracemalloc 快照间隔（秒）
+    """
+
+    def __init__(self, out_dir: Path = None, memory_interval: float = 30.0):
+        self.out_dir = Path(out_dir) if out_dir else default_profile_dir()
+        self.memory_interval = memory_interval
+        self._profiles = []
+        self._lock = threading.Lock()
+        self._sampler = None
+        self._pyspy = None
+        self._memory = None
+        self.started = None
+
+    def _thread_hook(self, frame, event, arg):
+        # 新线程的第一个剖析事件：为该线程启动独立的 cProfile（之后由它接管 setprofile）
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # 已有其他剖析工具在运行：该线程只由采样器覆盖（抛出异常会导致线程直接退出）
+            sys.setprofile(None)
+            return
+        with self._lock:
+            self._profiles.append(profile)
+
+    def start(self):
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.started = time.monotonic()
+
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        self._memory = MemorySampler(self.out_dir / "memory.jsonl", self.memory_interval)
+        self._memory.snapshot()
+        self._memory.start()
+
+        self._sampler = StackSampler()
+        self._sampler.start()
+
+        # py-spy 需要附加到进程的权限（macOS 上通常需要 sudo），失败时只提示
+        pyspy = shutil.which("py-spy")
+        if pyspy:
+            self._pyspy = subprocess.Popen(
+                [pyspy, "record", "--pid", str(os.getpid()), "--threads", "--format", "speedscope",
+                 "--output", str(self.out_dir / "py-spy.json")],
+                stdout=subprocess.DEVNULL,
+                stderr=open(self.out_dir / "py-spy.log", "w")
+            )
+
+        if PER_THREAD_PROFILES:
+            threading.setprofile(self._thread_hook)
+        main_profile = cProfile.Profile()
+        self._profiles.append(main_profile)
+        main_profile.enable()
+        print(f"🔬 性能剖析已开启，输出目录: {self.out_dir}")
+
+    def stop(self) -> Path:
+        """停止剖析并写出报告，返回 report.txt 路径"""
+        self._profiles[0].disable()
+        threading.setprofile(None)
+        elapsed = time.monotonic() - self.started
+
+        self._sampler.stop()
+        if self._pyspy:
+            # py-spy 收到 SIGINT 后写出结果
+            self._pyspy.send_signal(signal.SIGINT)
+            try:
+                self._pyspy.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self._pyspy.kill()
+            if not (self.out_dir / "py-spy.json").exists():
+                print(f"   ⚠️ py-spy 未能采样（可能需要 sudo），见 {self.out_dir / 'py-spy.log'}")
+        self._memory.stop()
+        self._memory.latest.dump(str(self.out_dir / "memory.snapshot"))
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        with self._lock:
+            profiles = list(self._profiles)
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(str(self.out_dir / "cpu.prof"))
+
+        report = self.out_dir / "report.txt"
+        report.write_text(self._report(stats, elapsed, current, peak, len(profiles)), encoding='utf-8')
+        print(f"🔬 剖析报告: {report}")
+        return report
+
+    # ---- 报告 ----
+
+    def _report(self, stats: pstats.Stats, elapsed: float, current: int, peak: int, threads: int) -> str:
+        out = io.StringIO()
+        out.write(f"save-to-eagle 性能剖析报告  {datetime.now().isoformat(timespec='seconds')}\n")
+        out.write(f"总耗时 {elapsed:.1f} 秒, 剖析线程 {threads} 个\n")
+
+        entries = [
+            (func, cc, nc, tt, ct)
+            for func, (cc, nc, tt, ct, _callers) in stats.stats.items()
+        ]
+
+        def table(title, rows):
+            out.write(f"\n== {title} ==\n")
+            out.write(f"{'累计(s)':>9} {'自身(s)':>9} {'调用':>9}  函数\n")
+            for (filename, lineno, name), cc, nc, tt, ct in rows[:TOP_N]:
+                out.write(f"{ct:9.3f} {tt:9.3f} {nc:9d}  {_module_of(filename)}.{name} ({Path(filename).name}:{lineno})\n")
+
+        focus = [e for e in entries if _module_of(e[0][0]) in FOCUS_MODULES]
+        table(f"{' / '.join(FOCUS_MODULES)} 热点（按累计耗时）", sorted(focus, key=lambda e: e[4], reverse=True))
+        table(f"{' / '.join(FOCUS_MODULES)} 热点（按自身耗时）", sorted(focus, key=lambda e: e[3], reverse=True))
+        table("全部函数（按自身耗时）", sorted(entries, key=lambda e: e[3], reverse=True))
+
+        if self._sampler.samples:
+            sampler = self._sampler
+            out.write(f"\n== 采样剖析（{sampler.samples} 个线程样本，间隔 {sampler.interval * 1000:.0f} ms）==\n")
+            out.write(f"{'栈中%':>7} {'栈顶%':>7}  函数\n")
+            for key, total in sampler.total_counts.most_common():
+                filename, lineno, name = key
+                if _module_of(filename) not in FOCUS_MODULES:
+                    continue
+                out.write(f"{total / sampler.samples * 100:6.1f}% {sampler.self_counts[key] / sampler.samples * 100:6.1f}%  "
+                          f"{_module_of(filename)}.{name} ({Path(filename).name}:{lineno})\n")
+            out.write("-- 栈顶（全部模块）--\n")
+            for (filename, lineno, name), count in sampler.self_counts.most_common(TOP_N):
+                out.write(f"        {count / sampler.samples * 100:6.1f}%  {_module_of(filename)}.{name} "
+                          f"({Path(filename).name}:{lineno})\n")
+        if self._pyspy:
+            out.write("\npy-spy 采样结果见 py-spy.json（https://www.speedscope.app）\n")
+
+        out.write("\n== 内存（tracemalloc）==\n")
+        out.write(f"结束时已分配 {current / 1024 / 1024:.1f} MB, 峰值 {peak / 1024 / 1024:.1f} MB\n")
+        memory = self._memory
+        out.write("-- 分配最多的位置 --\n")
+        for stat in memory.latest.statistics("lineno")[:TOP_N]:
+            out.write(f"{stat.size / 1024:10.1f} KB {stat.count:8d} 块  {stat.traceback[0]}\n")
+        out.write("-- 运行期间增长最多的位置 --\n")
+        for stat in memory.latest.compare_to(memory.baseline, "lineno")[:TOP_N]:
+            out.write(f"{stat.size_diff / 1024:+10.1f} KB {stat.count_diff:+8d} 块  {stat.traceback[0]}\n")
+
+        return out.getvalue()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+按主机的令牌桶限速器
+
+- 每个主机（按站点归组，如 i.pximg.net 归入 pixiv.net）一个令牌桶，
+  不同主机之间互不等待
+- 间隔带随机抖动，避免固定节奏被识别
+- AIMD 自适应：请求顺利时缓慢加速，遇到 429/403 或响应过慢时成倍减速
+- 可选的全局带宽上限
+
+线程安全：下载在线程池中进行，HTTP 调用通过 observe() 回报结果。
+"""
+import time
+import random
+import asyncio
+import threading
+from urllib.parse import urlparse
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# 同一站点的不同域名共用一个令牌桶
+HOST_ALIASES = {
+    "pximg.net": "pixiv.net",
+}
+
+# 视为被限流的状态码
+THROTTLE_STATUSES = (403, 429)
+
+
+def host_key(url: str) -> str:
+    """返回 URL 所属站点，如 https://i.pximg.net/... -> pixiv.net"""
+    netloc = urlparse(url).hostname or ""
+    # IP 地址（如本地 mock 服务）不做归组
+    if netloc.replace(".", "").isdigit():
+        return netloc
+    parts = netloc.split(".")
+    domain = ".".join(parts[-2:]) if len(parts) >= 2 else netloc
+    return HOST_ALIASES.get(domain, domain)
+
+
+def parse_retry_after(value) -> float:
+    """
+    解析 Retry-After 头（秒数或 HTTP 日期）
+
+    Returns:
+        需要等待的秒数，无法解析时返回 None
+    """
+    if not value:
+        return None
+    value = str(value).strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class HostBucket:
+    """
+    单个主机的令牌桶（容量 1，即只控制间隔）
+
+    rate 为每秒令牌数，在 [min_rate, max_rate] 范围内按 AIMD 调整。
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        min_rate: float,
+        max_rate: float,
+        jitter: float = 0.33,
+        increase: float = 0.05,
+        decrease: float = 0.5,
+        slow_latency: float = 10.0
+    ):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.jitter = jitter
+        self.increase = increase
+        self.decrease = decrease
+        self.slow_latency = slow_latency
+
+        # 下一个令牌可用的时间点
+        self.next_at = 0.0
+        # 统计
+        self.acquired = 0
+        self.first_at = None
+        self.last_at = None
+        self.throttled = 0
+        self.responses = 0
+        self.bytes = 0
+
+    def reserve(self, now: float) -> float:
+        """预约一个令牌，返回需要等待的秒数"""
+        start = max(now, self.next_at)
+        spacing = 1.0 / self.rate
+        self.next_at = start + spacing * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+        self.acquired += 1
+        if self.first_at is None:
+            self.first_at = start
+        self.last_at = start
+        return start - now
+
+    def observe(self, status: int, latency: float, now: float, retry_after: float = None):
+        """根据响应调整速率"""
+        self.responses += 1
+        if status in THROTTLE_STATUSES:
+            # 乘性减：速率减半，并推迟下一个令牌
+            self.throttled += 1
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            pause = retry_after if retry_after is not None else 1.0 / self.rate
+            self.next_at = max(self.next_at, now + pause)
+        elif latency > self.slow_latency:
+            # 服务端变慢，温和减速
+            self.rate = max(self.min_rate, self.rate * (1 - (1 - self.decrease) / 2))
+        elif 200 <= status < 400:
+            # 加性增：每次成功增加固定比例的速率上限
+            self.rate = min(self.max_rate, self.rate + self.increase * self.max_rate)
+
+    def achieved_rate(self) -> float:
+        """实际达到的速率（次/分钟）"""
+        if self.acquired < 2 or self.last_at == self.first_at:
+            return 0.0
+        return (self.acquired - 1) / (self.last_at - self.first_at) * 60
+
+
+class RateLimiter:
+    """
+    多主机限速器
+
+    Args:
+        delay_min: 同一主机两次请求的最小平均间隔（秒），即加速上限
+        delay_max: 初始间隔上限，初始间隔取 (delay_min + delay_max) / 2
+        bandwidth: 全局带宽上限（字节/秒），None 表示不限
+    """
+
+    def __init__(self, delay_min: float = 4.0, delay_max: float = 8.0, bandwidth: float = None):
+        self.delay_min = max(delay_min, 0.001)
+        self.delay_max = max(delay_max, self.delay_min)
+        self.bandwidth = bandwidth
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._bandwidth_next_at = 0.0
+
+    def bucket(self, host: str) -> HostBucket:
+        with self._lock:
+            if host not in self._buckets:
+                mean = (self.delay_min + self.delay_max) / 2
+                # 抖动幅度与原先的 delay_min-delay_max 随机范围一致
+                jitter = (self.delay_max - self.delay_min) / 2 / mean if mean else 0
+                self._buckets[host] = HostBucket(
+                    rate=1.0 / mean,
+                    min_rate=1.0 / (self.delay_max * 8),
+                    max_rate=1.0 / self.delay_min,
+                    jitter=jitter
+                )
+            return self._buckets[host]
+
+    def reserve(self, url: str) -> float:
+        bucket = self.bucket(host_key(url))
+        with self._lock:
+            return bucket.reserve(time.monotonic())
+
+    def acquire(self, url: str) -> float:
+        """阻塞直到该主机可以发出下一个请求，返回等待秒数"""
+        wait = self.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, url: str) -> float:
+        """acquire 的协程版本，等待期间不阻塞事件循环"""
+        wait = self.reserve(url)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def observe(self, url: str, status: int, latency: float, nbytes: int = 0, retry_after: float = None):
+        """回报一次 HTTP 响应，用于自适应调速和带宽统计"""
+        bucket = self.bucket(host_key(url))
+        now = time.monotonic()
+        with self._lock:
+            bucket.observe(status, latency, now, retry_after)
+            bucket.bytes += nbytes
+
+    def throttle_bandwidth(self, nbytes: int):
+        """全局带宽限制：按已传输字节数阻塞相应时间"""
+        if not self.bandwidth or nbytes <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._bandwidth_next_at)
+            self._bandwidth_next_at = start + nbytes / self.bandwidth
+            wait = self._bandwidth_next_at - now
+        if wait > 0:
+            time.sleep(wait)
+
+    def summary(self) -> dict:
+        """各主机的统计信息"""
+        with self._lock:
+            return {
+                host: {
+                    "requests": bucket.acquired,
+                    "per_minute": round(bucket.achieved_rate(), 2),
+                    "interval": round(1.0 / bucket.rate, 2),
+                    "throttled": bucket.throttled,
+                    "bytes": bucket.bytes,
+                }
+                for host, bucket in self._buckets.items()
+            }
+
+
+# 当前生效的限速器；未设置时（单条归档）HTTP 回报为空操作
+_active_limiter = None
+
+
+def set_limiter(limiter: RateLimiter):
+    global _active_limiter
+    _active_limiter = limiter
+
+
+def get_limiter() -> RateLimiter:
+    return _active_limiter
+
+
+def observe_response(url: str, status: int, latency: float, nbytes: int = 0, headers: dict = None):
+    """供 HTTP 调用处回报响应；没有生效的限速器时什么也不做"""
+    limiter = _active_limiter
+    if limiter is None:
+        return
+    retry_after = parse_retry_after(headers.get("Retry-After")) if headers else None
+    limiter.observe(url, status, latency, nbytes, retry_after)
+    limiter.throttle_bandwidth(nbytes)
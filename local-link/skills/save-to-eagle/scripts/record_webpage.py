@@ -1,16 +1,31 @@
 #!/usr/bin/env python3
 """
 网页屏幕录制工具
-支持动画录制和滚动录制
+支持动画录制、滚动截图和长图拼接
 
 用法:
     python record_webpage.py <url> [options]
     python record_webpage.py "https://boardmix.cn" --duration 10 --output ./videos/
+    python record_webpage.py "https://boardmix.cn" --screencast --format webp --fps 12 --max-size 960
+    python record_webpage.py "https://boardmix.cn" --until-idle --idle-window 1.5 --duration 20
     python record_webpage.py "https://example.com" --scroll --output ./captures/
+    python record_webpage.py "https://example.com" --stitch --output ./captures/
+
+    # 第一次访问录制 HAR，之后从 HAR 离线回放（加载快且稳定，不访问网络）
+    python record_webpage.py "https://example.com" --stitch --har fixtures/example.har
+
+    # 批量：多个 URL × 视口矩阵，共用一个 Edge 连接并行录制
+    python record_webpage.py https://a.com https://b.com --viewports desktop,tablet,mobile --screencast
+    python record_webpage.py --urls pages.txt --viewports desktop,390x844 --stitch --concurrency 6
 """
+import re
+import time
 import argparse
 import asyncio
+import contextlib
 import json
+import shutil
+import subprocess
 from pathlib import Path
 from urllib.parse import urlparse
 
@@ -21,6 +36,32 @@ except ImportError:
     print("运行: pip install playwright && playwright install chromium")
     raise
 
+# 拼接模式每次滚动的距离占视口（去掉吸顶 / 吸底元素）的比例，其余部分作为与上一屏的重叠用于匹配
+STITCH_STEP_RATIO = 0.75
+
+# 拼接模式最多截取的屏数（无限滚动的页面不会到底）
+STITCH_MAX_FRAMES = 200
+
+# 截图与拼接之间最多缓冲的帧数
+STITCH_QUEUE_SIZE = 2
+
+# 批量录制的视口预设（--viewports 中也可直接写 宽x高）
+VIEWPORTS = {
+    "desktop": (1440, 900),
+    "tablet": (768, 1024),
+    "mobile": (390, 844),
+}
+
+# 批量录制默认同时进行的任务数
+BATCH_CONCURRENCY = 4
+
+# 空闲检测模式下截图采样的间隔（秒）与 JPEG 质量
+IDLE_SAMPLE_INTERVAL = 0.2
+IDLE_SAMPLE_QUALITY = 50
+
+# 等待滚动后的两次重绘完成
+WAIT_FOR_PAINT = "() => new Promise(r => requestAnimationFrame(() => requestAnimationFrame(r)))"
+
 
 async def get_edge_ws_url(port: int = 9222) -> str:
     """获取 Edge 的 WebSocket 调试 URL"""
@@ -35,22 +76,120 @@ async def get_edge_ws_url(port: int = 9222) -> str:
         raise
 
 
+@contextlib.asynccontextmanager
+async def connect_edge(browser=None):
+    """
+    连接 Edge（CDP）
+
+    传入已连接的 browser 时直接复用（批量录制时所有任务共用一个连接），退出时不断开。
+    """
+    if browser is not None:
+        yield browser
+        return
+
+    ws_url = await get_edge_ws_url()
+    async with async_playwright() as p:
+        browser = await p.chromium.connect_over_cdp(ws_url)
+        try:
+            yield browser
+        finally:
+            await browser.close()
+
+
+async def new_context(browser, viewport: tuple, har=None, **options):
+    """
+    新建指定视口的 context
+
+    Args:
+        browser: 已连接的浏览器
+        viewport: 视口大小 (width, height)
+        har: har.HarArchive，设置时注册 HAR 录制 / 回放（可选）
+        **options: 透传给 browser.new_context
+    """
+    if har is not None:
+        options.update(har.context_options())
+    context = await browser.new_context(viewport={"width": viewport[0], "height": viewport[1]}, **options)
+    if har is not None:
+        await har.attach(context)
+    return context
+
+
+async def sample_until_idle(page, detector, timeout: float) -> bool:
+    """
+    定时截图送入 MotionDetector，直到画面静止或超时
+
+    Returns:
+        是否因画面静止而提前结束
+    """
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        data = await page.screenshot(type="jpeg", quality=IDLE_SAMPLE_QUALITY)
+        await asyncio.to_thread(detector.update, data, time.time())
+        if detector.idle(time.time()):
+            return True
+        await asyncio.sleep(IDLE_SAMPLE_INTERVAL)
+    return False
+
+
+def trim_video(path: Path, start: float, end: float) -> bool:
+    """
+    用 ffmpeg 裁剪视频（重新编码，切点准确）
+
+    Args:
+        path: 视频路径（原地替换）
+        start: 开始时间（秒）
+        end: 结束时间（秒）
+
+    Returns:
+        是否已裁剪；未安装 ffmpeg 或裁剪失败时保留原视频
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        print("⚠️ 未找到 ffmpeg，保留首尾静止片段")
+        return False
+
+    tmp = path.with_name(f"{path.stem}.tmp{path.suffix}")
+    proc = subprocess.run(
+        [ffmpeg, "-nostdin", "-loglevel", "error", "-y", "-ss", f"{start:.3f}", "-i", str(path),
+         "-t", f"{end - start:.3f}", "-c:v", "libvpx-vp9", "-b:v", "0", "-crf", "32",
+         "-deadline", "realtime", "-cpu-used", "8", "-an", str(tmp)],
+        stdin=subprocess.DEVNULL, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        tmp.unlink(missing_ok=True)
+        print(f"⚠️ 裁剪失败，保留原视频: {proc.stderr.strip()}")
+        return False
+    tmp.replace(path)
+    return True
+
+
 async def record_animation(
     url: str,
     output_dir: Path,
     duration: int = 10,
     viewport: tuple = (1440, 900),
-    wait_time: int = 2
+    wait_time: int = 2,
+    browser=None,
+    until_idle: bool = False,
+    idle_window: float = None,
+    har=None
 ) -> Path:
     """
     录制页面动画
 
+    until_idle 时不固定等待 wait_time + duration：加载后即开始截图采样，画面静止 idle_window 秒后
+    提前结束（最长仍为 wait_time + duration），并用 ffmpeg 裁掉首尾静止片段。
+
     Args:
         url: 目标网页 URL
         output_dir: 输出目录
-        duration: 录制时长（秒）
+        duration: 录制时长（秒；until_idle 时为最长时长）
         viewport: 视口大小 (width, height)
-        wait_time: 页面加载后等待时间（秒）
+        wait_time: 页面加载后等待时间（秒；until_idle 时为等待动画开始的时长）
+        browser: 已连接的浏览器（可选，默认新建连接）
+        until_idle: 画面静止后提前结束并裁掉首尾静止片段
+        idle_window: 空闲窗口（秒，默认 motion.DEFAULT_IDLE_WINDOW）
+        har: har.HarArchive，从 HAR 回放页面或录制 HAR（可选）
 
     Returns:
         保存的视频文件路径
@@ -58,56 +197,169 @@ async def record_animation(
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    ws_url = await get_edge_ws_url()
-
-    async with async_playwright() as p:
-        # 连接到 Edge
-        browser = await p.chromium.connect_over_cdp(ws_url)
-
+    async with connect_edge(browser) as browser:
         # 创建带录制的 context
-        context = await browser.new_context(
+        context = await new_context(
+            browser, viewport, har,
             record_video={
                 "dir": str(output_dir),
                 "size": {"width": viewport[0], "height": viewport[1]}
-            },
-            viewport={"width": viewport[0], "height": viewport[1]}
+            }
         )
 
         page = await context.new_page()
+        # 视频从页面创建时开始
+        video_start = time.time()
 
         print(f"正在加载页面: {url}")
         await page.goto(url, wait_until="domcontentloaded", timeout=60000)
 
-        # 等待动画加载
-        print(f"等待 {wait_time} 秒让动画加载...")
-        await asyncio.sleep(wait_time)
-
-        print(f"开始录制，持续 {duration} 秒...")
-        await asyncio.sleep(duration)
-
-        # 关闭 context，视频自动保存
+        if until_idle:
+            from motion import DEFAULT_IDLE_WINDOW, MotionDetector
+            detector = MotionDetector(idle_window or DEFAULT_IDLE_WINDOW, start=time.time(), grace=wait_time)
+            print(f"录制到画面静止 {detector.window} 秒为止，最长 {wait_time + duration} 秒...")
+            idle = await sample_until_idle(page, detector, wait_time + duration)
+            video_end = time.time()
+            print(f"{'画面已静止，提前结束' if idle else '已达到最长时长'}"
+                  f"（录制 {video_end - video_start:.1f} 秒，采样 {detector.samples} 帧）")
+        else:
+            # 等待动画加载
+            print(f"等待 {wait_time} 秒让动画加载...")
+            await asyncio.sleep(wait_time)
+
+            print(f"开始录制，持续 {duration} 秒...")
+            await asyncio.sleep(duration)
+
+        # 关闭 context，视频自动保存；按页面取视频文件（并行录制时输出目录中还有其他任务的视频）
         await context.close()
-        await browser.close()
+        video_path = Path(await page.video.path()) if page.video else None
 
-    # 查找生成的视频文件
-    video_files = sorted(output_dir.glob("*.webm"), key=lambda x: x.stat().st_mtime, reverse=True)
-    if video_files:
+    if video_path and video_path.exists():
         # 重命名为有意义的文件名
         domain = urlparse(url).netloc.replace("www.", "").replace(".", "_")
         new_name = output_dir / f"{domain}_{duration}s.webm"
-        video_files[0].rename(new_name)
+        video_path.replace(new_name)
+        if until_idle:
+            start, end = detector.trim_range(video_start, video_end)
+            if (start, end) != (video_start, video_end) and trim_video(new_name, start - video_start, end - video_start):
+                print(f"已裁掉首尾静止片段: 保留 {start - video_start:.1f}s - {end - video_start:.1f}s")
         print(f"视频已保存: {new_name}")
         return new_name
     else:
         raise RuntimeError("未找到录制的视频文件")
 
 
+async def record_screencast(
+    url: str,
+    output_dir: Path,
+    duration: int = 10,
+    viewport: tuple = (1440, 900),
+    wait_time: int = 2,
+    fmt: str = "webp",
+    fps: int = None,
+    max_size: int = None,
+    quality: int = None,
+    browser=None,
+    isolated: bool = False,
+    until_idle: bool = False,
+    idle_window: float = None,
+    har=None
+) -> dict:
+    """
+    录制页面动画（CDP 屏幕推流）
+
+    与 record_animation 不同，不新建录制用的 context：在已连接浏览器的默认 context 中
+    打开页面（保留登录状态），帧经有界队列交给编码线程，输出路径固定为 {域名}_{时长}s.{格式}。
+
+    Args:
+        url: 目标网页 URL
+        output_dir: 输出目录
+        duration: 录制时长（秒）
+        viewport: 视口大小 (width, height)
+        wait_time: 页面加载后等待时间（秒）
+        fmt: 输出格式，见 screencast.SCREENCAST_FORMATS
+        fps: 目标帧率（默认 screencast.DEFAULT_FPS）
+        max_size: 帧的最大宽 / 高（像素），默认为视口大小
+        quality: JPEG / WebP 质量（0-100，默认 screencast.DEFAULT_QUALITY）
+        browser: 已连接的浏览器（可选，默认新建连接）
+        isolated: 在新建的 context 中录制（并行录制时使用：同一窗口中的后台标签页不会重绘）
+        until_idle: 加载后立即开始录制，画面静止 idle_window 秒后提前结束（最长 wait_time + duration），
+                    并跳过画面没有变化的帧、裁掉首尾静止片段
+        idle_window: 空闲窗口（秒，默认 motion.DEFAULT_IDLE_WINDOW）
+        har: har.HarArchive，从 HAR 回放页面或录制 HAR（可选；HAR 路由只作用于新建的 context）
+
+    Returns:
+        ScreencastRecorder.stop() 的结果字典（path、frames、dropped 等）
+    """
+    from screencast import DEFAULT_FPS, DEFAULT_QUALITY, ScreencastRecorder
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    domain = urlparse(url).netloc.replace("www.", "").replace(".", "_")
+
+    async with connect_edge(browser) as browser:
+        own_context = isolated or har is not None or not browser.contexts
+        if own_context:
+            context = await new_context(browser, viewport, har)
+        else:
+            context = browser.contexts[0]
+        page = await context.new_page()
+        await page.set_viewport_size({"width": viewport[0], "height": viewport[1]})
+
+        try:
+            print(f"正在加载页面: {url}")
+            await page.goto(url, wait_until="domcontentloaded", timeout=60000)
+
+            if until_idle:
+                from motion import DEFAULT_IDLE_WINDOW
+                idle_window = idle_window or DEFAULT_IDLE_WINDOW
+            else:
+                print(f"等待 {wait_time} 秒让动画加载...")
+                await asyncio.sleep(wait_time)
+
+            recorder = ScreencastRecorder(
+                page,
+                output_dir / f"{domain}_{duration}s",
+                fmt=fmt,
+                fps=fps or DEFAULT_FPS,
+                max_size=max_size,
+                quality=quality or DEFAULT_QUALITY,
+                idle_window=idle_window if until_idle else None,
+                idle_grace=wait_time
+            )
+            await recorder.start()
+            if until_idle:
+                print(f"开始录制，直到画面静止 {idle_window} 秒，最长 {wait_time + duration} 秒"
+                      f"（{recorder.fmt}，{recorder.fps} fps）...")
+                if await recorder.wait_idle(wait_time + duration):
+                    print(f"画面已静止，提前结束（{time.time() - recorder.started:.1f} 秒）")
+            else:
+                print(f"开始录制，持续 {duration} 秒（{recorder.fmt}，{recorder.fps} fps）...")
+                await asyncio.sleep(duration)
+            result = await recorder.stop()
+        finally:
+            await page.close()
+            if own_context:
+                await context.close()
+
+    size = result["path"].stat().st_size
+    print(f"视频已保存: {result['path']} ({size / 1024 / 1024:.1f} MB)")
+    print(f"   帧: 写入 {result['frames']}，收到 {result['received']}，"
+          f"超出帧率 {result['throttled']}，编码不及丢弃 {result['dropped']}")
+    if until_idle:
+        print(f"   画面无变化未写入 {result['static']} 帧，裁剪后时长 {result['duration']:.1f} 秒")
+    return result
+
+
 async def capture_full_page(
     url: str,
     output_dir: Path,
     viewport: tuple = (1440, 900),
     scroll_step: int = 800,
-    scroll_delay: float = 0.5
+    scroll_delay: float = 0.5,
+    browser=None,
+    har=None
 ) -> list[Path]:
     """
     滚动捕获整个页面（截图方式）
@@ -118,6 +370,8 @@ async def capture_full_page(
         viewport: 视口大小
         scroll_step: 每次滚动像素
         scroll_delay: 每次滚动后等待时间（秒）
+        browser: 已连接的浏览器（可选，默认新建连接）
+        har: har.HarArchive，从 HAR 回放页面或录制 HAR（可选）
 
     Returns:
         截图文件路径列表
@@ -125,13 +379,10 @@ async def capture_full_page(
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    ws_url = await get_edge_ws_url()
-
     screenshots = []
 
-    async with async_playwright() as p:
-        browser = await p.chromium.connect_over_cdp(ws_url)
-        context = await browser.new_context(viewport={"width": viewport[0], "height": viewport[1]})
+    async with connect_edge(browser) as browser:
+        context = await new_context(browser, viewport, har)
         page = await context.new_page()
 
         print(f"正在加载页面: {url}")
@@ -160,36 +411,335 @@ async def capture_full_page(
             part += 1
 
         await context.close()
-        await browser.close()
 
     print(f"共捕获 {len(screenshots)} 张截图")
     return screenshots
 
 
+async def capture_stitched(
+    url: str,
+    output_dir: Path,
+    viewport: tuple = (1440, 900),
+    scroll_delay: float = 0.3,
+    max_height: int = None,
+    max_frames: int = STITCH_MAX_FRAMES,
+    browser=None,
+    har=None
+) -> list[Path]:
+    """
+    滚动截图并拼接为长图
+
+    截图与拼接交替重叠：浏览器滚动、截取下一屏的同时，上一屏在线程中解码并拼接，
+    两者之间最多缓冲 STITCH_QUEUE_SIZE 帧，内存占用与页面长度无关。
+    重叠检测、吸顶 / 吸底元素去重和分块见 stitching.py。
+
+    Args:
+        url: 目标网页 URL
+        output_dir: 输出目录
+        viewport: 视口大小
+        scroll_delay: 每次滚动后额外等待时间（秒，等待懒加载内容）
+        max_height: 单张长图的最大高度（像素），超出时分块；默认 stitching.MAX_HEIGHT
+        max_frames: 最多截取的屏数
+        browser: 已连接的浏览器（可选，默认新建连接）
+        har: har.HarArchive，从 HAR 回放页面或录制 HAR（可选）
+
+    Returns:
+        长图文件路径列表
+    """
+    try:
+        from stitching import MAX_HEIGHT, PageStitcher
+    except ImportError:
+        print("错误: 拼接长图需要安装 numpy")
+        print("运行: pip install numpy")
+        raise
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    domain = urlparse(url).netloc.replace("www.", "").replace(".", "_")
+    stitcher = PageStitcher(output_dir / f"{domain}_full", max_height=max_height or MAX_HEIGHT)
+
+    async with connect_edge(browser) as browser:
+        context = await new_context(browser, viewport, har)
+        page = await context.new_page()
+
+        print(f"正在加载页面: {url}")
+        await page.goto(url, wait_until="networkidle", timeout=60000)
+        scale = await page.evaluate("() => window.devicePixelRatio")
+
+        queue = asyncio.Queue(maxsize=STITCH_QUEUE_SIZE)
+
+        async def shoot():
+            previous = None
+            try:
+                for _ in range(max_frames):
+                    y = await page.evaluate("() => window.scrollY")
+                    if previous is not None and y <= previous:
+                        # 已到页面底部
+                        break
+                    await page.evaluate(WAIT_FOR_PAINT)
+                    await asyncio.sleep(scroll_delay)
+                    data = await page.screenshot(full_page=False)
+                    expected = None if previous is None else round((y - previous) * scale)
+                    await queue.put((data, expected))
+                    previous = y
+
+                    # 步长随已检测到的固定元素缩小，保证与上一屏有足够的重叠
+                    top, bottom = stitcher.fixed
+                    step = max(1, int((viewport[1] - (top + bottom) / scale) * STITCH_STEP_RATIO))
+                    await page.evaluate(f"() => window.scrollTo(0, {y + step})")
+                else:
+                    print(f"⚠️ 已达到最大屏数 {max_frames}，页面可能是无限滚动")
+            finally:
+                await queue.put(None)
+
+        shooter = asyncio.create_task(shoot())
+        try:
+            while (item := await queue.get()) is not None:
+                await asyncio.to_thread(stitcher.add_png, *item)
+                print(f"截图 {stitcher.frames}: 已拼接 {stitcher.height}px")
+            await shooter
+        finally:
+            shooter.cancel()
+            paths = stitcher.close()
+            await context.close()
+
+    top, bottom = stitcher.fixed
+    print(f"共 {stitcher.frames} 屏，长图高度 {stitcher.height}px")
+    if top or bottom:
+        print(f"   固定元素: 顶部 {top}px，底部 {bottom}px（只保留一份）")
+    if stitcher.duplicates:
+        print(f"   重复帧: {stitcher.duplicates}")
+    if stitcher.fallbacks:
+        print(f"   {stitcher.fallbacks} 屏无法匹配重叠（留白或重复图案），按滚动距离拼接")
+    if stitcher.gaps:
+        print(f"   ⚠️ {stitcher.gaps} 处内容被吸顶元素遮挡，长图中有缺口")
+    return paths
+
+
+def parse_viewports(spec: str) -> dict:
+    """
+    解析视口列表
+
+    Args:
+        spec: 逗号分隔的预设名（见 VIEWPORTS）或 宽x高，如 "desktop,mobile,1920x1080"
+
+    Returns:
+        {名称: (宽, 高)}
+
+    Raises:
+        ValueError: 无法识别的视口
+    """
+    viewports = {}
+    for name in (part.strip() for part in spec.split(",")):
+        if not name:
+            continue
+        if name in VIEWPORTS:
+            viewports[name] = VIEWPORTS[name]
+        elif re.fullmatch(r"\d+x\d+", name):
+            viewports[name] = tuple(map(int, name.split("x")))
+        else:
+            raise ValueError(f"无法识别的视口: {name}（可用 {', '.join(VIEWPORTS)} 或 宽x高）")
+    return viewports
+
+
+def page_slug(url: str) -> str:
+    """URL 对应的输出目录名（域名加路径，同一站点的不同页面不会重名）"""
+    parsed = urlparse(url)
+    slug = parsed.netloc.replace("www.", "") + parsed.path.rstrip("/")
+    return re.sub(r"[^\w.-]+", "_", slug).strip("_")
+
+
+async def record_batch(
+    urls: list,
+    output_dir: Path,
+    viewports: dict,
+    mode: str = "animation",
+    concurrency: int = BATCH_CONCURRENCY,
+    **options
+) -> list:
+    """
+    批量录制：多个 URL × 多个视口
+
+    所有任务共用一个 Edge CDP 连接，各自在独立的 context 中并行进行，最多同时 concurrency 个；
+    任务数不超过并发数时，总耗时约等于最长的一个任务。输出到 {output_dir}/{页面}/{视口}/。
+
+    Args:
+        urls: 目标网页 URL 列表
+        output_dir: 输出目录
+        viewports: {名称: (宽, 高)}，见 parse_viewports
+        mode: "animation" | "screencast" | "scroll" | "stitch"
+        concurrency: 最多同时进行的任务数
+        **options: 透传给对应的录制函数（duration、wait_time、fmt 等）；
+                   har 为 har.HarArchive 时其路径视为目录，每个任务使用 {页面}_{视口}.har
+
+    Returns:
+        [{"url", "viewport", "result", "error", "elapsed"}, ...]，顺序与任务顺序一致
+    """
+    record = {
+        "animation": record_animation,
+        "screencast": record_screencast,
+        "scroll": capture_full_page,
+        "stitch": capture_stitched,
+    }[mode]
+    if mode == "screencast":
+        options["isolated"] = True
+    har = options.pop("har", None)
+
+    output_dir = Path(output_dir)
+    semaphore = asyncio.Semaphore(concurrency)
+    print(f"🎬 批量录制: {len(urls)} 个页面 × {len(viewports)} 个视口，并发 {concurrency}")
+
+    async def run(browser, url: str, name: str, viewport: tuple) -> dict:
+        async with semaphore:
+            start = time.perf_counter()
+            result, error = None, None
+            try:
+                job_har = har.child(f"{page_slug(url)}_{name}.har") if har is not None else None
+                result = await record(url, output_dir / page_slug(url) / name, viewport=viewport,
+                                      browser=browser, har=job_har, **options)
+            except Exception as e:
+                error = str(e)
+                print(f"❌ {url} [{name}]: {e}")
+            return {"url": url, "viewport": name, "result": result, "error": error,
+                    "elapsed": time.perf_counter() - start}
+
+    start = time.perf_counter()
+    async with connect_edge() as browser:
+        jobs = await asyncio.gather(*(
+            run(browser, url, name, viewport)
+            for url in urls
+            for name, viewport in viewports.items()
+        ))
+    elapsed = time.perf_counter() - start
+
+    failed = sum(job["error"] is not None for job in jobs)
+    print(f"\n📊 共 {len(jobs)} 个任务，成功 {len(jobs) - failed}，失败 {failed}")
+    print(f"   总耗时 {elapsed:.1f}s（各任务耗时合计 {sum(job['elapsed'] for job in jobs):.1f}s）")
+    return jobs
+
+
 async def main():
+    from har import HAR_MODES, HarArchive
+
     parser = argparse.ArgumentParser(description="网页屏幕录制工具")
-    parser.add_argument("url", help="目标网页 URL")
+    parser.add_argument("url", nargs="*", help="目标网页 URL（可多个）")
+    parser.add_argument("--urls", help="URL 列表文件（每行一个，# 开头为注释；也支持 JSON / JSONL）")
+    parser.add_argument("--viewports", help=f"批量录制的视口，逗号分隔: {','.join(VIEWPORTS)} 或 宽x高")
+    parser.add_argument("--concurrency", "-c", type=int, default=BATCH_CONCURRENCY,
+                        help=f"批量录制时最多同时进行的任务数（默认 {BATCH_CONCURRENCY}）")
     parser.add_argument("--output", "-o", default="./recordings", help="输出目录")
     parser.add_argument("--duration", "-d", type=int, default=10, help="录制时长（秒）")
     parser.add_argument("--viewport", "-v", default="1440x900", help="视口大小，如 1440x900")
     parser.add_argument("--scroll", "-s", action="store_true", help="滚动截图模式（而非视频录制）")
+    parser.add_argument("--stitch", action="store_true", help="滚动截图并拼接为长图")
+    parser.add_argument("--max-height", type=int, help="长图单张最大高度（像素），超出时分块")
     parser.add_argument("--wait", "-w", type=int, default=2, help="页面加载后等待时间（秒）")
+    parser.add_argument("--screencast", action="store_true", help="使用 CDP 屏幕推流录制（可控帧率、尺寸、质量）")
+    parser.add_argument("--format", "-f", choices=["webm", "webp", "gif", "frames"], default="webp",
+                        help="推流录制的输出格式（默认 webp；webm 需要 ffmpeg，frames 为帧 ZIP）")
+    parser.add_argument("--fps", type=int, help="推流录制的目标帧率（默认 15）")
+    parser.add_argument("--max-size", type=int, help="推流录制的帧最大宽 / 高（像素）")
+    parser.add_argument("--quality", "-q", type=int, help="推流录制的 JPEG / WebP 质量（0-100，默认 80）")
+    parser.add_argument("--until-idle", action="store_true",
+                        help="画面静止后提前结束录制并裁掉首尾静止片段（--duration 为最长时长）")
+    parser.add_argument("--idle-window", type=float, help="画面静止多久后结束（秒，默认 2）")
+    parser.add_argument("--har", help="HAR 文件（.har / .zip）：不存在时录制，存在时离线回放；批量模式下为目录")
+    parser.add_argument("--har-mode", choices=HAR_MODES, default="auto",
+                        help="auto: 按 HAR 是否存在自动选择（默认）；record: 重新录制；replay: 只回放")
+    parser.add_argument("--har-fallback", action="store_true", help="回放时 HAR 中没有的请求改为访问网络（默认中止）")
 
     args = parser.parse_args()
 
+    urls = list(args.url)
+    if args.urls:
+        from batch_input import read_items
+        urls += [item["url"] for item in read_items(args.urls)]
+    if not urls:
+        parser.error("请提供 URL 或 --urls 列表文件")
+
     # 解析 viewport
     width, height = map(int, args.viewport.split("x"))
 
-    if args.scroll:
+    har = None
+    if args.har:
+        try:
+            har = HarArchive(args.har, args.har_mode, fallback=args.har_fallback)
+        except FileNotFoundError as e:
+            parser.error(str(e))
+
+    if len(urls) > 1 or args.viewports:
+        # 批量模式：多个 URL × 视口矩阵
+        try:
+            viewports = parse_viewports(args.viewports) if args.viewports else {args.viewport: (width, height)}
+        except ValueError as e:
+            parser.error(str(e))
+
+        if args.stitch:
+            mode, options = "stitch", {"max_height": args.max_height}
+        elif args.scroll:
+            mode, options = "scroll", {}
+        elif args.screencast:
+            mode, options = "screencast", {
+                "duration": args.duration, "wait_time": args.wait, "fmt": args.format,
+                "fps": args.fps, "max_size": args.max_size, "quality": args.quality,
+                "until_idle": args.until_idle, "idle_window": args.idle_window,
+            }
+        else:
+            mode, options = "animation", {
+                "duration": args.duration, "wait_time": args.wait,
+                "until_idle": args.until_idle, "idle_window": args.idle_window,
+            }
+
+        if har is not None:
+            # 批量模式下 --har 为目录，每个任务各用一个 HAR 文件
+            options["har"] = har
+        jobs = await record_batch(urls, Path(args.output), viewports, mode=mode,
+                                  concurrency=args.concurrency, **options)
+        if any(job["error"] for job in jobs):
+            raise SystemExit(1)
+        return
+
+    args.url = urls[0]
+    if args.stitch:
+        # 长图拼接模式
+        images = await capture_stitched(
+            args.url,
+            Path(args.output),
+            viewport=(width, height),
+            max_height=args.max_height,
+            har=har
+        )
+        print(f"\n长图已保存到: {args.output}")
+        for image in images:
+            print(f"  - {image.name}")
+    elif args.scroll:
         # 滚动截图模式
         screenshots = await capture_full_page(
             args.url,
             Path(args.output),
-            viewport=(width, height)
+            viewport=(width, height),
+            har=har
         )
         print(f"\n截图已保存到: {args.output}")
         for s in screenshots:
             print(f"  - {s.name}")
+    elif args.screencast:
+        # 推流录制模式
+        await record_screencast(
+            args.url,
+            Path(args.output),
+            duration=args.duration,
+            viewport=(width, height),
+            wait_time=args.wait,
+            fmt=args.format,
+            fps=args.fps,
+            max_size=args.max_size,
+            quality=args.quality,
+            until_idle=args.until_idle,
+            idle_window=args.idle_window,
+            har=har
+        )
     else:
         # 视频录制模式
         video_path = await record_animation(
@@ -197,7 +747,10 @@ async def main():
             Path(args.output),
             duration=args.duration,
             viewport=(width, height),
-            wait_time=args.wait
+            wait_time=args.wait,
+            until_idle=args.until_idle,
+            idle_window=args.idle_window,
+            har=har
         )
         print(f"\n视频已保存: {video_path}")
 
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+共用的 HTTP 重试策略
+
+- 错误分类：网络错误和 5xx 可重试；429/503 为限流，优先按 Retry-After 等待；
+  404 等其他 4xx 不重试（如探测原图扩展名时的 404 应立即返回）
+- 指数退避 + 全抖动（full jitter），避免多个请求同时重试
+- 按站点的熔断器：同一站点连续失败达到阈值后暂停该站点一段时间，
+  期间该站点的请求（以及批量流水线中该站点的队列）等待，其他站点不受影响；
+  暂停结束后放行一个探测请求，成功则恢复，失败则加倍暂停时间
+
+eagle_utils 的下载函数和 PixivClient 的接口请求都通过 with_retry() 发出。
+"""
+import time
+import random
+import asyncio
+import threading
+import requests
+
+from rate_limit import host_key, parse_retry_after
+
+# 错误分类
+TRANSIENT = "transient"
+THROTTLED = "throttled"
+FATAL = "fatal"
+
+# 视为限流、应按 Retry-After 等待的状态码
+THROTTLE_STATUSES = (429, 503)
+
+# 可重试的服务端错误
+RETRY_STATUSES = (500, 502, 504, 520, 522, 524)
+
+# 熔断器：连续失败次数阈值、初始暂停时间、最长暂停时间（秒）
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30.0
+BREAKER_MAX_COOLDOWN = 300.0
+
+
+def classify(error: Exception) -> str:
+    """将异常分类为 TRANSIENT / THROTTLED / FATAL"""
+    if isinstance(error, requests.HTTPError):
+        status = getattr(error.response, "status_code", None)
+        if status in THROTTLE_STATUSES:
+            return THROTTLED
+        if status in RETRY_STATUSES:
+            return TRANSIENT
+        return FATAL
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)):
+        return TRANSIENT
+    return FATAL
+
+
+class RetryPolicy:
+    """
+    重试次数与退避时间
+
+    Args:
+        max_attempts: 最多尝试次数（含第一次）
+        base: 退避基数（秒），第 n 次重试的等待上限为 base * 2^n
+        cap: 单次等待上限（秒）
+        max_retry_after: Retry-After 超过该值时不再等待，直接失败
+    """
+
+    def __init__(self, max_attempts: int = 4, base: float = 1.0, cap: float = 60.0, max_retry_after: float = 600.0):
+        self.max_attempts = max_attempts
+        self.base = base
+        self.cap = cap
+        self.max_retry_after = max_retry_after
+
+    def backoff(self, attempt: int, retry_after: float = None) -> float:
+        """第 attempt 次失败（从 0 开始）后的等待秒数"""
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.cap, self.base * 2 ** attempt))
+
+
+DEFAULT_POLICY = RetryPolicy()
+
+
+class CircuitBreakers:
+    """
+    按站点的熔断器
+
+    线程安全；同步调用方用 wait()，流水线中的协程用 wait_async()。
+    """
+
+    def __init__(
+        self,
+        threshold: int = BREAKER_THRESHOLD,
+        cooldown: float = BREAKER_COOLDOWN,
+        max_cooldown: float = BREAKER_MAX_COOLDOWN
+    ):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _state(self, host: str) -> dict:
+        if host not in self._hosts:
+            self._hosts[host] = {"failures": 0, "open_until": 0.0, "cooldown": self.cooldown,
+                                 "probing": False, "trips": 0}
+        return self._hosts[host]
+
+    def wait_time(self, host: str) -> float:
+        """距离该站点可以发出请求还需等待的秒数；熔断结束后第一个调用者获得探测名额"""
+        with self._lock:
+            state = self._state(host)
+            if state["failures"] < self.threshold:
+                return 0.0
+            now = time.monotonic()
+            if now < state["open_until"]:
+                return state["open_until"] - now
+            if state["probing"]:
+                # 探测请求进行中，其他请求稍后再看
+                return 1.0
+            state["probing"] = True
+            return 0.0
+
+    def wait(self, host: str):
+        while True:
+            delay = self.wait_time(host)
+            if delay <= 0:
+                return
+            time.sleep(min(delay, 1.0))
+
+    async def wait_async(self, host: str):
+        while True:
+            delay = self.wait_time(host)
+            if delay <= 0:
+                return
+            await asyncio.sleep(min(delay, 1.0))
+
+    def record_success(self, host: str):
+        with self._lock:
+            state = self._state(host)
+            if state["failures"] >= self.threshold:
+                print(f"   ✅ {host} 已恢复")
+            state.update(failures=0, open_until=0.0, cooldown=self.cooldown, probing=False)
+
+    def release(self, host: str):
+        """释放探测名额，不改变失败计数（请求没有得到 HTTP 响应、也不算站点故障时）"""
+        with self._lock:
+            self._state(host)["probing"] = False
+
+    def record_failure(self, host: str, pause: float = None):
+        """
+        记录一次可重试的失败
+
+        Args:
+            pause: 服务端要求的等待时间（Retry-After），熔断时取其与冷却时间的较大值
+        """
+        with self._lock:
+            state = self._state(host)
+            state["failures"] += 1
+            if state["failures"] < self.threshold:
+                return
+            if state["probing"]:
+                # 探测失败：加倍暂停时间
+                state["cooldown"] = min(self.max_cooldown, state["cooldown"] * 2)
+            elif state["open_until"] > time.monotonic():
+                return
+            cooldown = max(state["cooldown"], pause or 0.0)
+            state.update(open_until=time.monotonic() + cooldown, probing=False)
+            state["trips"] += 1
+        print(f"   ⛔ {host} 连续失败 {state['failures']} 次，暂停 {cooldown:.0f} 秒")
+
+    def summary(self) -> dict:
+        """熔断次数不为 0 的站点"""
+        with self._lock:
+            return {host: state["trips"] for host, state in self._hosts.items() if state["trips"]}
+
+
+# 进程内共用的熔断器
+BREAKERS = CircuitBreakers()
+
+
+def with_retry(url: str, attempt, policy: RetryPolicy = None, breakers: CircuitBreakers = None):
+    """
+    按重试策略执行一次 HTTP 调用
+
+    Args:
+        url: 请求地址（用于确定站点）
+        attempt: 无参函数，执行一次请求；失败时抛出 requests 异常（HTTP 错误需 raise_for_status）
+        policy: 重试策略，默认 DEFAULT_POLICY
+        breakers: 熔断器，默认 BREAKERS
+
+    Returns:
+        attempt() 的返回值
+    """
+    policy = policy or DEFAULT_POLICY
+    breakers = breakers or BREAKERS
+    host = host_key(url)
+
+    for n in range(policy.max_attempts):
+        breakers.wait(host)
+        try:
+            result = attempt()
+        except Exception as e:
+            kind = classify(e)
+            if kind == FATAL:
+                if isinstance(e, requests.HTTPError) and e.response is not None:
+                    # 站点有正常响应（如 404），不计入熔断，同时释放探测名额
+                    breakers.record_success(host)
+                else:
+                    # 非 HTTP 错误（如响应解析失败）不能说明站点已恢复
+                    breakers.release(host)
+                raise
+
+            retry_after = None
+            if kind == THROTTLED:
+                retry_after = parse_retry_after(e.response.headers.get("Retry-After"))
+                if retry_after is not None and retry_after > policy.max_retry_after:
+                    raise
+            breakers.record_failure(host, retry_after)
+
+            if n == policy.max_attempts - 1:
+                raise
+            time.sleep(policy.backoff(n, retry_after))
+        else:
+            breakers.record_success(host)
+            return result
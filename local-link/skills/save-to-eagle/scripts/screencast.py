@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+CDP 屏幕录制（Page.startScreencast）
+
+浏览器每次重绘时推送一帧 JPEG，经有界队列交给编码线程:
+    - 超过目标帧率的帧直接丢弃（throttled）
+    - 编码跟不上、队列已满时丢弃新帧（dropped），不阻塞浏览器
+    - 帧尺寸和 JPEG 质量由浏览器端缩放 / 压缩，传输和编码的数据量都更小
+
+输出格式:
+    webm    经 ffmpeg（VP9）按恒定帧率编码，边录边写；未安装 ffmpeg 时改为 webp
+    webp    动画 WebP
+    gif     动画 GIF
+    frames  帧 ZIP（每帧一张 JPG 加 frames.json，与 Pixiv ugoira 的帧 ZIP 格式相同）
+
+webp / gif 先把 JPEG 帧原样写入帧 ZIP，录制结束后由 ugoira.assemble_ugoira 逐帧合成，
+帧延迟取自浏览器给出的帧时间戳（画面静止时不推送帧，相应延长上一帧）。
+
+设置 idle_window 时用 motion.MotionDetector 逐帧检测画面变化：画面没变的帧不写入
+（上一帧的时长相应延长），第一次变化前只保留最后一帧，结尾裁到最后一次变化之后，
+wait_idle() 在画面静止 idle_window 秒后返回。
+"""
+import json
+import time
+import base64
+import shutil
+import asyncio
+import zipfile
+import subprocess
+from pathlib import Path
+
+# 支持的输出格式
+SCREENCAST_FORMATS = ("webm", "webp", "gif", "frames")
+
+# 默认目标帧率
+DEFAULT_FPS = 15
+
+# 默认 JPEG / WebP 质量
+DEFAULT_QUALITY = 80
+
+# 浏览器与编码线程之间最多缓冲的帧数
+QUEUE_SIZE = 8
+
+# 检查画面是否静止的间隔（秒）
+IDLE_POLL = 0.1
+
+# 按帧率节流时允许的提前量（相对于帧间隔），浏览器的重绘时刻有抖动
+THROTTLE_TOLERANCE = 0.1
+
+
+class FrameArchive:
+    """
+    把 JPEG 帧写入帧 ZIP（不压缩，JPEG 本身已压缩）
+
+    关闭时写入 frames.json，返回 ugoira 格式的帧列表 [{"file", "delay"}, ...]。
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.frames = []
+        self._timestamps = []
+        self._zip = zipfile.ZipFile(self.path, "w", zipfile.ZIP_STORED)
+
+    def add(self, data: bytes, timestamp: float):
+        name = f"{len(self.frames):06d}.jpg"
+        self._zip.writestr(name, data)
+        self.frames.append({"file": name, "delay": 0})
+        self._timestamps.append(timestamp)
+
+    def close(self, end: float) -> list:
+        # 帧延迟 = 到下一帧（最后一帧到录制结束）的时间
+        for index, frame in enumerate(self.frames):
+            following = self._timestamps[index + 1] if index + 1 < len(self.frames) else end
+            frame["delay"] = max(1, round((following - self._timestamps[index]) * 1000))
+        self._zip.writestr("frames.json", json.dumps(self.frames))
+        self._zip.close()
+        return self.frames
+
+    def abort(self) -> str:
+        """编码出错时丢弃已写入的帧"""
+        self._zip.close()
+        self.path.unlink(missing_ok=True)
+        return ""
+
+
+class FFmpegEncoder:
+    """
+    经 ffmpeg 编码 WebM（VP9），按恒定帧率重复上一帧填补画面静止的时段
+
+    Args:
+        path: 输出路径
+        fps: 输出帧率
+        quality: 0-100，映射为 VP9 的 CRF
+    """
+
+    def __init__(self, path: Path, fps: int, quality: int):
+        self.path = Path(path)
+        self.fps = fps
+        self.written = 0
+        self._start = None
+        self._last = None
+        crf = max(4, min(63, round(63 - quality * 0.5)))
+        self._process = subprocess.Popen(
+            [
+                shutil.which("ffmpeg"), "-loglevel", "error", "-y",
+                "-f", "image2pipe", "-framerate", str(fps), "-c:v", "mjpeg", "-i", "-",
+                # VP9 要求宽高为偶数
+                "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+                "-c:v", "libvpx-vp9", "-b:v", "0", "-crf", str(crf),
+                "-deadline", "realtime", "-cpu-used", "8", "-pix_fmt", "yuv420p",
+                str(self.path),
+            ],
+            stdin=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+
+    def _fill(self, until: int):
+        while self.written < until:
+            self._process.stdin.write(self._last)
+            self.written += 1
+
+    def add(self, data: bytes, timestamp: float):
+        if self._start is None:
+            self._start = timestamp
+        else:
+            self._fill(int((timestamp - self._start) * self.fps))
+        self._last = data
+
+    def close(self, end: float):
+        if self._last is None:
+            # 没有录到帧
+            self._process.kill()
+            self._process.wait()
+            self.path.unlink(missing_ok=True)
+            return
+        self._fill(max(self.written + 1, round((end - self._start) * self.fps)))
+        self._process.stdin.close()
+        error = self._process.stderr.read().decode(errors="replace").strip()
+        if self._process.wait() != 0:
+            raise RuntimeError(f"ffmpeg 编码失败: {error}")
+
+    def abort(self) -> str:
+        """编码出错时结束 ffmpeg、删除输出，返回 ffmpeg 的错误输出"""
+        self._process.kill()
+        self._process.wait()
+        error = self._process.stderr.read().decode(errors="replace").strip()
+        self.path.unlink(missing_ok=True)
+        return error
+
+
+class ScreencastRecorder:
+    """
+    录制页面（CDP Page.startScreencast）
+
+    用法:
+        recorder = ScreencastRecorder(page, Path("out/example_10s"), fmt="webp")
+        await recorder.start()
+        await asyncio.sleep(10)
+        result = await recorder.stop()
+
+    Args:
+        page: Playwright 页面（Chromium 内核）
+        base: 输出路径（不含扩展名）
+        fmt: 输出格式，见 SCREENCAST_FORMATS
+        fps: 目标帧率
+        max_size: 帧的最大宽 / 高（像素，浏览器端缩放），None 为视口大小
+        quality: JPEG / WebP 质量（0-100）
+        queue_size: 等待编码的最大帧数
+        idle_window: 空闲窗口（秒），设置后检测画面静止并裁掉首尾静止片段
+        idle_grace: 画面从未变化时额外等待的时长（秒）
+    """
+
+    def __init__(
+        self,
+        page,
+        base: Path,
+        fmt: str = "webp",
+        fps: int = DEFAULT_FPS,
+        max_size: int = None,
+        quality: int = DEFAULT_QUALITY,
+        queue_size: int = QUEUE_SIZE,
+        idle_window: float = None,
+        idle_grace: float = 0.0
+    ):
+        if fmt not in SCREENCAST_FORMATS:
+            raise ValueError(f"不支持的录制格式: {fmt}")
+        if fmt == "webm" and not shutil.which("ffmpeg"):
+            print("⚠️ 未找到 ffmpeg，改为输出动画 WebP")
+            fmt = "webp"
+
+        self.page = page
+        self.base = Path(base)
+        self.fmt = fmt
+        self.fps = fps
+        self.max_size = max_size
+        self.quality = quality
+        self.received = 0
+        self.throttled = 0
+        self.dropped = 0
+        self.encoded = 0
+        self.static = 0
+        self.started = None
+        self.idle_window = idle_window
+        self.idle_grace = idle_grace
+        self.detector = None
+        self._pending = None
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._next_due = None
+        self._session = None
+        self._encoder = None
+        self._sink = None
+
+    def _on_frame(self, params: dict):
+        # 先确认，浏览器收到确认后才会推送下一帧
+        asyncio.ensure_future(self._session.send("Page.screencastFrameAck", {"sessionId": params["sessionId"]}))
+        self.received += 1
+
+        timestamp = params.get("metadata", {}).get("timestamp") or time.time()
+        if self._next_due is not None and timestamp < self._next_due:
+            self.throttled += 1
+            return
+        if self._queue.full():
+            self.dropped += 1
+            return
+        self._next_due = timestamp + (1 - THROTTLE_TOLERANCE) / self.fps
+        self._queue.put_nowait((params["data"], timestamp))
+
+    def _write(self, data: bytes, timestamp: float):
+        self._sink.add(data, timestamp)
+        self.encoded += 1
+
+    def _process(self, data: bytes, timestamp: float):
+        """编码线程中处理一帧"""
+        if self.detector is None:
+            self._write(data, timestamp)
+            return
+
+        moving = self.detector.update(data, timestamp)
+        if self.detector.first_motion is None:
+            # 画面还没动过：只保留最新一帧，第一次变化时再写出
+            if self._pending is not None:
+                self.static += 1
+            self._pending = (data, timestamp)
+            return
+        if not moving:
+            self.static += 1
+            return
+        if self._pending is not None:
+            # 静止画面从第一次变化前 padding 秒开始显示
+            pending, _ = self._pending
+            self._pending = None
+            self._write(pending, max(self.started, timestamp - self.detector.padding))
+        self._write(data, timestamp)
+
+    async def _encode(self):
+        while (item := await self._queue.get()) is not None:
+            data, timestamp = item
+            await asyncio.to_thread(self._process, base64.b64decode(data), timestamp)
+
+    async def wait_idle(self, timeout: float) -> bool:
+        """
+        等待画面静止 idle_window 秒，最多等待 timeout 秒
+
+        Returns:
+            是否因画面静止而提前返回
+        """
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.detector.idle(time.time()):
+                return True
+            await asyncio.sleep(IDLE_POLL)
+        return False
+
+    async def start(self):
+        """开始录制"""
+        self.base.parent.mkdir(parents=True, exist_ok=True)
+        if self.fmt == "webm":
+            self._sink = FFmpegEncoder(self.base.with_name(f"{self.base.name}.webm"), self.fps, self.quality)
+        else:
+            self._sink = FrameArchive(self.base.with_name(f"{self.base.name}_frames.zip"))
+
+        self._session = await self.page.context.new_cdp_session(self.page)
+        self._session.on("Page.screencastFrame", self._on_frame)
+        self._encoder = asyncio.create_task(self._encode())
+
+        options = {"format": "jpeg", "quality": self.quality, "everyNthFrame": 1}
+        if self.max_size:
+            options.update(maxWidth=self.max_size, maxHeight=self.max_size)
+        self.started = time.time()
+        if self.idle_window:
+            from motion import MotionDetector
+            self.detector = MotionDetector(self.idle_window, start=self.started, grace=self.idle_grace)
+        await self._session.send("Page.startScreencast", options)
+
+    async def stop(self) -> dict:
+        """
+        停止录制并完成编码
+
+        Returns:
+            {"path", "format", "frames", "received", "throttled", "dropped", "static", "duration"}
+            frames 为写入的帧数，static 为画面没有变化而未写入的帧数，duration 为录制时长（秒）
+        """
+        end = time.time()
+        await self._session.send("Page.stopScreencast")
+        if not self._encoder.done():
+            # 编码协程出错退出后不再取帧，队列已满时 put 会永远等待
+            closing = asyncio.ensure_future(self._queue.put(None))
+            await asyncio.wait({closing, self._encoder}, return_when=asyncio.FIRST_COMPLETED)
+            closing.cancel()
+        try:
+            await self._encoder
+        except Exception as e:
+            await self._session.detach()
+            error = await asyncio.to_thread(self._sink.abort)
+            raise RuntimeError(f"编码失败: {error or e}") from e
+        await self._session.detach()
+
+        start = self.started
+        if self.detector is not None:
+            if self._pending is not None:
+                # 画面始终没有变化，只输出一帧
+                pending, start = self._pending
+                self._pending = None
+                await asyncio.to_thread(self._write, pending, start)
+                end = min(end, start + self.detector.padding)
+            else:
+                start, end = self.detector.trim_range(self.started, end)
+
+        if self.fmt == "webm":
+            await asyncio.to_thread(self._sink.close, end)
+            path = self._sink.path
+        else:
+            frames = await asyncio.to_thread(self._sink.close, end)
+            path = self._sink.path
+            if not frames:
+                path.unlink()
+            elif self.fmt != "frames":
+                from ugoira import assemble_ugoira
+                path = self.base.with_name(f"{self.base.name}.{self.fmt}")
+                await asyncio.to_thread(
+                    assemble_ugoira, self._sink.path, frames, path, fmt=self.fmt, quality=self.quality
+                )
+                self._sink.path.unlink()
+
+        if not self.encoded:
+            raise RuntimeError("没有录到任何帧")
+        return {
+            "path": path,
+            "format": self.fmt,
+            "frames": self.encoded,
+            "received": self.received,
+            "throttled": self.throttled,
+            "dropped": self.dropped,
+            "static": self.static,
+            "duration": end - start,
+        }
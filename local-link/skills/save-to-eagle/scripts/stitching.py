@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+滚动截图拼接
+
+把逐屏滚动得到的截图拼成一张长图（过高时分块），只保留前一帧的行特征，
+已拼接的部分立即流式写入 PNG，内存占用与页面高度无关。
+
+每帧与前一帧:
+    1. 行特征：每行像素与固定随机权重的点积（相同的行特征相同）
+    2. 固定元素：同一位置上相同的首尾行（吸顶导航、底部悬浮条），不参与匹配，
+       顶部的只保留第一帧中的那一份，底部的只在最后写入一次
+    3. 真实滚动距离：所有候选位移的行匹配数一次算出（相等矩阵按对角线求和），
+       取匹配率最高、且最接近实际 scrollY 变化的位移；无法确定时按 scrollY 拼接
+    4. 按位移复核固定元素：首尾段边缘上与内容一起滚动了的行（与固定元素相邻的留白）归还给内容，
+       固定元素自身的纯色内边距不随内容滚动，仍算在固定元素内
+
+用法:
+    stitcher = PageStitcher(Path("out/example_full"))
+    stitcher.add_png(png_bytes, expected_shift=0)
+    stitcher.add_png(png_bytes, expected_shift=720)
+    ...
+    paths = stitcher.close()
+"""
+import io
+import zlib
+import struct
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+# 单个 PNG 的最大高度（像素），超出时分块写出；多数看图软件和浏览器对单边尺寸有 3 万像素左右的限制
+MAX_HEIGHT = 30000
+
+# 判定位移所需的最少有效重叠行数（与上一行相同的行不计）
+MIN_OVERLAP_ROWS = 16
+
+# 有效重叠行的最低匹配率
+MATCH_THRESHOLD = 0.9
+
+# 固定元素最多占帧高的比例；更长的首尾相同段视为重复图案的巧合（如条纹背景恰好滚过整数个周期）
+MAX_FIXED_FRACTION = 0.3
+
+# PNG 压缩级别（截图以大面积纯色为主，较低级别已足够）
+PNG_COMPRESS_LEVEL = 3
+
+
+class FrameRows:
+    """一帧截图的行特征"""
+
+    def __init__(self, frame: np.ndarray, weights: np.ndarray):
+        rows = frame.reshape(frame.shape[0], -1)
+        self.height = frame.shape[0]
+        self.signature = rows @ weights
+        # 与上一行相同的行（留白、只有侧栏背景的行等）无法区分位置，不计入匹配率
+        self.informative = np.ones(self.height, dtype=bool)
+        self.informative[1:] = self.signature[1:] != self.signature[:-1]
+
+
+def detect_fixed_rows(prev: FrameRows, cur: FrameRows, previous: tuple = (0, 0)) -> tuple:
+    """
+    检测同一位置上两帧相同的首尾行（吸顶 / 吸底元素）
+
+    超过 MAX_FIXED_FRACTION 的首尾段是固定元素与重复图案连在了一起，沿用上一对帧的结果。
+    首尾段中可能含有滚动前后恰好相同的内容行（相邻的留白），求出位移后由 trim_scrolled_rows 去掉。
+
+    Args:
+        prev: 上一帧
+        cur: 当前帧
+        previous: 上一对帧检测到的 (顶部行数, 底部行数)
+
+    Returns:
+        (顶部行数, 底部行数)
+    """
+    same = prev.signature == cur.signature
+    if same.all():
+        return previous
+
+    height = cur.height
+    top = int(np.argmin(same))
+    bottom = int(np.argmin(same[::-1]))
+
+    limit = height * MAX_FIXED_FRACTION
+    if top > limit:
+        top = previous[0]
+    if bottom > limit:
+        bottom = previous[1]
+    return top, bottom
+
+
+def trim_scrolled_rows(prev: FrameRows, cur: FrameRows, top: int, bottom: int, shift: int) -> tuple:
+    """
+    从首尾段靠内容一侧的边缘去掉随内容滚动了 shift 行的行
+
+    固定元素的行不随滚动移动；内容行在本帧第 r 行、上一帧第 r + shift 行。
+    两者都成立（如纯色内边距与相邻留白同色）时该行作为内容写出，结果相同。
+
+    Args:
+        prev: 上一帧
+        cur: 当前帧
+        top: detect_fixed_rows 得到的顶部行数
+        bottom: detect_fixed_rows 得到的底部行数
+        shift: 两帧之间的位移（像素，大于 0）
+
+    Returns:
+        (顶部行数, 底部行数)
+    """
+    height = cur.height
+    content_start, content_end = top, height - bottom
+
+    # 顶部段最下方的行：上一帧中对应的内容行须在固定段之外
+    while top and content_start <= top - 1 + shift < content_end \
+            and cur.signature[top - 1] == prev.signature[top - 1 + shift]:
+        top -= 1
+    # 底部段最上方的行：本帧中对应的内容行须在固定段之外
+    while bottom and content_start <= height - bottom - shift < content_end \
+            and prev.signature[height - bottom] == cur.signature[height - bottom - shift]:
+        bottom -= 1
+    return top, bottom
+
+
+def scrolled_with_content(prev: FrameRows, cur: FrameRows, rows: int, shift: int) -> bool:
+    """顶部 rows 行是否与内容一起滚动了 shift 行（重复图案而非吸顶元素）"""
+    if rows == 0 or rows + shift > prev.height:
+        return False
+    informative = cur.informative[:rows]
+    return bool((prev.signature[shift:shift + rows] == cur.signature[:rows])[informative].all())
+
+
+class ShiftFinder:
+    """
+    求两帧之间的真实滚动距离（像素）
+
+    只比较去掉首尾固定行后的中间区域。所有候选位移的匹配数一次算出：
+    相等矩阵 eq[i, j] = (prev[i] == cur[j])，位移 s 的匹配数即 i - j = s 的对角线之和。
+    """
+
+    def __init__(self):
+        self._offsets = {}
+
+    def _diagonal_index(self, n: int) -> np.ndarray:
+        if n not in self._offsets:
+            index = np.arange(n, dtype=np.int32)
+            self._offsets[n] = (index[:, None] - index[None, :]).ravel()
+        return self._offsets[n]
+
+    def find(self, prev: FrameRows, cur: FrameRows, top: int, bottom: int, expected: int = None):
+        """
+        Returns:
+            位移（像素）；0 表示页面没有滚动；None 表示无法确定
+        """
+        end = cur.height - bottom
+        a = prev.signature[top:end]
+        b = cur.signature[top:end]
+        informative = cur.informative[top:end]
+        n = len(a)
+        if n <= MIN_OVERLAP_ROWS:
+            return None
+
+        if np.array_equal(a, b):
+            # scrollY 变了而画面没变：整屏都是重复图案，无法判断
+            return None if expected else 0
+
+        eq = (a[:, None] == b[None, :]) & informative[None, :]
+        offsets = self._diagonal_index(n)
+        positive = offsets > 0
+        matches = np.bincount(offsets[positive], weights=eq.ravel()[positive], minlength=n)
+
+        # 位移 s 的有效行数：cur 中前 n - s 行里的非重复行
+        cumulative = np.concatenate(([0], np.cumsum(informative)))
+        counts = cumulative[n - np.arange(n)]
+        valid = counts >= MIN_OVERLAP_ROWS
+        valid[0] = False
+        if not valid.any():
+            return None
+
+        ratio = np.where(valid, matches / np.maximum(counts, 1), 0.0)
+        best = ratio.max()
+        if best < MATCH_THRESHOLD:
+            return None
+
+        # 重复图案（列表项等）会有多个位移同样匹配，取最接近实际滚动距离的一个
+        candidates = np.flatnonzero(ratio >= best - 1e-9)
+        if expected is None:
+            return int(candidates[0])
+        return int(candidates[np.argmin(np.abs(candidates - expected))])
+
+
+class PNGStreamWriter:
+    """
+    逐条写入行的 RGB PNG
+
+    高度在写完之前未知：先写占位的 IHDR，关闭时回填高度和校验值。
+    每行使用 Up 过滤（与上一行逐字节相减），对截图的压缩效果接近 Pillow 的自适应过滤。
+    """
+
+    def __init__(self, path: Path, width: int):
+        self.path = Path(path)
+        self.width = width
+        self.height = 0
+        self._file = open(self.path, "wb")
+        self._compressor = zlib.compressobj(PNG_COMPRESS_LEVEL)
+        self._last_row = np.zeros(width * 3, dtype=np.uint8)
+        self._file.write(b"\x89PNG\r\n\x1a\n")
+        self._write_chunk(b"IHDR", self._header())
+
+    def _header(self) -> bytes:
+        return struct.pack(">IIBBBBB", self.width, self.height, 8, 2, 0, 0, 0)
+
+    def _write_chunk(self, kind: bytes, data: bytes):
+        self._file.write(struct.pack(">I", len(data)) + kind + data
+                         + struct.pack(">I", zlib.crc32(kind + data)))
+
+    def write(self, rows: np.ndarray):
+        """写入若干行（高 x 宽 x 3 的 uint8 数组）"""
+        if not len(rows):
+            return
+        flat = rows.reshape(len(rows), -1)
+        previous = np.vstack([self._last_row[None, :], flat[:-1]])
+        filtered = np.empty((len(rows), flat.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 0] = 2
+        filtered[:, 1:] = flat - previous
+        data = self._compressor.compress(filtered.tobytes())
+        if data:
+            self._write_chunk(b"IDAT", data)
+        self._last_row = flat[-1].copy()
+        self.height += len(rows)
+
+    def close(self) -> Path:
+        self._write_chunk(b"IDAT", self._compressor.flush())
+        self._write_chunk(b"IEND", b"")
+        # 回填 IHDR（文件头 8 字节之后：长度 4 字节 + 类型 4 字节 + 数据 13 字节 + CRC 4 字节）
+        self._file.seek(8)
+        self._write_chunk(b"IHDR", self._header())
+        self._file.close()
+        return self.path
+
+
+class PageStitcher:
+    """
+    把逐屏截图拼接为长图
+
+    第一帧写出（底部固定行除外），之后每帧只追加前一帧尚未写出的部分，
+    最后写出一次底部固定行。各帧检测到的固定行数可以不同（悬浮条出现 / 消失），
+    按已写出的行数衔接，不会重复或遗漏。长图超过 max_height 时分块，文件名为 {base}_part000.png；
+    只有一块时为 {base}.png。
+
+    Args:
+        base: 输出路径（不含扩展名）
+        max_height: 单个文件的最大高度（像素）
+    """
+
+    def __init__(self, base: Path, max_height: int = MAX_HEIGHT):
+        self.base = Path(base)
+        self.max_height = max_height
+        self.frames = 0
+        self.duplicates = 0
+        self.fallbacks = 0
+        self.gaps = 0
+        self.fixed = (0, 0)
+        self.paths = []
+        self._tile_heights = []
+        self._finder = ShiftFinder()
+        self._weights = None
+        self._writer = None
+        self._prev = None
+        self._first = None
+        self._last = None
+        # 前一帧中已写出的行数（从顶部算起）
+        self._written = 0
+
+    @property
+    def height(self) -> int:
+        """已写出的总高度（像素）"""
+        return sum(self._tile_heights) + (self._writer.height if self._writer else 0)
+
+    def _open_tile(self, width: int):
+        path = self.base.with_name(f"{self.base.name}_part{len(self.paths):03d}.png")
+        self._writer = PNGStreamWriter(path, width)
+
+    def _write(self, rows: np.ndarray):
+        while len(rows):
+            if self._writer is None:
+                self._open_tile(rows.shape[1])
+            room = self.max_height - self._writer.height
+            self._writer.write(rows[:room])
+            rows = rows[room:]
+            if self._writer.height >= self.max_height:
+                self.paths.append(self._writer.close())
+                self._tile_heights.append(self._writer.height)
+                self._writer = None
+
+    def add_png(self, data: bytes, expected_shift: int = None):
+        """加入一帧 PNG 截图"""
+        with Image.open(io.BytesIO(data)) as img:
+            frame = np.asarray(img.convert("RGB"))
+        self.add(frame, expected_shift)
+
+    def add(self, frame: np.ndarray, expected_shift: int = None):
+        """
+        加入一帧
+
+        Args:
+            frame: 高 x 宽 x 3 的 uint8 数组，宽高与第一帧相同
+            expected_shift: 与上一帧之间的 scrollY 变化（像素），用于在重复图案中选择位移，
+                            无法匹配时按此拼接
+        """
+        if self._weights is None:
+            rng = np.random.default_rng(0)
+            self._weights = rng.random(frame.shape[1] * frame.shape[2])
+
+        rows = FrameRows(frame, self._weights)
+        self.frames += 1
+        if self._prev is None:
+            # 底部固定行要等第二帧才能确定，第一帧暂不写出
+            self._prev = rows
+            self._first = frame
+            self._last = frame
+            return
+
+        top, bottom = detect_fixed_rows(self._prev, rows, self.fixed)
+        shift = self._finder.find(self._prev, rows, top, bottom, expected_shift)
+        if shift and scrolled_with_content(self._prev, rows, top, shift):
+            top = 0
+        if shift:
+            top, bottom = trim_scrolled_rows(self._prev, rows, top, bottom, shift)
+        if shift is None:
+            self.fallbacks += 1
+            shift = expected_shift or 0
+        if shift <= 0:
+            self.duplicates += 1
+            return
+
+        end = frame.shape[0] - bottom
+        if self._first is not None:
+            self._write(self._first[:end])
+            self._written = end
+            self._first = None
+
+        # 前一帧已写出的行在本帧中上移了 shift 行；位移超过中间区域时，
+        # 被吸顶元素遮住的部分无法补回
+        start = max(top, self._written - shift)
+        if self._written - shift < top:
+            self.gaps += 1
+        if end > start:
+            self._write(frame[start:end])
+            self._written = end
+        else:
+            self._written -= shift
+        self._prev = rows
+        self._last = frame
+        self.fixed = (top, bottom)
+
+    def close(self) -> list:
+        """写出剩余部分，返回所有文件路径"""
+        if self._first is not None:
+            # 只有一帧
+            self._write(self._first)
+        elif self._last is not None:
+            self._write(self._last[self._written:])
+
+        if self._writer is not None:
+            self.paths.append(self._writer.close())
+            self._tile_heights.append(self._writer.height)
+            self._writer = None
+
+        if len(self.paths) == 1:
+            single = self.base.with_name(f"{self.base.name}.png")
+            self.paths[0].replace(single)
+            self.paths = [single]
+        return self.paths
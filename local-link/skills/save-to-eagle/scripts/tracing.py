@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+归档过程的 span 追踪（Chrome trace-event 格式）
+
+生成的 JSON 可直接在 https://ui.perfetto.dev 或 chrome://tracing 中打开，
+查看每个作品、每张图片、每个阶段的时间线：谁在等信号量、谁在等限速令牌、
+哪张图的缩略图与另一张图的下载重叠。
+
+- 每个作品一条轨道（track），作品内的阶段和图片 span 按时间嵌套；
+  轨道通过 contextvars 传递，asyncio.to_thread 和流水线线程池中的调用会继承所在作品的轨道
+- 单条归档时所有 span 在主线程轨道上
+- 事件边产生边写入文件，内存占用与批量大小无关
+
+未启用时 span() 返回共享的空上下文，开销只有一次全局变量判断。
+
+用法:
+    with tracing.span("download", cat="http", url=url):
+        ...
+"""
+import json
+import time
+import threading
+import contextvars
+from pathlib import Path
+from contextlib import nullcontext
+
+# 当前作品的轨道 ID（None 表示使用线程轨道）
+current_track = contextvars.ContextVar("trace_track", default=None)
+
+_NULL = nullcontext()
+
+
+class Span:
+    """一个 span：退出时写出 "X"（complete）事件"""
+
+    __slots__ = ("tracer", "name", "cat", "args", "track", "start")
+
+    def __init__(self, tracer, name: str, cat: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.track = self.tracer.track()
+        self.start = self.tracer.now()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = f"{exc_type.__name__}: {exc}"
+        self.tracer.complete(self.name, self.start, self.tracer.now() - self.start,
+                             cat=self.cat, track=self.track, args=self.args)
+        return False
+
+
+class Tracer:
+    """
+    Chrome trace-event 写出器
+
+    Args:
+        path: 输出 JSON 文件路径
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fp = open(self.path, "w", encoding='utf-8')
+        self._fp.write("[\n")
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter_ns()
+        self._threads = {}
+        self._next_track = 1
+        self.events = 0
+        self.name_track(0, "main")
+
+    def now(self) -> float:
+        """相对启动时间的微秒数"""
+        return (time.perf_counter_ns() - self._origin) / 1000
+
+    def track(self) -> int:
+        """当前轨道：作品轨道优先，否则为线程轨道"""
+        track = current_track.get()
+        if track is not None:
+            return track
+        ident = threading.get_ident()
+        if ident not in self._threads:
+            with self._lock:
+                if ident not in self._threads:
+                    self._threads[ident] = 0 if threading.current_thread() is threading.main_thread() else self._new_track()
+                    self._write({"ph": "M", "name": "thread_name", "pid": 1, "tid": self._threads[ident],
+                                 "args": {"name": threading.current_thread().name}})
+        return self._threads[ident]
+
+    def _new_track(self) -> int:
+        track = self._next_track
+        self._next_track += 1
+        return track
+
+    def new_track(self, name: str) -> int:
+        """为一个作品分配轨道"""
+        with self._lock:
+            track = self._new_track()
+        self.name_track(track, name)
+        return track
+
+    def name_track(self, track: int, name: str):
+        self._emit({"ph": "M", "name": "thread_name", "pid": 1, "tid": track, "args": {"name": name}})
+
+    def complete(self, name: str, start: float, duration: float, cat: str = "", track: int = None, args: dict = None):
+        """写出一个已结束的 span"""
+        event = {"ph": "X", "name": name, "cat": cat, "pid": 1,
+                 "tid": self.track() if track is None else track,
+                 "ts": round(start, 1), "dur": round(duration, 1)}
+        if args:
+            event["args"] = args
+        self._emit(event)
+
+    def instant(self, name: str, cat: str = "", **args):
+        event = {"ph": "i", "s": "t", "name": name, "cat": cat, "pid": 1, "tid": self.track(), "ts": round(self.now(), 1)}
+        if args:
+            event["args"] = args
+        self._emit(event)
+
+    def _emit(self, event: dict):
+        with self._lock:
+            self._write(event)
+
+    def _write(self, event: dict):
+        if self._fp.closed:
+            return
+        self._fp.write(json.dumps(event, ensure_ascii=False, default=str) + ",\n")
+        self.events += 1
+
+    def close(self):
+        with self._lock:
+            if self._fp.closed:
+                return
+            # 末尾补一个元数据事件，避免 JSON 数组以逗号结尾
+            self._fp.write(json.dumps({"ph": "M", "name": "process_name", "pid": 1,
+                                       "args": {"name": "save-to-eagle"}}) + "\n]\n")
+            self._fp.close()
+
+
+# 当前生效的追踪器；未设置时 span() 为空操作
+_active_tracer = None
+
+
+def start(path) -> Tracer:
+    """开始追踪，写出到 path"""
+    global _active_tracer
+    _active_tracer = Tracer(path)
+    return _active_tracer
+
+
+def stop():
+    """结束追踪并关闭文件"""
+    global _active_tracer
+    tracer, _active_tracer = _active_tracer, None
+    if tracer is not None:
+        tracer.close()
+        print(f"🧭 追踪已写出: {tracer.path}（{tracer.events} 个事件，可在 https://ui.perfetto.dev 打开）")
+
+
+def get_tracer() -> Tracer:
+    return _active_tracer
+
+
+def span(name: str, cat: str = "", **args):
+    """span 上下文：with span("thumbnail", cat="ingest", page=3): ..."""
+    tracer = _active_tracer
+    if tracer is None:
+        return _NULL
+    return Span(tracer, name, cat, args)
+
+
+def now() -> float:
+    """当前时间戳（微秒）；未启用时为 0"""
+    tracer = _active_tracer
+    return tracer.now() if tracer is not None else 0.0
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Pixiv 动图（ugoira）合成
+
+ugoira 以帧 ZIP（每帧一张 JPG/PNG）加帧延迟列表的形式发布。
+这里直接从 ZIP 中逐帧解码并编码为动画 WebP 或 GIF，
+不把帧解压到磁盘，任意时刻内存中只保留一帧的像素数据。
+"""
+import zipfile
+from pathlib import Path
+from PIL import Image, GifImagePlugin
+
+# 支持的输出格式
+UGOIRA_FORMATS = ("webp", "gif")
+
+
+class UgoiraFrames(Image.Image):
+    """
+    把 ZIP 中的帧序列包装成可 seek 的多帧图像
+
+    与 Pillow 读取动画 GIF/WebP 的方式一致：seek(n) 时才解码第 n 帧，
+    并替换掉上一帧的像素数据。编码器按 n_frames 逐帧 seek，
+    因此不会同时持有全部帧。
+    """
+
+    def __init__(self, archive: zipfile.ZipFile, frames: list):
+        super().__init__()
+        self._archive = archive
+        self._frames = frames
+        self._frame = -1
+        self.n_frames = len(frames)
+        self.is_animated = self.n_frames > 1
+        self.info = {"duration": [frame["delay"] for frame in frames], "loop": 0}
+        self.seek(0)
+
+    def seek(self, frame: int):
+        if frame == self._frame:
+            return
+        with self._archive.open(self._frames[frame]["file"]) as fp:
+            with Image.open(fp) as img:
+                img = img.convert("RGB")
+        self.im = img.im
+        self._mode = img.mode
+        self._size = img.size
+        self._frame = frame
+
+    def tell(self) -> int:
+        return self._frame
+
+
+def _save_gif(frames: UgoiraFrames, dest_path: Path):
+    """
+    逐帧写出 GIF
+
+    Pillow 的多帧 GIF 保存会先收集全部帧再统一写出，
+    这里改用 GifImagePlugin 的 getheader/getdata 逐帧写入，每帧使用局部调色板。
+    """
+    durations = frames.info["duration"]
+    with open(dest_path, "wb") as fp:
+        for index in range(frames.n_frames):
+            frames.seek(index)
+            frame = frames.quantize(256)
+            if index == 0:
+                header, _ = GifImagePlugin.getheader(frame, info={"loop": 0})
+                for chunk in header:
+                    fp.write(chunk)
+            for chunk in GifImagePlugin.getdata(
+                frame,
+                duration=durations[index],
+                include_color_table=True
+            ):
+                fp.write(chunk)
+        fp.write(b";")
+
+
+def assemble_ugoira(zip_file, frames: list, dest_path: Path, fmt: str = "webp", quality: int = 85) -> dict:
+    """
+    从帧 ZIP 合成动画图片
+
+    Args:
+        zip_file: ZIP 文件路径或可 seek 的文件对象
+        frames: ugoira 帧列表，[{"file": "000000.jpg", "delay": 80}, ...]
+        dest_path: 输出路径（扩展名应与 fmt 一致）
+        fmt: "webp" 或 "gif"
+        quality: WebP 有损压缩质量
+
+    Returns:
+        {"width", "height", "frames", "duration"}，duration 为总时长（毫秒）
+    """
+    if fmt not in UGOIRA_FORMATS:
+        raise ValueError(f"不支持的动图格式: {fmt}")
+    if not frames:
+        raise ValueError("ugoira 帧列表为空")
+
+    with zipfile.ZipFile(zip_file) as archive:
+        sequence = UgoiraFrames(archive, frames)
+        width, height = sequence.size
+
+        if fmt == "webp":
+            sequence.save(
+                dest_path,
+                "WEBP",
+                save_all=True,
+                duration=sequence.info["duration"],
+                loop=0,
+                quality=quality
+            )
+        else:
+            _save_gif(sequence, dest_path)
+
+    return {
+        "width": width,
+        "height": height,
+        "frames": len(frames),
+        "duration": sum(frame["delay"] for frame in frames),
+    }
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+pixiv_sync.py 的枚举与增量同步测试
+
+本地 HTTP 服务模拟 Pixiv 的 profile/all、收藏（offset 分页）和排行榜（p 分页）接口，
+验证各来源的枚举顺序与分页，以及 high-water mark 让下一次同步在已同步的位置停止、不再请求后续页。
+
+用法:
+    pip install pytest
+    pytest tests/test_pixiv_sync.py
+"""
+import sys
+import json
+import asyncio
+import threading
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+import batch_archive
+import pixiv_sync
+from eagle_utils import DiskTTLCache
+from pixiv import PixivClient
+
+
+class PixivData:
+    """替身服务的数据：用户作品、收藏（新在前）、排行榜各页"""
+
+    def __init__(self):
+        self.illusts = [101, 105, 103]
+        self.manga = []
+        # (作品 ID, 收藏 ID)，按收藏时间从新到旧
+        self.bookmarks = [(1000 + n, 5000 + n) for n in range(100, 0, -1)]
+        self.masked = {1050}
+        self.ranking_date = "20260301"
+        self.ranking_pages = [[201, 202, 203], [204, 205]]
+        self.requests = []
+
+
+class PixivHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, data):
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        data = self.server.data
+        parsed = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+        data.requests.append((parsed.path, query))
+
+        if parsed.path.endswith("/profile/all"):
+            # 没有作品的分类返回 [] 而不是 {}
+            self.send_json({"error": False, "body": {
+                "illusts": {str(i): None for i in data.illusts} or [],
+                "manga": {str(i): None for i in data.manga} or [],
+            }})
+        elif parsed.path.endswith("/illusts/bookmarks"):
+            offset, limit = int(query["offset"]), int(query["limit"])
+            works = [
+                {"id": str(artwork_id), "bookmarkData": {"id": str(mark)},
+                 "isMasked": artwork_id in data.masked}
+                for artwork_id, mark in data.bookmarks[offset:offset + limit]
+            ]
+            self.send_json({"error": False, "body": {"works": works, "total": len(data.bookmarks)}})
+        elif parsed.path == "/ranking.php":
+            page = int(query["p"])
+            self.send_json({
+                "date": data.ranking_date,
+                "contents": [{"illust_id": i} for i in data.ranking_pages[page - 1]],
+                "next": page + 1 if page < len(data.ranking_pages) else False,
+            })
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), PixivHandler)
+    httpd.data = PixivData()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def client(server, tmp_path):
+    return PixivClient(cookies={}, cache=DiskTTLCache(tmp_path / "cache", 0),
+                       origin=f"http://127.0.0.1:{server.server_port}")
+
+
+def paths(server, suffix: str) -> list:
+    return [query for path, query in server.data.requests if path.endswith(suffix)]
+
+
+def test_user_artworks_newest_first(server, client):
+    items = list(pixiv_sync.iter_user_artworks(client, "42"))
+    assert items == [(105, 105), (103, 103), (101, 101)]
+    assert list(pixiv_sync.iter_user_artworks(client, "42", since=103)) == [(105, 105)]
+
+
+def test_bookmarks_paginate_and_skip_masked(server, client):
+    items = list(pixiv_sync.iter_bookmarks(client, "42"))
+    assert len(items) == 99
+    assert 1050 not in [artwork_id for artwork_id, _ in items]
+    assert items[0] == (1100, 5100)
+    assert [int(q["offset"]) for q in paths(server, "/illusts/bookmarks")] == [0, 48, 96]
+
+
+def test_bookmarks_stop_at_high_water(server, client):
+    items = list(pixiv_sync.iter_bookmarks(client, "42", since=5095))
+    assert [artwork_id for artwork_id, _ in items] == [1100, 1099, 1098, 1097, 1096]
+    # 第一页中就遇到已同步的收藏，不再请求后续页
+    assert len(paths(server, "/illusts/bookmarks")) == 1
+
+
+def test_ranking_paginates(server, client):
+    items = list(pixiv_sync.iter_ranking(client, "daily"))
+    assert [artwork_id for artwork_id, _ in items] == [201, 202, 203, 204, 205]
+    assert all(cursor == 20260301 for _, cursor in items)
+    assert [q["p"] for q in paths(server, "/ranking.php")] == ["1", "2"]
+
+
+def test_ranking_already_synced(server, client):
+    assert list(pixiv_sync.iter_ranking(client, "daily", since=20260301)) == []
+    assert len(paths(server, "/ranking.php")) == 1
+
+
+def test_sync_source_advances_high_water(server, client, tmp_path, monkeypatch):
+    archived = []
+
+    async def fake_batch_archive(items, on_result=None, **kwargs):
+        for item in items:
+            archived.append(item["pixiv_id"])
+            on_result(item, {"url": item["url"], "status": "success"})
+        return {"total": len(archived), "success": len(archived), "failed": 0, "results": []}
+
+    monkeypatch.setattr(batch_archive, "batch_archive", fake_batch_archive)
+    state = pixiv_sync.SyncState(tmp_path / "sync.json")
+    enumerate_fn = lambda since: pixiv_sync.iter_bookmarks(client, "42", since)
+
+    asyncio.run(pixiv_sync.sync_source("bookmarks:42:show", enumerate_fn, state))
+    assert len(archived) == 99
+    saved = json.loads((tmp_path / "sync.json").read_text())["bookmarks:42:show"]
+    assert saved == {"high_water": 5100, "done": [], "pending": []}
+
+    # 新增两个收藏：下一次同步只归档新收藏，在上次位置停止
+    server.data.bookmarks[:0] = [(2002, 5102), (2001, 5101)]
+    server.data.requests.clear()
+    archived.clear()
+    state = pixiv_sync.SyncState(tmp_path / "sync.json")
+    asyncio.run(pixiv_sync.sync_source("bookmarks:42:show", enumerate_fn, state))
+    assert archived == [2002, 2001]
+    assert len(paths(server, "/illusts/bookmarks")) == 1
+    assert state.source("bookmarks:42:show")["high_water"] == 5102
+
+
+def test_interrupted_sync_keeps_high_water(server, client, tmp_path, monkeypatch):
+    async def failing_batch_archive(items, on_result=None, **kwargs):
+        for n, item in enumerate(items):
+            if n == 2:
+                raise RuntimeError("中断")
+            on_result(item, {"url": item["url"], "status": "success"})
+
+    monkeypatch.setattr(batch_archive, "batch_archive", failing_batch_archive)
+    state = pixiv_sync.SyncState(tmp_path / "sync.json")
+    with pytest.raises(RuntimeError):
+        asyncio.run(pixiv_sync.sync_source(
+            "user:42", lambda since: pixiv_sync.iter_user_artworks(client, "42", since), state
+        ))
+    # 未跑完：high-water mark 不推进，已完成的作品下次跳过
+    saved = json.loads((tmp_path / "sync.json").read_text())["user:42"]
+    assert saved["high_water"] == 0
+    assert saved["done"] == [103, 105]
+
+
+def test_sync_cancelled_after_enumeration_keeps_unfinished(server, client, tmp_path, monkeypatch):
+    async def read_ahead_batch_archive(items, on_result=None, **kwargs):
+        # 与流水线一样先读完整个输入，只完成第一个作品后被取消
+        items = list(items)
+        on_result(items[0], {"url": items[0]["url"], "status": "success"})
+        raise asyncio.CancelledError
+
+    monkeypatch.setattr(batch_archive, "batch_archive", read_ahead_batch_archive)
+    state = pixiv_sync.SyncState(tmp_path / "sync.json")
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(pixiv_sync.sync_source(
+            "user:42", lambda since: pixiv_sync.iter_user_artworks(client, "42", since), state
+        ))
+    saved = json.loads((tmp_path / "sync.json").read_text())["user:42"]
+    assert saved == {"high_water": 0, "done": [105], "pending": [101, 103]}
+
+    # 下次同步先重试未完成的作品，跑完后才推进 high-water mark
+    archived = []
+
+    async def fake_batch_archive(items, on_result=None, **kwargs):
+        for item in items:
+            archived.append(item["pixiv_id"])
+            on_result(item, {"url": item["url"], "status": "success"})
+
+    monkeypatch.setattr(batch_archive, "batch_archive", fake_batch_archive)
+    state = pixiv_sync.SyncState(tmp_path / "sync.json")
+    asyncio.run(pixiv_sync.sync_source(
+        "user:42", lambda since: pixiv_sync.iter_user_artworks(client, "42", since), state
+    ))
+    assert archived == [103, 101]
+    assert state.source("user:42") == {"high_water": 105, "done": [], "pending": []}
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+retry.py 的重试与熔断测试
+
+本地 HTTP 服务按脚本依次返回状态码序列（429 / 5xx / 404 / 200），
+验证 Retry-After、退避上限、熔断与半开探测、404 不重试、非 HTTP 错误不重置熔断器。
+
+用法:
+    pip install pytest
+    pytest tests/test_retry.py
+"""
+import sys
+import time
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+import retry
+from retry import CircuitBreakers, RetryPolicy, with_retry
+
+
+class ScriptedHandler(BaseHTTPRequestHandler):
+    """按路径依次返回预设的响应，序列用完后重复最后一个"""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            script = server.scripts[self.path]
+            index = server.hits.get(self.path, 0)
+            server.hits[self.path] = index + 1
+        status, headers, body = script[min(index, len(script) - 1)]
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), ScriptedHandler)
+    httpd.scripts, httpd.hits, httpd.lock = {}, {}, threading.Lock()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    def script(path: str, *responses) -> str:
+        httpd.scripts[path] = [
+            (r, {}, b"ok") if isinstance(r, int) else (r[0], r[1], r[2] if len(r) > 2 else b"ok")
+            for r in responses
+        ]
+        return f"http://127.0.0.1:{httpd.server_port}{path}"
+
+    httpd.script = script
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """记录退避等待时长，实际只等待很短时间"""
+    recorded = []
+    real_sleep = time.sleep
+
+    def fake_sleep(seconds):
+        recorded.append(seconds)
+        real_sleep(min(seconds, 0.01))
+
+    monkeypatch.setattr(retry.time, "sleep", fake_sleep)
+    return recorded
+
+
+def get(url: str):
+    def attempt():
+        response = requests.get(url, timeout=5)
+        response.raise_for_status()
+        return response.text
+    return attempt
+
+
+def test_retry_after_is_honored(server, sleeps):
+    url = server.script("/throttled", (429, {"Retry-After": "3"}), 200)
+    result = with_retry(url, get(url), RetryPolicy(max_attempts=3), CircuitBreakers())
+    assert result == "ok"
+    assert server.hits["/throttled"] == 2
+    assert sleeps == [3.0]
+
+
+def test_retry_after_above_limit_fails_immediately(server, sleeps):
+    url = server.script("/long-pause", (503, {"Retry-After": "900"}))
+    with pytest.raises(requests.HTTPError):
+        with_retry(url, get(url), RetryPolicy(max_attempts=3, max_retry_after=60), CircuitBreakers())
+    assert server.hits["/long-pause"] == 1
+    assert sleeps == []
+
+
+def test_backoff_is_capped(server, sleeps):
+    url = server.script("/flaky", 500, 502, 504, 200)
+    policy = RetryPolicy(max_attempts=4, base=10.0, cap=0.5)
+    assert with_retry(url, get(url), policy, CircuitBreakers()) == "ok"
+    assert server.hits["/flaky"] == 4
+    assert len(sleeps) == 3
+    assert all(0 <= s <= 0.5 for s in sleeps)
+
+
+def test_404_is_not_retried(server, sleeps):
+    url = server.script("/missing", 404)
+    breakers = CircuitBreakers(threshold=1)
+    with pytest.raises(requests.HTTPError):
+        with_retry(url, get(url), RetryPolicy(max_attempts=4), breakers)
+    assert server.hits["/missing"] == 1
+    assert sleeps == []
+    assert breakers.summary() == {}
+
+
+def test_breaker_trips_and_half_opens(server):
+    url = server.script("/down", 500, 500, 500, 200)
+    host = "127.0.0.1"
+    breakers = CircuitBreakers(threshold=2, cooldown=0.2, max_cooldown=1.0)
+    policy = RetryPolicy(max_attempts=2, base=0.001)
+
+    # 连续失败 2 次：熔断
+    with pytest.raises(requests.HTTPError):
+        with_retry(url, get(url), policy, breakers)
+    assert breakers.summary() == {host: 1}
+    assert breakers.wait_time(host) > 0
+
+    # 暂停结束后放行一个探测请求；探测失败，暂停时间加倍
+    started = time.monotonic()
+    with pytest.raises(requests.HTTPError):
+        with_retry(url, get(url), RetryPolicy(max_attempts=1), breakers)
+    assert time.monotonic() - started >= 0.15
+    assert breakers.summary() == {host: 2}
+    assert breakers._hosts[host]["cooldown"] == pytest.approx(0.4)
+
+    # 半开期间只有一个探测名额
+    time.sleep(0.45)
+    assert breakers.wait_time(host) == 0.0
+    assert breakers.wait_time(host) > 0
+    breakers.release(host)
+
+    # 探测成功：恢复
+    assert with_retry(url, get(url), RetryPolicy(max_attempts=1), breakers) == "ok"
+    assert breakers.wait_time(host) == 0.0
+    assert breakers._hosts[host]["failures"] == 0
+    assert server.hits["/down"] == 4
+
+
+def test_non_http_error_does_not_reset_breaker(server):
+    url = server.script("/garbled", 500, (200, {"Content-Type": "application/json"}, b"{not json"))
+    host = "127.0.0.1"
+    breakers = CircuitBreakers(threshold=5)
+    with pytest.raises(requests.HTTPError):
+        with_retry(url, get(url), RetryPolicy(max_attempts=1), breakers)
+    assert breakers._hosts[host]["failures"] == 1
+
+    def attempt():
+        response = requests.get(url, timeout=5)
+        response.raise_for_status()
+        return response.json()
+
+    with pytest.raises(ValueError):
+        with_retry(url, attempt, RetryPolicy(max_attempts=3), breakers)
+    assert breakers._hosts[host]["failures"] == 1
+    assert breakers._hosts[host]["probing"] is False
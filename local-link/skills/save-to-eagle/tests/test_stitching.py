@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+stitching.py 的滚动截图拼接测试
+
+用合成页面模拟 capture_stitched 的滚动截图（相同的步长规则），
+把拼接结果与预期的整页图像逐像素比较：吸顶导航和吸底悬浮条各只出现一次，内容不重复、不缺失。
+
+用法:
+    pip install pytest
+    pytest tests/test_stitching.py
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+from stitching import PageStitcher
+
+# 与 record_webpage.STITCH_STEP_RATIO 一致（record_webpage 依赖 playwright，这里不导入）
+STEP_RATIO = 0.75
+
+WIDTH = 48
+VIEWPORT = 900
+PAGE_HEIGHT = 5000
+
+
+def solid(rows: int, color) -> np.ndarray:
+    return np.tile(np.array(color, dtype=np.uint8), (rows, WIDTH, 1))
+
+
+def noise(rows: int, seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).integers(0, 256, (rows, WIDTH, 3), dtype=np.uint8)
+
+
+def make_page() -> np.ndarray:
+    """正文：随机行，夹杂几段留白"""
+    page = noise(PAGE_HEIGHT, 1)
+    for start in (400, 1800, 3300):
+        page[start:start + 120] = 255
+    return page
+
+
+def capture(page: np.ndarray, header: np.ndarray, footer: np.ndarray, tmp_path: Path) -> np.ndarray:
+    """按 capture_stitched 的方式逐屏截图并拼接，返回拼接结果"""
+    stitcher = PageStitcher(tmp_path / "page_full")
+    top, bottom = len(header), len(footer)
+    previous = None
+    y = 0
+    while True:
+        y = min(y, PAGE_HEIGHT - VIEWPORT)
+        if previous is not None and y <= previous:
+            break
+        frame = page[y:y + VIEWPORT].copy()
+        frame[:top] = header
+        frame[VIEWPORT - bottom:] = footer
+        stitcher.add(frame, None if previous is None else y - previous)
+        previous = y
+        fixed_top, fixed_bottom = stitcher.fixed
+        y += max(1, int((VIEWPORT - (fixed_top + fixed_bottom)) * STEP_RATIO))
+
+    paths = stitcher.close()
+    assert len(paths) == 1
+    assert stitcher.fixed == (top, bottom)
+    with Image.open(paths[0]) as img:
+        return np.asarray(img.convert("RGB"))
+
+
+@pytest.mark.parametrize("footer", [
+    # 顶部有 15 行纯色内边距的悬浮条
+    np.vstack([solid(15, (30, 60, 90)), noise(25, 2)]),
+    # 纯色底栏
+    solid(40, (200, 40, 40)),
+], ids=["padded-footer", "solid-footer"])
+def test_header_and_footer_appear_once(tmp_path, footer):
+    page = make_page()
+    header = noise(60, 3)
+    result = capture(page, header, footer, tmp_path)
+
+    expected = np.vstack([header, page[len(header):PAGE_HEIGHT - len(footer)], footer])
+    assert result.shape == expected.shape
+    assert np.array_equal(result, expected)
+
+
+def test_blank_space_below_header_is_content(tmp_path):
+    # 吸顶导航下方紧接着留白：留白随内容滚动，不能算进固定元素
+    page = make_page()
+    page[60:200] = 255
+    header = np.vstack([noise(50, 4), solid(10, (240, 240, 240))])
+    result = capture(page, header, noise(30, 5), tmp_path)
+
+    expected = np.vstack([header, page[60:PAGE_HEIGHT - 30], noise(30, 5)])
+    assert np.array_equal(result, expected)